@@ -625,6 +625,8 @@ if 'analysis_results' not in st.session_state:
     st.session_state.analysis_results = None
 if 'processed_text' not in st.session_state:
     st.session_state.processed_text = ""
+if 'source_map' not in st.session_state:
+    st.session_state.source_map = None  # maps positions in an uploaded file's text to its pages/lines
 if 'show_results' not in st.session_state:
     st.session_state.show_results = False
 if 'enable_search' not in st.session_state:
@@ -637,8 +639,12 @@ if 'show_advanced' not in st.session_state:
     st.session_state.show_advanced = False
 if 'current_analyzer' not in st.session_state:
     st.session_state.current_analyzer = None
+if 'analyzer_config' not in st.session_state:
+    st.session_state.analyzer_config = None
 if 'active_tab' not in st.session_state:
     st.session_state.active_tab = "Citation Analysis"
+if 'bibliography' not in st.session_state:
+    st.session_state.bibliography = None  # BibliographyIndex of an uploaded .bib/.ris/.json file
 
 def main():
     # Render navigation bar
@@ -654,7 +660,8 @@ def main():
         show_detailed_analysis=True,
         enable_web_search=st.session_state.enable_search,
         preferred_model=st.session_state.preferred_model,
-        enable_model_fallback=True
+        enable_model_fallback=True,
+        model_preset=st.session_state.model_preset
     )
     
     if not st.session_state.show_results:
@@ -868,7 +875,9 @@ def render_citation_analysis_tab(settings: Settings):
                     for model_status in models_status:
                         status_icon = "🟢" if model_status['active'] else "🔴" if model_status['rate_limited'] else "⚪"
                         cooldown_text = f" (cooldown: {model_status['cooldown_remaining']}s)" if model_status['cooldown_remaining'] > 0 else ""
-                        st.markdown(f"{status_icon} **{model_status['name']}** - {model_status['description']}{cooldown_text}")
+                        quota = model_status.get('quota', {})
+                        quota_text = f" · {quota['requests']}/{quota['rpm_limit']} req/min, {quota['tokens']}/{quota['tpm_limit']} tokens/min" if quota else ""
+                        st.markdown(f"{status_icon} **{model_status['name']}** - {model_status['description']}{cooldown_text}{quota_text}")
         
         # Action buttons
         col_btn1, col_btn2, col_btn3 = st.columns([1.5, 1, 1.5])
@@ -892,18 +901,40 @@ def render_citation_analysis_tab(settings: Settings):
             help="Upload a document containing citations"
         )
         
+        bibliography_file = st.file_uploader(
+            "Upload Bibliography (optional)",
+            type=['bib', 'ris', 'json'],
+            key="bibliography_upload",
+            help="BibTeX, RIS or CSL-JSON export of your references - citations found in it are checked without AI or web calls"
+        )
+        if bibliography_file is None:
+            st.session_state.bibliography = None
+            st.session_state.bibliography_file = None
+        elif st.session_state.get('bibliography_file') != (bibliography_file.name, bibliography_file.size):
+            # Parsed once per file, so reruns keep the same index (and the analyzer its cached verdicts)
+            bibliography = FileHandler().load_bibliography(bibliography_file)
+            if bibliography is None:
+                st.error("Failed to read the bibliography. Please check the file format.")
+            else:
+                st.session_state.bibliography = bibliography
+                st.session_state.bibliography_file = (bibliography_file.name, bibliography_file.size)
+        if st.session_state.bibliography is not None:
+            st.caption(f"Bibliography loaded: {len(st.session_state.bibliography)} entries")
+        
         # Process input
         if analyze_clicked and text_input:
             st.session_state.processed_text = text_input
+            st.session_state.source_map = None
             st.session_state.show_results = True
             st.rerun()
         
         if uploaded_file is not None:
             file_handler = FileHandler()
             with st.spinner("Extracting text from file..."):
-                extracted_text = file_handler.extract_text(uploaded_file)
-            if extracted_text:
-                st.session_state.processed_text = extracted_text
+                extracted = file_handler.extract(uploaded_file)
+            if extracted and extracted['text']:
+                st.session_state.processed_text = extracted['text']
+                st.session_state.source_map = FileHandler.offset_map(extracted)
                 st.session_state.show_results = True
                 st.rerun()
             else:
@@ -952,6 +983,13 @@ def render_results_page(settings: Settings):
             if model_used:
                 model_name = AVAILABLE_MODELS.get(model_used, {}).get('name', model_used)
                 st.info(f"Analysis performed using: **{model_name}**")
+            
+            tiers = st.session_state.analysis_results['summary'].get('analysis_tiers', {})
+            if tiers:
+                st.caption(" · ".join(
+                    f"{tier}: {stats['resolved']} resolved, {stats['calls']} calls, {stats['average_latency'] * 1000:.0f} ms avg"
+                    for tier, stats in tiers.items()
+                ))
         
         render_results_section(st.session_state.analysis_results)
     
@@ -969,6 +1007,7 @@ def render_results_page(settings: Settings):
             st.session_state.show_results = False
             st.session_state.analysis_results = None
             st.session_state.processed_text = ""
+            st.session_state.source_map = None
             st.rerun()
 
 def analyze_text(text: str, settings: Settings):
@@ -978,20 +1017,30 @@ def analyze_text(text: str, settings: Settings):
             st.error("Please provide a Gemini API key to analyze citations.")
             return
             
-        # Initialize citation analyzer
-        analyzer = CitationAnalyzer(
-            api_provider="gemini",
-            api_key=settings.api_key,
-            mcp_enabled=False,
-            enable_web_search=settings.enable_web_search,
-            preferred_model=settings.preferred_model
-        )
+        # Reuse the analyzer while its settings are unchanged, so re-analyzing an
+        # edited text only pays for the citations that changed
+        analyzer_config = (settings.api_key, settings.enable_web_search, settings.preferred_model,
+                           settings.model_preset, settings.confidence_threshold)
+        analyzer = st.session_state.current_analyzer
+        if analyzer is None or st.session_state.analyzer_config != analyzer_config:
+            analyzer = CitationAnalyzer(
+                api_provider="gemini",
+                api_key=settings.api_key,
+                mcp_enabled=False,
+                enable_web_search=settings.enable_web_search,
+                preferred_model=settings.preferred_model,
+                model_preset=settings.model_preset,
+                confidence_threshold=settings.confidence_threshold
+            )
+            st.session_state.analyzer_config = analyzer_config
         
         # Store analyzer in session state for model status
         st.session_state.current_analyzer = analyzer
+        if analyzer.bibliography is not st.session_state.bibliography:
+            analyzer.set_bibliography(st.session_state.bibliography)
         
         # Perform analysis
-        results = analyzer.analyze(text)
+        results = analyzer.analyze(text, st.session_state.get('source_map'))
         
         # Store results in session state
         st.session_state.analysis_results = results
@@ -0,0 +1,87 @@
+"""Benchmark loading a bibliography (BibTeX, RIS, CSL-JSON) and resolving in-text citations against it
+
+Usage: python benchmarks/bench_bibliography.py [--entries 10000] [--citations 10000]
+
+Synthetic entries have two authors, LaTeX markup in the BibTeX titles and
+a DOI; citations mix author-year, \\cite and pandoc keys, a tenth of them
+pointing at entries that don't exist.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bibliography import BibliographyIndex
+
+SYLLABLES = "ka ri mo len sta vo gar ul hen dri sson mül ber tas ni".split()
+
+
+def make_entries(count: int, rng: random.Random):
+    surnames = list(dict.fromkeys(''.join(rng.choice(SYLLABLES) for _ in range(3)).capitalize() for _ in range(count // 4)))
+    for number in range(count):
+        yield {'key': f"ref{number}", 'surname': rng.choice(surnames), 'year': 1980 + number % 45,
+               'title': f"On the {rng.choice(['theory', 'practice', 'history'])} of things, part {number}",
+               'doi': f"10.{1000 + number % 9000}/bench.{number}"}
+
+
+def to_bibtex(entries) -> str:
+    return ''.join(
+        f"@article{{{e['key']},\n  author = {{{e['surname']}, Ann and Lee, Bo}},\n  title = {{{{On}} the \\emph{{{e['title'][7:]}}}}},\n"
+        f"  journal = {{Journal of Tests}},\n  year = {{{e['year']}}},\n  pages = {{1--10}},\n  doi = {{{e['doi']}}}\n}}\n\n"
+        for e in entries)
+
+
+def to_ris(entries) -> str:
+    return ''.join(
+        f"TY  - JOUR\nID  - {e['key']}\nAU  - {e['surname']}, Ann\nAU  - Lee, Bo\nTI  - {e['title']}\n"
+        f"T2  - Journal of Tests\nPY  - {e['year']}\nSP  - 1\nEP  - 10\nDO  - {e['doi']}\nER  - \n\n"
+        for e in entries)
+
+
+def to_csl_json(entries) -> str:
+    return json.dumps([
+        {'id': e['key'], 'type': 'article-journal', 'title': e['title'], 'container-title': 'Journal of Tests',
+         'author': [{'family': e['surname'], 'given': 'Ann'}, {'family': 'Lee', 'given': 'Bo'}],
+         'issued': {'date-parts': [[e['year']]]}, 'page': '1-10', 'DOI': e['doi']}
+        for e in entries])
+
+
+def make_citations(entries, count: int, rng: random.Random):
+    citations = []
+    for _ in range(count):
+        e = rng.choice(entries)
+        year = e['year'] if rng.random() < 0.9 else 1900
+        key = e['key'] if year != 1900 else 'missing'
+        citations.append(rng.choice([f"({e['surname']}, {year})", f"{e['surname']} et al. ({year})",
+                                     f"\\citep[p.~4]{{{key}}}", f"[@{key}, p. 12]"]))
+    return citations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--citations', type=int, default=10000)
+    args = parser.parse_args()
+    rng = random.Random(3)
+    entries = list(make_entries(args.entries, rng))
+
+    for name, text in (('refs.bib', to_bibtex(entries)), ('refs.ris', to_ris(entries)), ('refs.json', to_csl_json(entries))):
+        started = time.perf_counter()
+        index = BibliographyIndex.from_text(name, text)
+        print(f"{name:>9}: {len(index)} entries ({len(text) / 1024 / 1024:.1f} MB) parsed and indexed in "
+              f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    citations = make_citations(entries, args.citations, rng)
+    started = time.perf_counter()
+    resolved = sum(1 for citation in citations if not index.match(citation)[1])
+    elapsed = time.perf_counter() - started
+    print(f"matched {len(citations)} citations in {elapsed * 1000:.0f} ms "
+          f"({elapsed / len(citations) * 1e6:.1f} µs each), {resolved} resolved")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark CrossRef DOI lookups against a local stub serving real-sized work records
+
+Usage: python benchmarks/bench_crossref.py [--lookups 200] [--references 50 400]
+
+The stub answers /works/{doi} with a whole work record in CrossRef's key
+order (the reference list in the middle, before container-title, ISSN and
+issued) and /works?filter=doi:...&select=... with only the selected
+fields, as CrossRef does. Each reference-list size is looked up the old
+way (whole record) and with field selection, with and without the abstract
+and license.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.doi_validator import DOIValidator
+from src.http_client import RateLimitedSession
+from src.rate_limiter import HostRateLimiter
+
+
+def date(*parts) -> dict:
+    return {'date-parts': [list(parts)], 'date-time': '2015-05-27T00:00:00Z', 'timestamp': 1432684800000}
+
+
+def make_work(doi: str, references: int) -> dict:
+    return {
+        'indexed': date(2024, 3, 1), 'reference-count': references, 'publisher': 'Springer Science and Business Media LLC',
+        'issue': '7553', 'license': [{'start': date(2015, 5, 1), 'content-version': 'tdm', 'delay-in-days': 0,
+                                      'URL': 'https://www.springernature.com/gp/researchers/text-and-data-mining'}],
+        'content-domain': {'domain': ['link.springer.com'], 'crossmark-restriction': False},
+        'short-container-title': ['Nature'], 'published-print': date(2015, 5, 28), 'DOI': doi, 'type': 'journal-article',
+        'created': date(2015, 5, 27), 'page': '436-444', 'source': 'Crossref', 'is-referenced-by-count': 51234,
+        'title': ['Deep learning'], 'prefix': doi.split('/')[0], 'volume': '521',
+        'author': [{'given': given, 'family': family, 'sequence': 'additional', 'affiliation': []}
+                   for given, family in (('Yann', 'LeCun'), ('Yoshua', 'Bengio'), ('Geoffrey', 'Hinton'))],
+        'member': '297', 'published-online': date(2015, 5, 27),
+        'abstract': '<jats:p>' + 'Deep learning allows computational models to learn representations of data. ' * 12 + '</jats:p>',
+        'reference': [{'key': f'BFnature14539_CR{number}', 'doi-asserted-by': 'crossref', 'first-page': str(number),
+                       'DOI': f'10.1000/ref.{number}', 'article-title': f'A cited study of learning, part {number}',
+                       'volume': str(number % 90), 'author': 'Krizhevsky, A.', 'year': str(1990 + number % 30),
+                       'journal-title': 'Proc. Adv. Neural Inf. Process. Syst.',
+                       'unstructured': f'Krizhevsky, A. et al. A cited study of learning, part {number}. '
+                                       f'Proc. Adv. Neural Inf. Process. Syst. {number % 90}, {number}-{number + 8} '
+                                       f'({1990 + number % 30}).'}
+                      for number in range(1, references + 1)],
+        'container-title': ['Nature'], 'original-title': [], 'language': 'en',
+        'link': [{'URL': f'https://www.nature.com/articles/nature14539.{kind}', 'content-type': f'text/{kind}',
+                  'content-version': 'vor', 'intended-application': 'text-mining'} for kind in ('pdf', 'html', 'xml')],
+        'deposited': date(2023, 11, 1), 'score': 1, 'resource': {'primary': {'URL': 'https://www.nature.com/articles/nature14539'}},
+        'subtitle': [], 'short-title': [], 'issued': date(2015, 5, 27), 'references-count': references,
+        'journal-issue': {'issue': '7553', 'published-print': date(2015, 5, 28)},
+        'alternative-id': ['nature14539'], 'URL': f'https://doi.org/{doi}', 'relation': {},
+        'ISSN': ['0028-0836', '1476-4687'], 'issn-type': [{'value': '0028-0836', 'type': 'print'}],
+        'subject': ['Multidisciplinary'], 'published': date(2015, 5, 27),
+        'assertion': [{'value': 'Received', 'order': 1, 'name': 'received', 'label': 'Received'}],
+    }
+
+
+class StubCrossRef(BaseHTTPRequestHandler):
+    works = {}
+    sent = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.startswith('/works/'):
+            work = self.works.get(url.path[len('/works/'):])
+            body = {'status': 'ok', 'message-type': 'work', 'message-version': '1.0.0', 'message': work}
+        else:
+            query = parse_qs(url.query)
+            work = self.works.get(query['filter'][0][len('doi:'):])
+            fields = query['select'][0].split(',')
+            items = [{field: work[field] for field in fields if field in work}] if work else []
+            body = {'status': 'ok', 'message-type': 'work-list', 'message-version': '1.0.0',
+                    'message': {'facets': {}, 'total-results': len(items), 'items': items, 'items-per-page': 1,
+                                'query': {'start-index': 0, 'search-terms': None}}}
+        content = json.dumps(body).encode()
+        StubCrossRef.sent += len(content)
+        self.send_response(200 if work else 404)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--references', type=int, nargs='+', default=[50, 400])
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubCrossRef)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    validator = DOIValidator()
+    validator.offline_index = None
+    validator.crossref_api = f'http://127.0.0.1:{server.server_port}/works'
+    validator.session = RateLimitedSession(HostRateLimiter({'127.0.0.1': {'rate': 1e9, 'burst': 1e9}}))
+
+    def whole_record(doi):
+        return validator._build_publication_result(validator.session.get(f'{validator.crossref_api}/{doi}'), doi)
+
+    for references in args.references:
+        dois = [f'10.1038/bench.{references}.{number}' for number in range(args.lookups)]
+        StubCrossRef.works = {doi: make_work(doi, references) for doi in dois}
+        print(f"{args.lookups} lookups, works with {references} references:")
+        for label, lookup in (('whole record (before)', whole_record),
+                              ('selected fields', lambda doi: validator.get_publication_info(doi, include_extras=False)),
+                              ('+ abstract, license', validator.get_publication_info)):
+            StubCrossRef.sent = 0
+            started = time.perf_counter()
+            results = [lookup(doi) for doi in dois]
+            elapsed = time.perf_counter() - started
+            assert all(result['success'] and result['data']['journal'] == 'Nature' for result in results)
+            print(f"  {label:>22}: {StubCrossRef.sent / len(dois) / 1024:7.1f} KiB and "
+                  f"{elapsed / len(dois) * 1000:5.2f} ms per DOI")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Benchmark CSL styles: compiling each .csl file and rendering a bibliography with it
+
+Usage: python benchmarks/bench_csl.py [--records 10000] [--styles config/csl]
+
+Records are the synthetic DOIValidator._parse_work_data records of
+bench_formats.py. For every style in the directory it times the first
+(compiling) load, rendering each record on its own and rendering the
+sorted, numbered reference list.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_formats import make_records
+from config.settings import CSL_STYLES_DIR
+from src.csl_styles import CSLStyleLibrary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--styles', default=CSL_STYLES_DIR, help='directory of .csl files')
+    args = parser.parse_args()
+    records = list(make_records(args.records, random.Random(5)))
+    library = CSLStyleLibrary(args.styles)
+
+    print(f"{len(records)} records, {len(library)} CSL styles in {args.styles}")
+    for name in library.names():
+        started = time.perf_counter()
+        style = library.get(name)
+        compiled = time.perf_counter() - started
+        if style is None:
+            continue
+        started = time.perf_counter()
+        assert library.get(name) is style
+        cached = time.perf_counter() - started
+
+        started = time.perf_counter()
+        style.render_many(records)
+        each = time.perf_counter() - started
+
+        started = time.perf_counter()
+        style.bibliography(records)
+        sorted_list = time.perf_counter() - started
+        print(f"  {name}: compiled in {compiled * 1000:.1f} ms (cached lookup {cached * 1e6:.1f} µs), "
+              f"{len(records) / each:,.0f} references/s, sorted list in {sorted_list * 1000:.0f} ms "
+              f"({sorted_list / len(records) * 1e6:.1f} µs each)")
+
+
+if __name__ == '__main__':
+    main()
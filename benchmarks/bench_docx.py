@@ -0,0 +1,91 @@
+"""Benchmark DOCX text extraction: python-docx object model (old path) vs streaming docx_to_text
+
+Usage: python benchmarks/bench_docx.py [--pages 500] [--repeat 3]
+
+The generated document has ~12 paragraphs and a small table per page and a
+new section (repeating the header and footer) every 20 pages. Peak memory
+is traced allocation during extraction.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+from src.docx_text import docx_to_text
+
+PARAGRAPH = ("Recent work (Smith, 2020) revisits the effect first reported by Müller (1998, p. 12), "
+             "while Jones and Lee (2004) replicate it under controlled conditions [3].")
+
+
+def old_extract(file) -> str:
+    """The previous _extract_from_docx: paragraphs, then table cells, then every section's header/footer"""
+    doc = docx.Document(file)
+    full_text = []
+    for paragraph in doc.paragraphs:
+        if paragraph.text.strip():
+            full_text.append(paragraph.text)
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                if cell.text.strip():
+                    full_text.append(cell.text)
+    for section in doc.sections:
+        for paragraph in section.header.paragraphs + section.footer.paragraphs:
+            if paragraph.text.strip():
+                full_text.append(paragraph.text)
+    return '\n\n'.join(full_text)
+
+
+def make_document(pages: int) -> bytes:
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = "Running head: Citation study"
+    document.sections[0].footer.paragraphs[0].text = "Draft manuscript"
+    for page in range(pages):
+        for _ in range(12):
+            document.add_paragraph(PARAGRAPH)
+        table = document.add_table(rows=3, cols=4)
+        table.cell(0, 0).merge(table.cell(0, 3)).text = f"Table {page + 1}: studies (Lee, 2018)"
+        for row in range(1, 3):
+            for column in range(4):
+                table.cell(row, column).text = f"{row}.{column}"
+        if page % 20 == 19:
+            document.add_section()
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def measure(function, data: bytes, repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = function(io.BytesIO(data))
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    function(io.BytesIO(data))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / (1024 * 1024), len(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_document(args.pages)
+    print(f"{args.pages} pages, {len(data) / 1024:.0f} KB")
+    print(f"{'path':>7} {'time (s)':>9} {'peak (MB)':>10} {'chars':>9}")
+    for name, function in (('old', old_extract), ('stream', docx_to_text)):
+        seconds, peak, chars = measure(function, data, args.repeat)
+        print(f"{name:>7} {seconds:>9.2f} {peak:>10.1f} {chars:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark TXT decoding: full-buffer chardet (old path) vs tiered decode_bytes
+
+Usage: python benchmarks/bench_encoding.py [--sizes 1,10,50] [--baseline-max-mb 10]
+
+chardet over the whole buffer takes seconds per MB, so the baseline is only
+timed up to --baseline-max-mb.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chardet
+from src.file_handlers import decode_bytes
+
+SAMPLE_PARAGRAPH = (
+    "Recent work (Smith, 2020; O'Neil & García, 2019a) revisits the café "
+    "effect first reported by Müller (1998, p. 12). See also [3] and [4]-[6].\n"
+)
+
+
+def old_decode(raw_data: bytes) -> str:
+    """The previous _extract_from_txt: chardet over the entire buffer"""
+    encoding = chardet.detect(raw_data)['encoding'] or 'utf-8'
+    try:
+        return raw_data.decode(encoding)
+    except Exception:
+        return raw_data.decode('utf-8', errors='replace')
+
+
+def make_corpus(size_mb: float, encoding: str) -> bytes:
+    text = SAMPLE_PARAGRAPH * (int(size_mb * 1024 * 1024) // len(SAMPLE_PARAGRAPH) + 1)
+    return text.encode(encoding)[:int(size_mb * 1024 * 1024)]
+
+
+def best_of(function, data: bytes, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(data)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1,10,50', help='comma-separated sizes in MB')
+    parser.add_argument('--baseline-max-mb', type=float, default=10, help='largest size to time the old path on')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'encoding':>9} {'old (s)':>10} {'new (s)':>10} {'speedup':>9}")
+    for size_mb in [float(size) for size in args.sizes.split(',')]:
+        for encoding in ('utf-8', 'cp1252'):
+            data = make_corpus(size_mb, encoding)
+            new = best_of(decode_bytes, data, args.repeat)
+            if size_mb <= args.baseline_max_mb:
+                old = best_of(old_decode, data, 1)
+                print(f"{size_mb:>6g}MB {encoding:>9} {old:>10.3f} {new:>10.4f} {old / new:>8.0f}x")
+            else:
+                print(f"{size_mb:>6g}MB {encoding:>9} {'skipped':>10} {new:>10.4f} {'-':>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark reference formatting: many publication records into every style
+
+Usage: python benchmarks/bench_formats.py [--records 10000]
+
+Records look like DOIValidator._parse_work_data output, with one to
+twenty-five authors; a tenth of the authors have no given name and a
+tenth of the records lack a journal, volume or pages.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.citation_formats import STYLE_TEMPLATES
+from src.doi_validator import DOIValidator
+
+
+def make_records(count: int, rng: random.Random):
+    for number in range(count):
+        authors = [{'given': '' if rng.random() < 0.1 else rng.choice(['Ann', 'Bo', 'Chen Li']),
+                    'family': rng.choice(['Smith', 'Jones', 'García', 'Nakamura'])}
+                   for _ in range(rng.choice([1, 2, 3, 5, 8, 25]))]
+        sparse = rng.random() < 0.1
+        yield {
+            'title': f"A study of things, part {number}",
+            'authors': authors,
+            'date': {'year': 1980 + number % 45},
+            'journal': '' if sparse else 'Journal of Tests',
+            'volume': '' if sparse else str(number % 60),
+            'issue': str(number % 12),
+            'pages': '' if sparse else f"{number % 300}-{number % 300 + 12}",
+            'url': f"https://doi.org/10.{1000 + number % 9000}/bench.{number}",
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=10000)
+    args = parser.parse_args()
+    records = list(make_records(args.records, random.Random(5)))
+    styles = list(STYLE_TEMPLATES)
+    validator = DOIValidator()
+
+    started = time.perf_counter()
+    one_by_one = [{style: validator.format_citation(record, style) for style in styles} for record in records]
+    single = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = validator.format_citations(records, styles)
+    batch = time.perf_counter() - started
+
+    assert batched == one_by_one
+    count = len(records) * len(styles)
+    print(f"{len(records)} records x {len(styles)} styles = {count} references")
+    print(f"  format_citation per reference: {single * 1000:.0f} ms ({count / single:,.0f}/s)")
+    print(f"  format_citations in one batch: {batch * 1000:.0f} ms ({count / batch:,.0f}/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark markdown text extraction: HTML round-trip (old path) vs single-pass markdown_to_text
+
+Usage: python benchmarks/bench_markdown.py [--sizes 1,5,20] [--repeat 3]
+"""
+import argparse
+import html
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown
+from src.markdown_text import markdown_to_text
+
+SAMPLE_SECTION = """## Related work
+
+Recent **work** (Smith, 2020) revisits the *café effect* first reported by
+Müller (1998, p. 12); see [the survey](https://example.org/survey) and [3].
+Results &amp; caveats are summarised in `table_2` below.
+
+- Jones and Lee (2004) replicate it
+- (O'Neil & García, 2019a) do not
+
+```python
+print("(Not, 2000)")
+```
+
+> Quoted remark (Brown 45).
+
+"""
+
+
+def old_extract(content: str) -> str:
+    """The previous _extract_from_markdown: render HTML, strip tags, unescape"""
+    rendered = markdown.markdown(content)
+    text = re.sub('<[^<]+?>', '', rendered)
+    return html.unescape(text).strip()
+
+
+def best_of(function, content: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(content)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1,5,20', help='comma-separated sizes in MB')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'old (s)':>9} {'new (s)':>9} {'speedup':>8} {'map runs':>9}")
+    for size_mb in [float(size) for size in args.sizes.split(',')]:
+        content = SAMPLE_SECTION * (int(size_mb * 1024 * 1024) // len(SAMPLE_SECTION.encode('utf-8')) + 1)
+        old = best_of(old_extract, content, args.repeat)
+        new = best_of(markdown_to_text, content, args.repeat)
+        runs = len(markdown_to_text(content)[1])
+        print(f"{size_mb:>6g}MB {old:>9.2f} {new:>9.2f} {old / new:>7.1f}x {runs:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark the offline bibliographic index: ingest time and DOI/ISBN/fuzzy-title lookup latency
+
+Usage: python benchmarks/bench_offline_index.py [--works 100000] [--queries 1000]
+
+Synthetic CrossRef-style works get random four-to-eight word titles from a
+2000-word vocabulary; title queries drop one word and misspell another.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.offline_index import OfflineIndex
+
+
+def make_works(count: int, rng: random.Random):
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 10))) for _ in range(2000)]
+    for number in range(count):
+        yield {
+            'DOI': f"10.{1000 + number % 9000}/bench.{number}",
+            'ISBN': [f"978{number:09d}0"],
+            'title': [' '.join(rng.choice(vocabulary) for _ in range(rng.randint(4, 8)))],
+            'author': [{'given': 'Ann', 'family': f"Author{number % 500}"}],
+            'published-print': {'date-parts': [[1990 + number % 35]]},
+        }
+
+
+def garble(title: str, rng: random.Random) -> str:
+    words = title.split()
+    words.pop(rng.randrange(len(words)))
+    position = rng.randrange(len(words))
+    word = words[position]
+    words[position] = word[:-2] + word[-1] + word[-2] if len(word) > 2 else word
+    return ' '.join(words)
+
+
+def per_lookup(function, arguments):
+    started = time.perf_counter()
+    hits = sum(1 for argument in arguments if function(argument))
+    return (time.perf_counter() - started) / len(arguments) * 1000, hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--works', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as directory:
+        works = list(make_works(args.works, rng))
+        index = OfflineIndex(os.path.join(directory, 'index.sqlite'))
+        started = time.perf_counter()
+        index.add_works(works)
+        print(f"ingest {args.works} works: {time.perf_counter() - started:.1f} s, "
+              f"{os.path.getsize(index.path) / 1024 / 1024:.0f} MB")
+
+        sample = rng.sample(works, args.queries)
+        for name, function, arguments in (
+            ('doi', index.get_by_doi, [work['DOI'].upper() for work in sample]),
+            ('isbn', index.get_by_isbn, [work['ISBN'][0] for work in sample]),
+            ('title', index.search_title, [garble(work['title'][0], rng) for work in sample]),
+        ):
+            milliseconds, hits = per_lookup(function, arguments)
+            print(f"{name:>6}: {milliseconds:.3f} ms per lookup, {hits}/{len(arguments)} found")
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
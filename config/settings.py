@@ -1,3 +1,4 @@
+import os
 from dataclasses import dataclass
 from typing import Optional, List, Dict
 
@@ -13,6 +14,7 @@ class Settings:
     enable_web_search: bool = True
     preferred_model: Optional[str] = None  # Preferred model to use
     enable_model_fallback: bool = True  # Enable automatic fallback to other models
+    model_preset: Optional[str] = None  # Key into MODEL_PRESETS to load-balance across
     
     def is_valid(self) -> bool:
         """Check if settings are valid"""
@@ -141,9 +143,18 @@ CITATION_STYLES = {
     }
 }
 
+# CSL (Citation Style Language) styles: every .csl file here is offered as a citation style
+# named after the file, replacing a built-in style of the same name; CSL_STYLES_DIR in the
+# environment points elsewhere
+CSL_STYLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "csl")
+
 # File upload configurations
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
 ALLOWED_FILE_TYPES = ["txt", "pdf", "docx", "md"]
+EXTRACTION_CACHE_MAX_BYTES = 64 * 1024 * 1024  # extracted text kept in memory, keyed by file hash
+EXTRACTION_CACHE_DISK_BYTES = 512 * 1024 * 1024  # cap for the optional on-disk cache (EXTRACTION_CACHE_DIR)
+ENCODING_SAMPLE_BYTES = 64 * 1024  # bytes given to the encoding detector when text isn't UTF-8
+MAPPED_WINDOW_BYTES = 4 * 1024 * 1024  # bytes scanned at a time when analyzing a large text file in place
 FILE_TYPE_NAMES = {
     "txt": "Plain Text",
     "pdf": "PDF Document",
@@ -155,11 +166,54 @@ FILE_TYPE_NAMES = {
 API_TIMEOUT = 30  # seconds
 MAX_RETRIES = 3
 RATE_LIMIT_COOLDOWN = 300  # 5 minutes in seconds
+CIRCUIT_MAX_COOLDOWN = 1800  # longest a model's circuit stays open after repeated failed probes
+QUOTA_MAX_WAIT = 60  # max seconds to wait for per-minute model quota to free up
+HTTP_MAX_CONNECTIONS = 20  # pooled keep-alive connections per event loop
+HTTP_CONCURRENCY = 10  # max in-flight lookups in batch operations
+# CrossRef work fields DOIValidator reads; a lookup asks for only these (CrossRef's select
+# parameter), which keeps the reference list, often hundreds of KB, off the wire
+CROSSREF_WORK_FIELDS = ("DOI", "title", "author", "published-print", "published-online", "issued", "created",
+                        "container-title", "type", "publisher", "volume", "issue", "page", "is-referenced-by-count",
+                        "ISSN", "ISBN", "subject")
+CROSSREF_EXTRA_FIELDS = ("abstract", "license")  # fetched only when a lookup asks for them
+
+# Offline bibliographic index (an SQLite file named by OFFLINE_INDEX_PATH, checked before live APIs)
+OFFLINE_INGEST_BATCH = 5000  # records inserted per executemany when ingesting a dump
+OFFLINE_QUERY_TRIGRAMS = 12  # rarest title trigrams used to find fuzzy-match candidates
+OFFLINE_CANDIDATES = 20  # candidates re-ranked by trigram similarity per title search
+OFFLINE_TITLE_THRESHOLD = 0.5  # minimum trigram similarity for an offline title match
+OFFLINE_CACHE_KIB = 64 * 1024  # SQLite page cache per index connection; keeps bulk ingests off the disk
+
+# Fuzzy matching of citations to search results
+MATCH_WEIGHTS = {"title": 0.6, "authors": 0.25, "year": 0.15}  # score weights of the fields a citation and candidate both have
+TITLE_MATCH_THRESHOLD = 0.85  # title similarity that counts as the same title
+TITLE_MISMATCH_THRESHOLD = 0.5  # title similarity below which the titles differ
+
+# Per-host request limits (rate in requests per second, burst in requests)
+RATE_LIMITS = {
+    "api.crossref.org": {"rate": 10, "burst": 10},
+    "export.arxiv.org": {"rate": 1 / 3, "burst": 1},  # arXiv asks for 3 seconds between calls
+    "api.semanticscholar.org": {"rate": 1, "burst": 1},
+    "eutils.ncbi.nlm.nih.gov": {"rate": 3, "burst": 3},  # PubMed limit without an API key
+    "openlibrary.org": {"rate": 2, "burst": 2}
+}
+DEFAULT_RATE_LIMIT = {"rate": 5, "burst": 5}
+RETRY_AFTER_DEFAULT = 5  # seconds to back off on 429/503 without a Retry-After header
+RETRY_AFTER_MAX = 120  # never honour a Retry-After longer than this
 
 # Analysis configurations
 MIN_CITATION_LENGTH = 10  # characters
 MAX_CITATIONS_PER_ANALYSIS = 500
 BATCH_SIZE = 10  # for batch processing
+EXPORT_BATCH_ROWS = 50000  # rows per Parquet row group / Arrow batch / CSV chunk when exporting reports
+AI_CONCURRENCY = 4  # citations analyzed by the AI provider at the same time
+
+# Tiered analysis: citations the rules can't settle go to the first tier's models and
+# move on to the next tier while the answer's confidence is below the threshold
+ANALYSIS_TIERS = {
+    "small": ["gemini-2.5-flash-lite", "gemma-3n-e4b-it", "gemini-2.0-flash-lite"],
+    "large": ["gemini-2.5-pro", "gemini-2.5-flash"]
+}
 
 # UI configurations
 THEME_COLORS = {
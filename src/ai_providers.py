@@ -2,10 +2,16 @@ from abc import ABC, abstractmethod
 from typing import Optional, Dict, Any, List
 import os
 import json
+import math
 import google.generativeai as genai
 import time
 import logging
 from dotenv import load_dotenv
+import threading
+from config.settings import QUOTA_MAX_WAIT, MODEL_PRESETS
+from src.quota_scheduler import get_quota_scheduler
+from src.model_balancer import ModelLoadBalancer
+from src.circuit_breaker import CircuitBreaker, get_breaker
 
 # Try to import streamlit for cloud deployment
 try:
@@ -21,12 +27,14 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PROBE_TOKENS = 20  # rough token cost of a connectivity probe
+
 class AIProvider(ABC):
     """Abstract base class for AI providers"""
     
     @abstractmethod
-    def analyze_citation(self, prompt: str) -> str:
-        """Analyze a citation using the AI model"""
+    def analyze_citation(self, prompt: str, models: Optional[List[str]] = None) -> str:
+        """Analyze a citation using the AI model, optionally restricted to `models`"""
         pass
     
     @abstractmethod
@@ -38,43 +46,88 @@ class GeminiProvider(AIProvider):
     """Google Gemini API provider implementation with multi-model support"""
     
     # Available models in order of preference (fallback order)
+    # rpm/tpm are the per-minute request and token quotas the scheduler keeps under
     AVAILABLE_MODELS = [
         {
             'name': 'gemini-2.5-flash-lite',
             'description': 'Latest experimental flash model',
             'max_tokens': 1000,
-            'temperature': 0.3
+            'temperature': 0.3,
+            'rpm': 15,
+            'tpm': 250000
         },
         {
             'name': 'gemini-2.5-pro',
             'description': 'Fast and efficient model',
             'max_tokens': 1000,
-            'temperature': 0.3
+            'temperature': 0.3,
+            'rpm': 5,
+            'tpm': 250000
         },
         {
             'name': 'gemini-2.0-flash-lite',
             'description': 'Lightweight flash model',
             'max_tokens': 1000,
-            'temperature': 0.3
+            'temperature': 0.3,
+            'rpm': 30,
+            'tpm': 1000000
         },
         {
             'name': 'gemini-2.5-flash',
             'description': 'High quality model',
             'max_tokens': 1000,
-            'temperature': 0.3
+            'temperature': 0.3,
+            'rpm': 10,
+            'tpm': 250000
         },
         {
             'name': 'gemini-2.0-flash',
             'description': 'Previous generation model',
             'max_tokens': 1000,
-            'temperature': 0.3
+            'temperature': 0.3,
+            'rpm': 15,
+            'tpm': 1000000
+        },
+        {
+            'name': 'gemma-3n-e4b-it',
+            'description': 'Larger Gemma variant',
+            'max_tokens': 1000,
+            'temperature': 0.3,
+            'rpm': 30,
+            'tpm': 15000
+        },
+        {
+            'name': 'gemma-3n-e2b-it',
+            'description': 'Efficient Gemma variant',
+            'max_tokens': 1000,
+            'temperature': 0.3,
+            'rpm': 30,
+            'tpm': 15000
+        },
+        {
+            'name': 'gemma-3-1b-it',
+            'description': 'Lightweight open model',
+            'max_tokens': 1000,
+            'temperature': 0.3,
+            'rpm': 30,
+            'tpm': 15000
         }
     ]
     
-    def __init__(self, api_key: Optional[str] = None, preferred_model: Optional[str] = None):
-        # Initialize rate limit tracking FIRST
-        self.rate_limit_errors = {}
-        self.rate_limit_reset_time = {}
+    def __init__(self, api_key: Optional[str] = None, preferred_model: Optional[str] = None, preset: Optional[str] = None):
+        # Initialize rate limit tracking FIRST (breakers and quotas are shared by every provider)
+        self.breakers = {model_config['name']: get_breaker(model_config['name']) for model_config in self.AVAILABLE_MODELS}
+        self.quota_scheduler = get_quota_scheduler(self.AVAILABLE_MODELS)
+        self._models = {}
+        self._model_lock = threading.Lock()
+        
+        # With a preset, requests are spread across the preset's models
+        known_models = [model_config['name'] for model_config in self.AVAILABLE_MODELS]
+        self.preset = preset if preset in MODEL_PRESETS else None
+        self.balancer = None
+        if self.preset:
+            preset_models = [name for name in MODEL_PRESETS[self.preset]['models'] if name in known_models]
+            self.balancer = ModelLoadBalancer(preset_models, self.quota_scheduler)
         
         # Get API key from multiple sources
         self.api_key = api_key
@@ -96,7 +149,9 @@ class GeminiProvider(AIProvider):
         # Configure the API
         genai.configure(api_key=self.api_key)
         
-        # Set preferred model if specified
+        # Set preferred model if specified (the preset's first model when balancing)
+        if self.balancer and self.balancer.models and preferred_model not in self.balancer.models:
+            preferred_model = self.balancer.models[0]
         self.preferred_model = preferred_model
         self.current_model_index = 0
         self.model = None
@@ -106,7 +161,11 @@ class GeminiProvider(AIProvider):
         self._initialize_model()
     
     def _initialize_model(self):
-        """Initialize the model with fallback support"""
+        """Initialize the model with fallback support
+        
+        Models whose circuit is open are skipped without a probe. If every model
+        is rate limited the provider starts in degraded mode instead of failing.
+        """
         models_to_try = self.AVAILABLE_MODELS.copy()
         
         # If preferred model is specified, try it first
@@ -120,122 +179,189 @@ class GeminiProvider(AIProvider):
                     models_to_try.insert(0, preferred_config)
                     break
         
+        last_error = None
+        
         # Try each model until one works
-        for i, model_config in enumerate(models_to_try):
+        for model_config in models_to_try:
+            model_name = model_config['name']
+            breaker = self.breakers[model_name]
+            
+            # Check if model is in rate limit cooldown
+            if not breaker.allow_request():
+                logger.info(f"Model {model_name} is in rate limit cooldown, skipping...")
+                continue
+            
             try:
-                model_name = model_config['name']
-                
-                # Check if model is in rate limit cooldown
-                if model_name in self.rate_limit_reset_time:
-                    if time.time() < self.rate_limit_reset_time[model_name]:
-                        logger.info(f"Model {model_name} is in rate limit cooldown, skipping...")
-                        continue
-                    else:
-                        # Reset time has passed, clear the rate limit
-                        del self.rate_limit_reset_time[model_name]
-                        if model_name in self.rate_limit_errors:
-                            del self.rate_limit_errors[model_name]
-                
                 logger.info(f"Attempting to initialize model: {model_name}")
                 
-                self.model = genai.GenerativeModel(
-                    model_name,
-                    generation_config=genai.GenerationConfig(
-                        temperature=model_config['temperature'],
-                        max_output_tokens=model_config['max_tokens'],
-                    )
-                )
+                model = self._get_model(model_name)
                 
                 # Test the model with a simple prompt
-                test_response = self.model.generate_content("Say 'OK' if you can read this.")
+                self.quota_scheduler.record(model_name, PROBE_TOKENS)
+                test_response = model.generate_content("Say 'OK' if you can read this.")
                 if test_response and test_response.text:
-                    self.model_name = model_name
-                    self.current_model_index = i
+                    breaker.record_success()
+                    self._activate_model(model_name)
                     logger.info(f"Successfully initialized model: {model_name}")
                     return
+                breaker.release()
                     
             except Exception as e:
-                logger.warning(f"Failed to initialize model {model_config['name']}: {str(e)}")
-                continue
+                logger.warning(f"Failed to initialize model {model_name}: {str(e)}")
+                if self._is_rate_limit_error(str(e)):
+                    breaker.record_failure()
+                else:
+                    breaker.release()
+                    last_error = e
         
-        raise ValueError("Failed to initialize any available model. Please check your API key and quota.")
+        if last_error is not None:
+            raise ValueError("Failed to initialize any available model. Please check your API key and quota.")
+        
+        # Every model is rate limited: run degraded rather than refusing to start
+        logger.warning("All models are rate limited; starting in degraded mode")
+        self.model = None
+        self.model_name = None
+    
+    def _switch_to_next_model(self) -> bool:
+        """Switch to the next model whose circuit is not open (no probe call)"""
+        for offset in range(1, len(self.AVAILABLE_MODELS) + 1):
+            index = (self.current_model_index + offset) % len(self.AVAILABLE_MODELS)
+            model_name = self.AVAILABLE_MODELS[index]['name']
+            if self.breakers[model_name].available():
+                logger.info(f"Switching to model: {model_name}")
+                self._activate_model(model_name)
+                return True
+        return False
+    
+    @staticmethod
+    def _is_rate_limit_error(error_message: str) -> bool:
+        """Whether an API error means the model's quota is exhausted"""
+        error_message = error_message.lower()
+        return "quota" in error_message or "rate" in error_message or "429" in error_message
+    
+    def is_degraded(self) -> bool:
+        """Whether every model's circuit is open"""
+        return not any(breaker.available() for breaker in self.breakers.values())
     
-    def _switch_to_next_model(self):
-        """Switch to the next available model"""
-        original_index = self.current_model_index
-        attempts = 0
+    def _degraded_response(self) -> str:
+        """Fail-fast response used when no model can take the request"""
+        retry_after = min(breaker.retry_after() for breaker in self.breakers.values())
+        return json.dumps({
+            "is_valid": None,
+            "confidence_score": 0.0,
+            "issues": [],
+            "suggestions": [],
+            "model_used": None,
+            "degraded": True,
+            "retry_after": int(retry_after)
+        })
+    
+    def _quota_exhausted_response(self, retry_after: float) -> str:
+        """Response used when no model's quota frees up within QUOTA_MAX_WAIT"""
+        return json.dumps({
+            "is_valid": None,
+            "confidence_score": 0.0,
+            "issues": [],
+            "suggestions": [],
+            "model_used": None,
+            "quota_exhausted": True,
+            "retry_after": math.ceil(retry_after)
+        })
+    
+    def analyze_citation(self, prompt: str, models: Optional[List[str]] = None) -> str:
+        """Analyze citation using Gemini with automatic model fallback
         
-        while attempts < len(self.AVAILABLE_MODELS):
-            self.current_model_index = (self.current_model_index + 1) % len(self.AVAILABLE_MODELS)
-            model_config = self.AVAILABLE_MODELS[self.current_model_index]
-            model_name = model_config['name']
+        Rate-limited models trip their circuit breaker and the request moves on
+        to another model. When every circuit is open the call returns a
+        "degraded" result immediately instead of probing the API, and when no
+        model's quota frees up in time it returns a "quota_exhausted" result
+        with the scheduler's wait. `models` restricts routing to one analysis tier.
+        """
+        max_attempts = min(3, len(models or self.AVAILABLE_MODELS))
+        
+        # System instruction for citation analysis
+        system_prompt = """You are an expert citation analyst. Analyze citations for:
+        1. Format correctness according to citation styles (APA, MLA, Chicago, Harvard and all other styles)
+        2. Completeness of information (author, year, title, source, etc.)
+        3. Common formatting errors and issues
+        4. Specific improvements that would make the citation correct
+        
+        Always respond in valid JSON format with this exact structure:
+        {
+            "is_valid": boolean,
+            "confidence_score": float between 0 and 1,
+            "issues": ["specific issue 1", "specific issue 2"],
+            "suggestions": ["specific suggestion 1", "specific suggestion 2"]
+        }
+        
+        Be specific in your issues and suggestions. Don't use generic phrases."""
+        
+        # Combine system and user prompts
+        full_prompt = f"{system_prompt}\n\n{prompt}"
+        
+        tried = set()
+        for _ in range(max_attempts):
+            candidates = [name for name in self._quota_candidates(models) if name not in tried]
+            if not candidates:
+                break
             
-            # Check if model is in rate limit cooldown
-            if model_name in self.rate_limit_reset_time:
-                if time.time() < self.rate_limit_reset_time[model_name]:
-                    attempts += 1
-                    continue
-                else:
-                    # Reset time has passed, clear the rate limit
-                    del self.rate_limit_reset_time[model_name]
-                    if model_name in self.rate_limit_errors:
-                        del self.rate_limit_errors[model_name]
+            # Route to a model with quota headroom before sending, rather than waiting for a 429
+            model_config = self._get_model_config(candidates[0])
+            estimated_tokens = self.quota_scheduler.estimate_tokens(full_prompt, model_config['max_tokens'])
+            model_name = self.quota_scheduler.acquire(candidates, estimated_tokens, timeout=QUOTA_MAX_WAIT)
+            if model_name is None:
+                return self._quota_exhausted_response(self.quota_scheduler.wait_time(candidates, estimated_tokens))
+            
+            breaker = self.breakers[model_name]
+            tried.add(model_name)
+            if not breaker.allow_request():
+                # Another request is already probing this half-open model; nothing is sent
+                self.quota_scheduler.release(model_name, estimated_tokens)
+                continue
             
             try:
-                logger.info(f"Switching to model: {model_name}")
+                # The chosen model stays local to this call: concurrent calls (e.g. on other
+                # analysis tiers) route independently and never change the provider's current model
+                started = time.time()
+                response = self._get_model(model_name).generate_content(full_prompt)
+                breaker.record_success()
+                if self.balancer:
+                    self.balancer.record_latency(model_name, time.time() - started)
+                self._record_token_usage(model_name, estimated_tokens, response)
                 
-                self.model = genai.GenerativeModel(
-                    model_name,
-                    generation_config=genai.GenerationConfig(
-                        temperature=model_config['temperature'],
-                        max_output_tokens=model_config['max_tokens'],
-                    )
-                )
+                return self._parse_response(response, model_name)
                 
-                # Test the model
-                test_response = self.model.generate_content("Say 'OK' if you can read this.")
-                if test_response and test_response.text:
-                    self.model_name = model_name
-                    logger.info(f"Successfully switched to model: {model_name}")
-                    return True
-                    
             except Exception as e:
-                logger.warning(f"Failed to switch to model {model_name}: {str(e)}")
-            
-            attempts += 1
+                error_message = str(e)
+                logger.error(f"Error with model {model_name}: {error_message}")
+                
+                # Check for rate limit errors
+                if self._is_rate_limit_error(error_message):
+                    # Open this model's circuit and fall through to the next one
+                    breaker.record_failure()
+                    logger.info(f"Rate limit reached for {model_name}, attempting fallback...")
+                    continue
+                
+                breaker.release()
+                
+                # Handle other errors
+                if "API key" in error_message:
+                    error_message = "Invalid API key. Please check your Gemini API key."
+                
+                return json.dumps({
+                    "is_valid": None,
+                    "confidence_score": 0.0,
+                    "issues": [f"API Error: {error_message}"],
+                    "suggestions": ["Please check your API configuration and try again"],
+                    "model_used": model_name,
+                    "error": True
+                })
         
-        # If we couldn't switch to any model, try reinitializing
-        self.current_model_index = original_index
-        self._initialize_model()
-        return False
+        return self._degraded_response()
     
-    def analyze_citation(self, prompt: str, retry_count: int = 0) -> str:
-        """Analyze citation using Gemini with automatic model fallback"""
-        max_retries = min(3, len(self.AVAILABLE_MODELS))
-        
+    def _parse_response(self, response, model_name: str) -> str:
+        """Normalize a model response into the analysis JSON"""
         try:
-            # System instruction for citation analysis
-            system_prompt = """You are an expert citation analyst. Analyze citations for:
-            1. Format correctness according to citation styles (APA, MLA, Chicago, Harvard and all other styles)
-            2. Completeness of information (author, year, title, source, etc.)
-            3. Common formatting errors and issues
-            4. Specific improvements that would make the citation correct
-            
-            Always respond in valid JSON format with this exact structure:
-            {
-                "is_valid": boolean,
-                "confidence_score": float between 0 and 1,
-                "issues": ["specific issue 1", "specific issue 2"],
-                "suggestions": ["specific suggestion 1", "specific suggestion 2"]
-            }
-            
-            Be specific in your issues and suggestions. Don't use generic phrases."""
-            
-            # Combine system and user prompts
-            full_prompt = f"{system_prompt}\n\n{prompt}"
-            
-            response = self.model.generate_content(full_prompt)
-            
             # Clean response text
             response_text = response.text.strip()
             
@@ -249,57 +375,87 @@ class GeminiProvider(AIProvider):
             
             response_text = response_text.strip()
             
-            # Validate JSON
-            try:
-                result = json.loads(response_text)
-                # Ensure all required fields are present
-                if not all(key in result for key in ["is_valid", "confidence_score", "issues", "suggestions"]):
-                    raise ValueError("Missing required fields in response")
-                
-                # Add model info to response
-                result["model_used"] = self.model_name
-                return json.dumps(result)
-                
-            except:
-                # If JSON parsing fails, return a default response
-                return json.dumps({
-                    "is_valid": None,
-                    "confidence_score": 0.0,
-                    "issues": ["Unable to parse AI response"],
-                    "suggestions": ["Please try again"],
-                    "model_used": self.model_name
-                })
-            
-        except Exception as e:
-            error_message = str(e)
-            logger.error(f"Error with model {self.model_name}: {error_message}")
+            result = json.loads(response_text)
+            # Ensure all required fields are present
+            if not all(key in result for key in ["is_valid", "confidence_score", "issues", "suggestions"]):
+                raise ValueError("Missing required fields in response")
             
-            # Check for rate limit errors
-            if "quota" in error_message.lower() or "rate" in error_message.lower() or "429" in error_message:
-                # Mark this model as rate limited
-                self.rate_limit_errors[self.model_name] = time.time()
-                self.rate_limit_reset_time[self.model_name] = time.time() + 300  # 5 minute cooldown
-                
-                logger.info(f"Rate limit reached for {self.model_name}, attempting fallback...")
-                
-                # Try to switch to next model
-                if retry_count < max_retries:
-                    if self._switch_to_next_model():
-                        return self.analyze_citation(prompt, retry_count + 1)
-            
-            # Handle other errors
-            if "API key" in error_message:
-                error_message = "Invalid API key. Please check your Gemini API key."
+            # Add model info to response
+            result["model_used"] = model_name
+            return json.dumps(result)
             
+        except:
+            # If JSON parsing fails, return a default response
             return json.dumps({
                 "is_valid": None,
                 "confidence_score": 0.0,
-                "issues": [f"API Error: {error_message}"],
-                "suggestions": ["Please check your API configuration and try again"],
-                "model_used": self.model_name,
-                "error": True
+                "issues": ["Unable to parse AI response"],
+                "suggestions": ["Please try again"],
+                "model_used": model_name
             })
     
+    def _get_model_config(self, model_name: Optional[str]) -> Dict[str, Any]:
+        """Get the configuration entry for a model"""
+        for model_config in self.AVAILABLE_MODELS:
+            if model_config['name'] == model_name:
+                return model_config
+        return self.AVAILABLE_MODELS[0]
+    
+    def _quota_candidates(self, models: Optional[List[str]] = None) -> List[str]:
+        """Models to route to: the balancer's pick or the current one first, then the rest not in cooldown"""
+        open_circuits = [name for name, breaker in self.breakers.items() if not breaker.available()]
+        if self.balancer:
+            candidates = self.balancer.order(exclude=open_circuits)
+        else:
+            candidates = [self.model_name] if self.model_name and self.model_name not in open_circuits else []
+            for model_config in self.AVAILABLE_MODELS:
+                model_name = model_config['name']
+                if model_name in candidates or model_name in open_circuits:
+                    continue
+                candidates.append(model_name)
+        
+        if models:
+            # Keep the routing order within the tier, then add tier models outside the preset
+            candidates = [name for name in candidates if name in models]
+            candidates += [name for name in models
+                           if name in self.breakers and name not in candidates and name not in open_circuits]
+        return candidates
+    
+    def _get_model(self, model_name: str):
+        """Get a cached model handle, creating it without a probe call"""
+        with self._model_lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model_config = self._get_model_config(model_name)
+                model = genai.GenerativeModel(
+                    model_name,
+                    generation_config=genai.GenerationConfig(
+                        temperature=model_config['temperature'],
+                        max_output_tokens=model_config['max_tokens'],
+                    )
+                )
+                self._models[model_name] = model
+        return model
+    
+    def _activate_model(self, model_name: str):
+        """Make a model current, for connection checks and status, without a probe call"""
+        self.model = self._get_model(model_name)
+        self.model_name = model_name
+        self.current_model_index = self.AVAILABLE_MODELS.index(self._get_model_config(model_name))
+    
+    def _record_token_usage(self, model_name: str, estimated_tokens: int, response):
+        """Replace the token estimate with the count reported by the API, if any"""
+        try:
+            actual_tokens = response.usage_metadata.total_token_count
+        except AttributeError:
+            return
+        if actual_tokens:
+            self.quota_scheduler.record_usage(model_name, estimated_tokens, actual_tokens)
+    
+    def get_quota_utilization(self) -> Dict[str, Dict[str, Any]]:
+        """Get per-model requests/tokens used in the current minute against their limits"""
+        return self.quota_scheduler.utilization()
+    
     def check_connection(self) -> bool:
         """Check Gemini API connection"""
         try:
@@ -308,7 +464,8 @@ class GeminiProvider(AIProvider):
         except:
             # Try to switch model if current one fails
             try:
-                self._switch_to_next_model()
+                if not self._switch_to_next_model():
+                    return False
                 response = self.model.generate_content("Say 'connected' if you can read this.")
                 return "connected" in response.text.lower()
             except:
@@ -323,28 +480,27 @@ class GeminiProvider(AIProvider):
                         'name': self.model_name,
                         'description': model_config['description'],
                         'status': 'active',
-                        'rate_limited': self.model_name in self.rate_limit_errors
+                        'rate_limited': self.breakers[self.model_name].current_state() != CircuitBreaker.CLOSED
                     }
         return {'name': 'Unknown', 'status': 'error'}
     
     def get_all_models_status(self) -> List[Dict[str, Any]]:
         """Get status of all available models"""
         models_status = []
+        utilization = self.get_quota_utilization()
         for model_config in self.AVAILABLE_MODELS:
             model_name = model_config['name']
             status = {
                 'name': model_name,
                 'description': model_config['description'],
                 'active': model_name == self.model_name,
-                'rate_limited': model_name in self.rate_limit_errors,
-                'cooldown_remaining': 0
+                'rate_limited': self.breakers[model_name].current_state() != CircuitBreaker.CLOSED,
+                'cooldown_remaining': int(self.breakers[model_name].retry_after()),
+                'circuit': self.breakers[model_name].current_state(),
+                'quota': utilization.get(model_name, {}),
+                'in_preset': bool(self.balancer) and model_name in self.balancer.models
             }
             
-            if model_name in self.rate_limit_reset_time:
-                remaining = self.rate_limit_reset_time[model_name] - time.time()
-                if remaining > 0:
-                    status['cooldown_remaining'] = int(remaining)
-                    
             models_status.append(status)
             
         return models_status
@@ -352,7 +508,7 @@ class GeminiProvider(AIProvider):
 class MockProvider(AIProvider):
     """Mock provider for testing without API key"""
     
-    def analyze_citation(self, prompt: str) -> str:
+    def analyze_citation(self, prompt: str, models: Optional[List[str]] = None) -> str:
         """Return mock analysis"""
         # Extract citation text from prompt for more realistic mock response
         citation_text = prompt.split('"')[1] if '"' in prompt else "Unknown citation"
@@ -0,0 +1,290 @@
+import json
+import re
+import unicodedata
+from typing import List, Dict, Any, Optional, Tuple
+
+# BibTeX/RIS entry types as CrossRef work types
+BIBTEX_TYPES = {
+    'article': 'journal-article',
+    'book': 'book',
+    'inbook': 'book-chapter',
+    'incollection': 'book-chapter',
+    'inproceedings': 'proceedings-article',
+    'conference': 'proceedings-article',
+    'phdthesis': 'dissertation',
+    'mastersthesis': 'dissertation',
+    'techreport': 'report',
+}
+RIS_TYPES = {
+    'JOUR': 'journal-article',
+    'JFULL': 'journal-article',
+    'BOOK': 'book',
+    'CHAP': 'book-chapter',
+    'CONF': 'proceedings-article',
+    'CPAPER': 'proceedings-article',
+    'THES': 'dissertation',
+    'RPRT': 'report',
+}
+CSL_TYPES = {
+    'article-journal': 'journal-article',
+    'book': 'book',
+    'chapter': 'book-chapter',
+    'paper-conference': 'proceedings-article',
+    'thesis': 'dissertation',
+    'report': 'report',
+}
+
+# LaTeX accent commands and the combining marks they stand for
+LATEX_ACCENTS = {'"': '\u0308', "'": '\u0301', '`': '\u0300', '^': '\u0302', '~': '\u0303', '=': '\u0304',
+                 '.': '\u0307', 'c': '\u0327', 'v': '\u030c', 'u': '\u0306', 'H': '\u030b'}
+LATEX_ACCENT = re.compile(r'\\(["\'`^~=.]|[cvuH](?=[\s{]))\s*(?:\{\s*(\w)\s*\}|(\w))')
+LATEX_ESCAPE = re.compile(r'\\([&%$#_{}])')
+LATEX_COMMAND = re.compile(r'\\[A-Za-z]+\s*')
+ENTRY_START = re.compile(r'@\s*(\w+)\s*[{(]')
+ENTRY_KEY = re.compile(r'\s*([^,\s]*)\s*,')
+FIELD_NAME = re.compile(r'\s*(\w[\w-]*)\s*=\s*')
+# A whole field whose value has no nested braces, quotes or escapes (most of them), in one match
+SIMPLE_FIELD = re.compile(r'\s*(\w[\w-]*)\s*=\s*(?:\{([^{}"\\]*)\}|"([^{}"\\]*)"|(\w+)(?=\s*[,})]))\s*,?')
+FIELD_SEPARATOR = re.compile(r'\s*,?')
+BARE_VALUE = re.compile(r'[^,}\s)]*')
+VALUE_DELIMITER = re.compile(r'\\.|[{}"]', re.DOTALL)
+LATEX_MARKUP = re.compile(r'[\\{}~]|--')
+DOI_PREFIX = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)', re.IGNORECASE)
+YEAR_DIGITS = re.compile(r'\d{4}')
+AUTHOR_SEPARATOR = re.compile(r'[{}]|\s+and\s+')
+RIS_LINE = re.compile(r'^\ufeff?([A-Z][A-Z0-9])  -[ \t]?(.*)', re.MULTILINE)
+NAME_PARTICLE = re.compile(r'^(?:van|von|der|den|de|del|della|di|da|du|la|le|ten|ter)$')
+
+
+def clean_doi(doi: str) -> str:
+    """DOI without URL or doi: prefix"""
+    return DOI_PREFIX.sub('', doi.strip())
+
+
+def split_name(name: str) -> Dict[str, str]:
+    """A "Family, Given" or "Given [particles] Family" name as CrossRef given/family parts"""
+    name = ' '.join(name.split())
+    if ',' in name:
+        family, given = name.split(',', 1)
+        return {'given': given.strip(), 'family': family.strip()}
+    words = name.split(' ')
+    start = len(words) - 1
+    while start > 1 and NAME_PARTICLE.match(words[start - 1]):
+        start -= 1
+    return {'given': ' '.join(words[:start]), 'family': ' '.join(words[start:])}
+
+
+def _work(entry_type: str, key: Optional[str], title: str, authors: List[Dict[str, str]], year: Optional[str],
+          month: Optional[str], fields: Dict[str, str], isbns: List[str]) -> Dict[str, Any]:
+    """A bibliography entry in CrossRef work form, so existing work parsers can read it"""
+    work = {'type': entry_type, 'title': [title] if title else [], 'author': authors}
+    if key:
+        work['citation-key'] = key
+    year_match = YEAR_DIGITS.search(year or '')
+    if year_match:
+        date_parts = [int(year_match.group())]
+        if month and month.isdigit() and 1 <= int(month) <= 12:
+            date_parts.append(int(month))
+        work['published-print'] = {'date-parts': [date_parts]}
+    if fields.get('container'):
+        work['container-title'] = [fields['container']]
+    for name in ('volume', 'issue', 'page', 'publisher', 'URL'):
+        if fields.get(name):
+            work[name] = fields[name]
+    if fields.get('DOI'):
+        work['DOI'] = clean_doi(fields['DOI'])
+    if isbns:
+        work['ISBN'] = isbns
+    return work
+
+
+def latex_to_text(value: str) -> str:
+    """Plain text of a BibTeX value: accents composed, escapes and braces removed"""
+    if not LATEX_MARKUP.search(value):
+        value = ' '.join(value.split())
+        return value if value.isascii() else unicodedata.normalize('NFC', value)
+    value = LATEX_ACCENT.sub(lambda m: (m.group(2) or m.group(3)) + LATEX_ACCENTS[m.group(1)], value)
+    value = LATEX_ESCAPE.sub(r'\1', value)
+    value = LATEX_COMMAND.sub('', value)
+    value = value.replace('{', '').replace('}', '').replace('---', '—').replace('--', '–').replace('~', ' ')
+    return unicodedata.normalize('NFC', ' '.join(value.split()))
+
+
+def _read_value(text: str, index: int) -> Tuple[str, int]:
+    """Raw value starting at `index` (braced, quoted, or a bare word) and the index after it"""
+    opening = text[index]
+    if opening not in '{"':
+        match = BARE_VALUE.match(text, index)
+        return match.group(), match.end()
+    depth = 0
+    # Only braces, quotes and escapes matter; the scan jumps from one to the next
+    for match in VALUE_DELIMITER.finditer(text, index):
+        char = match.group()
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0 and opening == '{':
+                return text[index + 1:match.start()], match.end()
+        elif char == '"' and opening == '"' and depth == 0 and match.start() > index:
+            return text[index + 1:match.start()], match.end()
+    return text[index + 1:], len(text)
+
+
+def _split_authors(value: str) -> List[str]:
+    """Names of a BibTeX author list, splitting on "and" outside braces"""
+    names, depth, start = [], 0, 0
+    for match in AUTHOR_SEPARATOR.finditer(value):
+        token = match.group()
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+        elif depth == 0:
+            names.append(value[start:match.start()])
+            start = match.end()
+    names.append(value[start:])
+    return [name for name in names if name.strip()]
+
+
+def _bibtex_author(name: str) -> Dict[str, str]:
+    stripped = name.strip()
+    if stripped.startswith('{') and stripped.endswith('}'):
+        # A braced name is an organization and isn't split
+        return {'given': '', 'family': latex_to_text(stripped)}
+    parts = split_name(name)
+    return {'given': latex_to_text(parts['given']), 'family': latex_to_text(parts['family'])}
+
+
+def parse_bibtex(text: str) -> List[Dict[str, Any]]:
+    """Entries of a BibTeX library as CrossRef-style works (with 'citation-key')
+
+    Handles braced, quoted and bare values, nested braces, LaTeX accents
+    and "and"-separated author lists; @string, @comment and @preamble
+    blocks are skipped.
+    """
+    works = []
+    for match in ENTRY_START.finditer(text):
+        entry_type = match.group(1).lower()
+        if entry_type in ('string', 'comment', 'preamble'):
+            continue
+        index = match.end()
+        key_match = ENTRY_KEY.match(text, index)
+        if not key_match:
+            continue
+        key, index = key_match.group(1), key_match.end()
+
+        fields = {}
+        while True:
+            simple = SIMPLE_FIELD.match(text, index)
+            if simple:
+                name, braced, quoted, bare = simple.groups()
+                fields[name.lower()] = braced if braced is not None else quoted if quoted is not None else bare
+                index = simple.end()
+                continue
+            field_match = FIELD_NAME.match(text, index)
+            if not field_match:
+                break
+            value, index = _read_value(text, field_match.end())
+            fields[field_match.group(1).lower()] = value
+            index = FIELD_SEPARATOR.match(text, index).end()
+
+        authors = [_bibtex_author(name) for name in _split_authors(fields.get('author') or fields.get('editor', ''))]
+        mapped = {
+            'container': latex_to_text(fields.get('journal') or fields.get('booktitle') or ''),
+            'volume': fields.get('volume', ''),
+            'issue': fields.get('number', ''),
+            'page': latex_to_text(fields.get('pages', '')).replace('–', '-'),
+            'publisher': latex_to_text(fields.get('publisher', '')),
+            'URL': fields.get('url', ''),
+            'DOI': fields.get('doi', ''),
+        }
+        isbns = [isbn for isbn in re.split(r'[,;\s]+', fields.get('isbn', '')) if isbn]
+        works.append(_work(BIBTEX_TYPES.get(entry_type, 'other'), key, latex_to_text(fields.get('title', '')),
+                           authors, fields.get('year'), fields.get('month'), mapped, isbns))
+    return works
+
+
+def parse_ris(text: str) -> List[Dict[str, Any]]:
+    """Records of an RIS file as CrossRef-style works (ID becomes 'citation-key')"""
+    works = []
+    tags = {}
+    # Tag lines are found in one scan of the text; anything else is skipped
+    for match in RIS_LINE.finditer(text.replace('\r', '\n')):
+        tag, value = match.group(1), match.group(2).strip()
+        if tag == 'TY':
+            tags = {'TY': [value]}
+        elif tag == 'ER':
+            works.append(_ris_work(tags))
+            tags = {}
+        elif value:
+            tags.setdefault(tag, []).append(value)
+    return works
+
+
+def _ris_work(tags: Dict[str, List[str]]) -> Dict[str, Any]:
+    def first(*names: str) -> str:
+        for name in names:
+            if tags.get(name):
+                return tags[name][0]
+        return ''
+
+    authors = [split_name(name) for name in tags.get('AU', []) + tags.get('A1', [])]
+    date = first('PY', 'Y1', 'DA')
+    date_parts = re.split(r'[/-]', date)
+    pages = first('SP')
+    if first('EP'):
+        pages = f"{pages}-{first('EP')}"
+    # SN holds ISBNs for books and ISSNs for journals; only ISBN-length numbers are kept
+    isbns = [value for value in tags.get('SN', []) if len(re.sub(r'[^\dXx]', '', value)) in (10, 13)]
+    mapped = {
+        'container': first('T2', 'JO', 'JF', 'BT'),
+        'volume': first('VL'),
+        'issue': first('IS'),
+        'page': pages,
+        'publisher': first('PB'),
+        'URL': first('UR'),
+        'DOI': first('DO'),
+    }
+    return _work(RIS_TYPES.get(first('TY'), 'other'), first('ID') or None, first('TI', 'T1'), authors,
+                 date_parts[0], date_parts[1] if len(date_parts) > 1 else None, mapped, isbns)
+
+
+def parse_csl_json(text: str) -> List[Dict[str, Any]]:
+    """Items of a CSL-JSON file (as exported by Zotero or pandoc) as CrossRef-style works (id becomes 'citation-key')"""
+    items = json.loads(text)
+    if isinstance(items, dict):
+        items = items.get('items', [items])
+    return [_csl_work(item) for item in items if isinstance(item, dict)]
+
+
+def _csl_work(item: Dict[str, Any]) -> Dict[str, Any]:
+    authors = []
+    for name in item.get('author') or item.get('editor') or []:
+        if name.get('literal'):
+            authors.append({'given': '', 'family': name['literal']})
+        else:
+            family = ' '.join(part for part in (name.get('non-dropping-particle'), name.get('family')) if part)
+            authors.append({'given': name.get('given', ''), 'family': family})
+
+    # Dates are date-parts, or a raw string such as "2020-05" or "Spring 2020"
+    date = item.get('issued') or {}
+    if not isinstance(date, dict):
+        date = {'raw': str(date)}
+    parts = (date.get('date-parts') or [[]])[0]
+    year = str(parts[0]) if parts and parts[0] else date.get('raw') or date.get('literal')
+    month = str(parts[1]) if len(parts) > 1 else None
+
+    isbn = item.get('ISBN') or ''
+    mapped = {
+        'container': item.get('container-title') or '',
+        'volume': str(item.get('volume') or ''),
+        'issue': str(item.get('issue') or ''),
+        'page': str(item.get('page') or ''),
+        'publisher': item.get('publisher') or '',
+        'URL': item.get('URL') or '',
+        'DOI': item.get('DOI') or '',
+    }
+    return _work(CSL_TYPES.get(item.get('type'), 'other'), str(item['id']) if item.get('id') is not None else None,
+                 item.get('title') or '', authors, year, month, mapped,
+                 [value for value in re.split(r'[,;\s]+', isbn) if value])
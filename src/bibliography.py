@@ -0,0 +1,127 @@
+import re
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+from src.bib_parsers import parse_bibtex, parse_ris, parse_csl_json, clean_doi
+from src.citation_rules import SURNAME
+from src.fuzzy_match import normalize_title
+
+# \cite{a,b}, \citet[p. 4]{a}, \parencite*{a} ... and pandoc's [@a; @b, p. 4] / @a
+LATEX_CITE = re.compile(r'\\[A-Za-z]*cite[A-Za-z]*\*?(?:\[[^\]]*\])*\{([^}]*)\}')
+PANDOC_KEY = re.compile(r'-?@(\w(?:[\w:.#$%&+?<>~/-]*\w)?)')
+DOI = re.compile(r'\b10\.\d{4,9}/[^\s;,)\]]+')
+CITED_SURNAME = re.compile(SURNAME)
+CITED_YEAR = re.compile(r'\b(1[5-9]\d{2}|20\d{2})[a-z]?\b|\bn\.d\.')
+LOCATOR = re.compile(r',?\s*(?:p|pp|para|ch|sec)\.\s*\d.*$')
+
+PARSERS = {'bib': parse_bibtex, 'ris': parse_ris, 'json': parse_csl_json}
+
+
+def _surname_key(name: str) -> str:
+    """Last word of a normalized surname: "van der Berg", "Berg" and "Smith-Berg" all give berg"""
+    if name.isascii() and name.isalpha():
+        return name.lower()
+    words = normalize_title(name).split()
+    return words[-1] if words else ''
+
+
+def _work_year(work: Dict[str, Any]) -> Optional[int]:
+    parts = (work.get('published-print') or {}).get('date-parts') or [[]]
+    return parts[0][0] if parts[0] else None
+
+
+def reference_id(work: Dict[str, Any]) -> str:
+    """How a report names a bibliography entry: its citation key, DOI or title"""
+    title = work.get('title') or ['']
+    return work.get('citation-key') or work.get('DOI') or (title[0] if title else '')
+
+
+class BibliographyIndex:
+    """A user's own bibliography (BibTeX, RIS or CSL-JSON) in memory, for resolving in-text citations locally
+
+    Entries are indexed by citation key, DOI, (first author surname, year)
+    and first author surname, so matching a citation is a few dict lookups.
+    """
+
+    def __init__(self, works: Iterable[Dict[str, Any]] = ()):
+        self.works = []
+        self.by_key = {}
+        self.by_doi = {}
+        self.by_author_year = {}
+        self.by_author = {}
+        self.add_works(works)
+
+    @classmethod
+    def from_text(cls, name: str, text: str) -> 'BibliographyIndex':
+        """Index of a bibliography file's contents; the format is taken from the file name (.bib, .ris or .json)"""
+        parser = PARSERS.get(name.rsplit('.', 1)[-1].lower())
+        if parser is None:
+            raise ValueError(f"Unsupported bibliography format: {name}")
+        return cls(parser(text))
+
+    @classmethod
+    def load(cls, path: str) -> 'BibliographyIndex':
+        """Index of a bibliography file on disk"""
+        with open(path, encoding='utf-8-sig') as f:
+            return cls.from_text(path, f.read())
+
+    def __len__(self) -> int:
+        return len(self.works)
+
+    def add_works(self, works: Iterable[Dict[str, Any]]):
+        """Index CrossRef-style works, as the parsers in src.bib_parsers return them"""
+        for work in works:
+            self.works.append(work)
+            if work.get('citation-key'):
+                self.by_key.setdefault(work['citation-key'].casefold(), work)
+            if work.get('DOI'):
+                self.by_doi.setdefault(clean_doi(work['DOI']).lower(), work)
+            authors = work.get('author') or []
+            surname = _surname_key(authors[0].get('family', '')) if authors else ''
+            if surname:
+                self.by_author_year.setdefault((surname, _work_year(work)), []).append(work)
+                self.by_author.setdefault(surname, []).append(work)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Entry with a citation key (compared without case, as BibTeX does), or None"""
+        return self.by_key.get(key.casefold())
+
+    def get_by_doi(self, doi: str) -> Optional[Dict[str, Any]]:
+        """Entry with a DOI, or None"""
+        return self.by_doi.get(clean_doi(doi).lower())
+
+    def match(self, text: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Entries an in-text citation refers to, and the references in it that no entry matches
+
+        Citation keys (LaTeX \\cite or pandoc @key) and DOIs are looked up
+        directly; author-year citations by first author and year, each
+        semicolon-separated part on its own; MLA-style author-page citations
+        by author alone. Citations naming no key, DOI or author (numeric
+        ones) give two empty lists.
+        """
+        latex = LATEX_CITE.findall(text)
+        keys = [key.strip() for group in latex for key in group.split(',')] if latex else PANDOC_KEY.findall(text)
+        if keys:
+            return self._resolve([(key, self.get(key)) for key in keys if key])
+
+        dois = DOI.findall(text)
+        if dois:
+            return self._resolve([(doi, self.get_by_doi(doi.rstrip('.'))) for doi in dois])
+
+        found = []
+        for part in text.strip('()[] ').split(';'):
+            part = LOCATOR.sub('', part)
+            surname = CITED_SURNAME.search(part)
+            if not surname:
+                continue
+            author = _surname_key(surname.group())
+            years = [int(match.group(1)) if match.group(1) else None for match in CITED_YEAR.finditer(part)]
+            if not years:
+                found.append((surname.group(), (self.by_author.get(author) or [None])[0]))
+            for year in years:
+                candidates = self.by_author_year.get((author, year))
+                found.append((f"{surname.group()} {year or 'n.d.'}", candidates[0] if candidates else None))
+        return self._resolve(found)
+
+    @staticmethod
+    def _resolve(found: List[Tuple[str, Optional[Dict[str, Any]]]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        return [work for _, work in found if work is not None], [reference for reference, work in found if work is None]
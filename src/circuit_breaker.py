@@ -0,0 +1,106 @@
+import threading
+import time
+from typing import Dict, Callable
+from config.settings import RATE_LIMIT_COOLDOWN, CIRCUIT_MAX_COOLDOWN
+
+
+class CircuitBreaker:
+    """Circuit breaker for one model
+
+    closed     requests flow normally
+    open       the model is failing (rate limited); requests are refused
+    half_open  the cooldown has elapsed; exactly one request is let through as
+               a probe, and its outcome closes or re-opens the circuit
+
+    Each failed probe doubles the cooldown, up to CIRCUIT_MAX_COOLDOWN.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, cooldown: float = RATE_LIMIT_COOLDOWN, max_cooldown: float = CIRCUIT_MAX_COOLDOWN,
+                 clock: Callable[[], float] = time.time):
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.cooldown = cooldown
+        self.opened_at = 0.0
+        self.failures = 0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def _refresh(self):
+        """Move an open circuit to half-open once its cooldown has elapsed"""
+        if self.state == self.OPEN and self.clock() >= self.opened_at + self.cooldown:
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+
+    def current_state(self) -> str:
+        """State after accounting for an elapsed cooldown"""
+        with self.lock:
+            self._refresh()
+            return self.state
+
+    def available(self) -> bool:
+        """Whether a request could currently be let through (does not claim the probe)"""
+        with self.lock:
+            self._refresh()
+            return self.state == self.CLOSED or (self.state == self.HALF_OPEN and not self.probe_in_flight)
+
+    def allow_request(self) -> bool:
+        """Claim permission to send a request"""
+        with self.lock:
+            self._refresh()
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        """A request succeeded: close the circuit"""
+        with self.lock:
+            self.state = self.CLOSED
+            self.cooldown = self.base_cooldown
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        """A request was rate limited: open the circuit"""
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+            self.failures += 1
+            self.probe_in_flight = False
+
+    def release(self):
+        """A request failed for a reason unrelated to quota: free the probe slot only"""
+        with self.lock:
+            self.probe_in_flight = False
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a probe through (0 if it already would)"""
+        with self.lock:
+            self._refresh()
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.opened_at + self.cooldown - self.clock())
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(model_name: str) -> CircuitBreaker:
+    """Get the process-wide breaker for a model, shared by every provider instance"""
+    with _breakers_lock:
+        breaker = _breakers.get(model_name)
+        if breaker is None:
+            breaker = CircuitBreaker()
+            _breakers[model_name] = breaker
+    return breaker
@@ -413,27 +413,49 @@
 #         return report
 
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator
 from datetime import datetime
+from array import array
+import sys
 from src.ai_providers import AIProvider, GeminiProvider, MockProvider
 from src.web_searcher import WebSearcher
 from src.doi_validator import DOIValidator
+from src.citation_rules import CitationRuleEngine
+from src.bibliography import BibliographyIndex, reference_id
+from src.report_aggregate import ReportAggregate
+from src.file_handlers import FileHandler, decode_bytes
+from src.mapped_text import MappedText
+from src.offset_map import OffsetMap
+from config.settings import AI_CONCURRENCY, ANALYSIS_TIERS
+from concurrent.futures import ThreadPoolExecutor
 import json
+import threading
+import time
+import unicodedata
+
+EMPTY = ()  # shared by every citation without issues or suggestions
+TRANSIENT_ISSUES = ("API Error", "Analysis error")  # issues of a failed analysis, not of the citation
 
 class Citation:
     """Represents a single citation"""
+    __slots__ = ('text', 'style', 'position', 'is_valid', 'issues', 'suggestions', 'confidence_score',
+                 'model_used', 'doi', 'doi_valid', 'doi_data', 'degraded', 'tier', 'references')
+    
     def __init__(self, text: str, style: str = "unknown", position: int = 0):
         self.text = text
-        self.style = style
+        self.style = sys.intern(style)  # a handful of distinct styles shared by millions of citations
         self.position = position
         self.is_valid = None
-        self.issues = []
-        self.suggestions = []
+        self.issues = EMPTY
+        self.suggestions = EMPTY
         self.confidence_score = 0.0
         self.model_used = None
         self.doi = None
         self.doi_valid = None
         self.doi_data = None
+        self.degraded = False  # True when checked by rules only because no AI model was available
+        self.tier = None  # analysis tier that produced the verdict
+        self.references = EMPTY  # ids of the bibliography entries the citation resolved to
         
     def to_dict(self) -> Dict[str, Any]:
         result = {
@@ -441,12 +463,18 @@ class Citation:
             "style": self.style,
             "position": self.position,
             "is_valid": self.is_valid,
-            "issues": self.issues,
-            "suggestions": self.suggestions,
+            "issues": list(self.issues),
+            "suggestions": list(self.suggestions),
             "confidence_score": self.confidence_score
         }
         if self.model_used:
             result["model_used"] = self.model_used
+        if self.degraded:
+            result["degraded"] = True
+        if self.tier:
+            result["tier"] = self.tier
+        if self.references:
+            result["references"] = list(self.references)
         if self.doi:
             result["doi"] = self.doi
             result["doi_valid"] = self.doi_valid
@@ -454,6 +482,143 @@ class Citation:
                 result["doi_data"] = self.doi_data
         return result
 
+class CitationTable:
+    """Columnar store of analyzed citations
+    
+    Positions, lengths, style codes, validity and confidence live in parallel
+    arrays. Citation text is a slice of the source document when one is given,
+    and the rarely-set fields (issues, suggestions, model, DOI...) are kept in
+    a sparse per-row dict. Rows are rendered as report dicts straight from
+    the columns, without rebuilding Citation objects.
+    """
+    
+    VALIDITY_CODES = {None: -1, False: 0, True: 1}
+    VALIDITY_VALUES = {-1: None, 0: False, 1: True}
+    EXTRA_FIELDS = ('issues', 'suggestions', 'model_used', 'degraded', 'tier', 'references', 'doi', 'doi_valid', 'doi_data')
+    
+    def __init__(self, source: Optional[str] = None):
+        self.source = source
+        self.positions = array('q')
+        self.lengths = array('l')
+        self.style_codes = array('H')  # CSL lets users add styles, so more than 256 labels are possible
+        self.validity = array('b')
+        self.confidence = array('d')
+        self.styles = []  # style code -> style name
+        self._style_codes = {}
+        self.texts = {}  # row -> text, only for citations that aren't a slice of the source
+        self.extras = {}  # row -> {field: value}, only for fields that are set
+    
+    @classmethod
+    def from_citations(cls, citations: Iterable[Citation], source: Optional[str] = None) -> 'CitationTable':
+        """Build a table from citation objects"""
+        table = cls(source)
+        for citation in citations:
+            table.append(citation)
+        return table
+    
+    def __len__(self) -> int:
+        return len(self.positions)
+    
+    def _style_code(self, style: str) -> int:
+        """Code for a style name, adding it on first use"""
+        code = self._style_codes.get(style)
+        if code is None:
+            code = len(self.styles)
+            self.styles.append(style)
+            self._style_codes[style] = code
+        return code
+    
+    def append(self, citation: Citation):
+        """Add a citation as a new row"""
+        row = len(self.positions)
+        self.positions.append(citation.position)
+        self.lengths.append(len(citation.text))
+        self.style_codes.append(self._style_code(citation.style))
+        self.validity.append(self.VALIDITY_CODES[citation.is_valid])
+        self.confidence.append(citation.confidence_score or 0.0)
+        
+        if self.source is None or self.source[citation.position:citation.position + len(citation.text)] != citation.text:
+            self.texts[row] = citation.text
+        
+        extras = {}
+        for name in self.EXTRA_FIELDS:
+            value = getattr(citation, name)
+            if value or (name == 'doi_valid' and value is not None):
+                extras[name] = value
+        if extras:
+            self.extras[row] = extras
+    
+    def text_at(self, row: int) -> str:
+        """Citation text of a row"""
+        text = self.texts.get(row)
+        if text is None:
+            position = self.positions[row]
+            text = self.source[position:position + self.lengths[row]]
+        return text
+    
+    def iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        """Render rows as report dicts, one at a time (the same dicts as Citation.to_dict)"""
+        no_extras = {}
+        for row in range(len(self)):
+            extras = self.extras.get(row, no_extras)
+            result = {
+                "text": self.text_at(row),
+                "style": self.styles[self.style_codes[row]],
+                "position": self.positions[row],
+                "is_valid": self.VALIDITY_VALUES[self.validity[row]],
+                "issues": list(extras.get('issues', EMPTY)),
+                "suggestions": list(extras.get('suggestions', EMPTY)),
+                "confidence_score": self.confidence[row]
+            }
+            if extras:
+                for name in ('model_used', 'degraded', 'tier'):
+                    if name in extras:
+                        result[name] = extras[name]
+                if 'references' in extras:
+                    result["references"] = list(extras['references'])
+                if 'doi' in extras:
+                    result["doi"] = extras['doi']
+                    result["doi_valid"] = extras.get('doi_valid')
+                    if 'doi_data' in extras:
+                        result["doi_data"] = extras['doi_data']
+            yield result
+
+REFERENCE_RANGE_PATTERN = r'[Rr]eferences\s*\[(\d+)\]\s*through\s*\[(\d+)\]'
+INCREMENTAL_MARGIN = 200  # characters re-scanned around an edit, so citations it cut are found again
+
+def _common_prefix_length(a: str, b: str) -> int:
+    """Length of the common prefix (binary search over C-level slice comparisons)"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+def _common_suffix_length(a: str, b: str, limit: int) -> int:
+    """Length of the common suffix, at most `limit`"""
+    low, high = 0, max(limit, 0)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+def _line_start(text: str, index: int) -> int:
+    """Start of the line containing index (clamped to the text)"""
+    index = max(0, min(index, len(text)))
+    return text.rfind('\n', 0, index) + 1
+
+def _line_end(text: str, index: int) -> int:
+    """End of the line containing index (clamped to the text)"""
+    index = max(0, min(index, len(text)))
+    newline = text.find('\n', index)
+    return len(text) if newline == -1 else newline
+
 class CitationAnalyzer:
     """Main citation analysis engine"""
     
@@ -470,6 +635,8 @@ class CitationAnalyzer:
         'harvard_parenthetical': r'\([A-Z][A-Za-z\-\']+(?:\s+(?:et\s+al\.?|&|and)\s+[A-Z][A-Za-z\-\']+)*\s+\d{4}(?:[a-z])?(?::\s*\d+(?:-\d+)?)?\)',
         'harvard_narrative': r'\b[A-Z][A-Za-z\-\']+(?:\s+(?:et\s+al\.?|and)\s+[A-Z][A-Za-z\-\']+)*\s+\(\d{4}(?:[a-z])?\)',
         'simple_year_parenthetical': r'\([A-Z][A-Za-z\-\']+\s+\d{4}\)',
+        'latex_cite': r'\\[A-Za-z]*cite[A-Za-z]*\*?(?:\[[^\]]*\])*\{[^}]+\}',
+        'pandoc_cite': r'\[[^\[\]@]*-?@\w[^\[\]]*\]',
         
         # Reference list patterns
         'apa_reference': r'^[A-Z][A-Za-z\-\']+,\s+[A-Z]\.(?:\s*[A-Z]\.)*(?:,\s*&\s*[A-Z][A-Za-z\-\']+,\s+[A-Z]\.(?:\s*[A-Z]\.)*)*\s*\(\d{4}\)\.?\s+.+',
@@ -478,41 +645,201 @@ class CitationAnalyzer:
         'harvard_reference': r'^[A-Z][A-Za-z\-\']+,\s+[A-Z]\.(?:\s*[A-Z]\.)*\s+\d{4},\s+.+',
     }
     
-    def __init__(self, api_provider: str = "gemini", api_key: Optional[str] = None, mcp_enabled: bool = False, enable_web_search: bool = True, preferred_model: Optional[str] = None):
-        self.api_provider = self._initialize_provider(api_provider, api_key, preferred_model)
+    def __init__(self, api_provider: str = "gemini", api_key: Optional[str] = None, mcp_enabled: bool = False, enable_web_search: bool = True, preferred_model: Optional[str] = None, model_preset: Optional[str] = None, confidence_threshold: float = 0.7, analysis_tiers: Optional[Dict[str, List[str]]] = None, bibliography: Optional[BibliographyIndex] = None):
+        self.api_provider = self._initialize_provider(api_provider, api_key, preferred_model, model_preset)
+        self.confidence_threshold = confidence_threshold
+        self.analysis_tiers = analysis_tiers if analysis_tiers is not None else ANALYSIS_TIERS
+        self.tier_stats = {}
+        self._tier_lock = threading.Lock()
         self.mcp_enabled = False  # External verification disabled for now
         self.enable_web_search = enable_web_search
         self.web_searcher = WebSearcher() if enable_web_search else None
         self.doi_validator = DOIValidator()
-        
-    def _initialize_provider(self, provider_name: str, api_key: Optional[str], preferred_model: Optional[str] = None) -> AIProvider:
+        self.rule_engine = CitationRuleEngine()
+        self.bibliography = bibliography  # the user's own reference list, checked before any model or search
+        
+        # State kept between runs so an edited text only costs its changed citations
+        self._previous_text = None
+        self._previous_citations = []
+        self._analysis_cache = {}  # (document style, canonical key) -> analyzed citation
+        self._doi_cache = {}  # DOI -> lookup result
+        self._web_cache = {}  # canonical key -> web search result
+        self._missing_refs_cache = {}  # checked text -> potential missing references
+        
+    def _initialize_provider(self, provider_name: str, api_key: Optional[str], preferred_model: Optional[str] = None, model_preset: Optional[str] = None) -> AIProvider:
         """Initialize the AI provider"""
         if provider_name == "gemini":
-            return GeminiProvider(api_key, preferred_model)
+            return GeminiProvider(api_key, preferred_model, model_preset)
         elif provider_name == "mock":
             return MockProvider()
         else:
             raise ValueError(f"Unknown provider: {provider_name}")
     
-    def analyze(self, text: str) -> Dict[str, Any]:
-        """Main analysis method"""
-        # Extract citations
-        citations = self._extract_citations(text)
+    def set_bibliography(self, bibliography: Optional[BibliographyIndex]):
+        """Use another bibliography; cached verdicts depended on the old one, so they're dropped"""
+        self.bibliography = bibliography
+        self._analysis_cache = {}
+    
+    def analyze(self, text: str, offset_map: Optional[OffsetMap] = None) -> Dict[str, Any]:
+        """Main analysis method
+        
+        With the `offset_map` of extracted text, each citation in the report
+        also gets the page and/or line it came from in the original file.
+        """
+        self.tier_stats = {}
+        
+        # Extract citations (only re-scanning the edited part of a previously analyzed text)
+        citations = self._extract_citations_incremental(text)
+        self._previous_text = text
+        self._previous_citations = citations
         
+        report = self._analyze_citations(citations, text, len(text), len(text.split()), text)
+        if offset_map is not None:
+            for entry in report["citations"]:
+                entry.update(offset_map.location(entry["position"]))
+        return report
+    
+    def analyze_path(self, path: str) -> Dict[str, Any]:
+        """Analyze a document on disk
+        
+        Plain text and markdown files are memory-mapped and scanned for
+        citations a window at a time, so memory use doesn't grow with the
+        file; only the citation spans and their contexts are decoded.
+        Markdown is scanned as written, so positions point into the source.
+        Other formats (and encodings that can't be scanned as bytes) are
+        extracted and analyzed as usual.
+        """
+        extension = path.rsplit('.', 1)[-1].lower()
+        if extension in ('txt', 'md'):
+            with MappedText(path) as document:
+                if document.mappable:
+                    self.tier_stats = {}
+                    found, byte_positions = document.extract_citations(self.CITATION_PATTERNS)
+                    citations = [Citation(text, style, position) for position, text, style in found]
+                    report = self._analyze_citations(citations, None, document.char_count, document.word_count,
+                                                     document.head(1000))
+                    for entry, byte_position in zip(report["citations"], byte_positions):
+                        entry["context"] = document.context(byte_position, byte_position + len(entry["text"].encode(document.encoding)))
+                    return report
+            
+            with open(path, 'rb') as f:
+                text = decode_bytes(f.read())
+        else:
+            with open(path, 'rb') as f:
+                extracted = FileHandler().extract(f)
+            if extracted is None:
+                raise ValueError(f"Unsupported file type: {path}")
+            return self.analyze(extracted['text'], FileHandler.offset_map(extracted))
+        return self.analyze(text)
+    
+    def _analyze_citations(self, citations: List[Citation], source: Optional[str], text_length: int, word_count: int, opening: str) -> Dict[str, Any]:
+        """Analyze extracted citations and build the report
+        
+        `source` is the document text when it's in memory, `opening` its start
+        (used to look for missing references).
+        """
         # Detect citation style
         detected_style = self._detect_citation_style(citations)
         
-        # Analyze each citation
-        analyzed_citations = []
-        for citation in citations:
-            analyzed = self._analyze_single_citation(citation, detected_style)
-            analyzed_citations.append(analyzed)
+        # Repeated citations are analyzed once and the result copied to every occurrence
+        groups = self._group_citations(citations)
+        unique_citations = [occurrences[0] for occurrences in groups.values()]
+        
+        self._analyze_unique({(detected_style, key): occurrences[0] for key, occurrences in groups.items()})
         
         # Validate DOIs in citations
-        doi_results = self._validate_citation_dois(analyzed_citations)
+        doi_results = self._validate_citation_dois(unique_citations)
+        return self._build_report(citations, groups, detected_style, doi_results, source, text_length, word_count, opening)
+    
+    def analyze_documents(self, documents: Dict[str, str], offset_maps: Optional[Dict[str, OffsetMap]] = None) -> Dict[str, Any]:
+        """Analyze several documents together, e.g. a class set of essays
+        
+        `documents` maps a name to its text. Citations are extracted from
+        every document first, and each distinct citation (per detected
+        document style) is analyzed and DOI-checked once across the set.
+        Returns a report per document plus a cross-document summary of
+        the citations and issues that several documents share; analysis
+        tier statistics cover the whole set and appear only in the latter.
+        """
+        self.tier_stats = {}
+        offset_maps = offset_maps or {}
+        
+        # Extract everything first, so the whole set's distinct citations are known before any analysis
+        extracted = {}
+        unique = {}  # (document style, canonical key) -> citation analyzed for every document
+        for name, text in documents.items():
+            citations = self._extract_citations(text)
+            style = self._detect_citation_style(citations)
+            groups = self._group_citations(citations)
+            extracted[name] = (citations, style, groups)
+            for key, occurrences in groups.items():
+                unique.setdefault((style, key), occurrences[0])
+        
+        self._analyze_unique(unique)
+        doi_results = self._validate_citation_dois(list(unique.values()))
+        
+        # The web search cache is shared by the whole set rather than pruned to each document
+        web_cache = self._web_cache
+        reports = {}
+        for name, (citations, style, groups) in extracted.items():
+            for key, occurrences in groups.items():
+                self._copy_result(unique[(style, key)], occurrences[0])
+            texts = {unique[(style, key)].text for key in groups}
+            document_dois = self._doi_summary([r for r in doi_results['results'] if r['citation'] in texts])
+            
+            self._web_cache = web_cache
+            text = documents[name]
+            reports[name] = self._build_report(citations, groups, style, document_dois, text, len(text), len(text.split()), text)
+            # Tier calls were shared by the whole set, so they're reported once, in the cross-document summary
+            del reports[name]["summary"]["analysis_tiers"]
+            offset_map = offset_maps.get(name)
+            if offset_map is not None:
+                for entry in reports[name]["citations"]:
+                    entry.update(offset_map.location(entry["position"]))
+        self._web_cache = web_cache
+        
+        return {
+            "documents": reports,
+            "summary": self._cross_document_summary(extracted, unique, reports),
+            "shared_citations": self._shared_citations(extracted, unique),
+            "shared_issues": self._shared_issues(reports)
+        }
+    
+    def _analyze_unique(self, citations: Dict[Any, Citation]):
+        """Analyze citations keyed by (document style, canonical key), reusing the previous run's results
+        
+        Citations with a final verdict become the cache for the next run;
+        degraded and failed ones are analyzed again.
+        """
+        # Citations unchanged since the last run reuse their previous analysis
+        pending = []
+        for (style, key), citation in citations.items():
+            cached = self._analysis_cache.get((style, key))
+            if cached is not None:
+                self._copy_result(cached, citation)
+            else:
+                pending.append((citation, style))
+        
+        # Analyze each citation (concurrently, so the provider can spread requests across models)
+        with ThreadPoolExecutor(max_workers=AI_CONCURRENCY) as executor:
+            list(executor.map(
+                lambda item: self._analyze_single_citation(*item),
+                pending
+            ))
+        self._analysis_cache = {key: citation for key, citation in citations.items() if self._is_final(citation)}
+    
+    @staticmethod
+    def _is_final(citation: Citation) -> bool:
+        """Whether an analysis is a settled verdict rather than a rules-only fallback or an error"""
+        return not citation.degraded and not any(issue.startswith(TRANSIENT_ISSUES) for issue in citation.issues)
+    
+    def _build_report(self, citations: List[Citation], groups: Dict[str, List[Citation]], style: str, doi_results: Dict[str, Any], source: Optional[str], text_length: int, word_count: int, opening: str) -> Dict[str, Any]:
+        """Report of one document whose groups' first occurrences are analyzed"""
+        self._fan_out_results(groups)
         
         # Generate overall report
-        report = self._generate_report(text, analyzed_citations, detected_style)
+        report = self._generate_report(citations, style, source, text_length, word_count)
+        report["summary"]["unique_citations"] = len(groups)
         
         # Add DOI validation results
         if doi_results['total_dois_found'] > 0:
@@ -520,25 +847,116 @@ class CitationAnalyzer:
         
         # Add web search results if enabled
         if self.enable_web_search and self.web_searcher:
-            report = self._enhance_with_web_search(text, report, analyzed_citations)
+            report = self._enhance_with_web_search(opening, report, citations)
         
         return report
     
-    def _extract_citations(self, text: str) -> List[Citation]:
-        """Extract all citations from the text - improved version"""
+    def _cross_document_summary(self, extracted: Dict[str, Any], unique: Dict[Any, Citation], reports: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Corpus summary: the merged per-document aggregates plus how much analysis the set shared"""
+        aggregate = ReportAggregate.combine(ReportAggregate.from_summary(report["summary"]) for report in reports.values())
+        summary = aggregate.summary()
+        summary.update({
+            "documents": aggregate.documents,
+            "unique_citations": len(unique),
+            # What analyzing each document on its own would have cost
+            "per_document_unique_citations": sum(len(groups) for _, _, groups in extracted.values()),
+            "analysis_tiers": self._tier_summary(list(unique.values()))
+        })
+        return summary
+    
+    @staticmethod
+    def _shared_citations(extracted: Dict[str, Any], unique: Dict[Any, Citation]) -> List[Dict[str, Any]]:
+        """Citations found in more than one document, most widely shared first"""
+        shared = {}
+        for name, (_, style, groups) in extracted.items():
+            for key, occurrences in groups.items():
+                entry = shared.get(key)
+                if entry is None:
+                    analyzed = unique[(style, key)]
+                    entry = shared[key] = {
+                        "text": analyzed.text,
+                        "style": analyzed.style,
+                        "documents": [],
+                        "occurrences": 0,
+                        "is_valid": analyzed.is_valid,
+                        "issues": list(analyzed.issues)
+                    }
+                entry["documents"].append(name)
+                entry["occurrences"] += len(occurrences)
+        
+        entries = [entry for entry in shared.values() if len(entry["documents"]) > 1]
+        return sorted(entries, key=lambda entry: len(entry["documents"]), reverse=True)
+    
+    @staticmethod
+    def _shared_issues(reports: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Issues found in more than one document, most widely shared first"""
+        shared = {}
+        for name, report in reports.items():
+            for issue, count in report["summary"]["issue_histogram"].items():
+                entry = shared.setdefault(issue, {"issue": issue, "documents": [], "occurrences": 0})
+                entry["documents"].append(name)
+                entry["occurrences"] += count
+        
+        entries = [entry for entry in shared.values() if len(entry["documents"]) > 1]
+        return sorted(entries, key=lambda entry: len(entry["documents"]), reverse=True)
+    
+    def _extract_citations_incremental(self, text: str) -> List[Citation]:
+        """Extract citations, re-scanning only the span that changed since the previous text
+        
+        Citations before the edit keep their positions, citations after it are
+        shifted by the change in length, and only the edited lines (plus a
+        margin) go through the extraction patterns again.
+        """
+        previous = self._previous_text
+        # "References [X] through [Y]" changes how [n] citations anywhere in the text are labelled
+        if previous is None or re.search(REFERENCE_RANGE_PATTERN, previous) or re.search(REFERENCE_RANGE_PATTERN, text):
+            return self._extract_citations(text)
+        
+        prefix = _common_prefix_length(previous, text)
+        suffix = _common_suffix_length(previous, text, limit=min(len(previous), len(text)) - prefix)
+        delta = len(text) - len(previous)
+        
+        # Window of the new text to re-scan: the edit plus a margin, widened to whole lines
+        start = _line_start(text, prefix - INCREMENTAL_MARGIN)
+        end = _line_end(text, len(text) - suffix + INCREMENTAL_MARGIN)
+        
+        # Old citations reaching into the window are re-extracted, so widen it to cover them
+        for citation in self._previous_citations:
+            old_start, old_end = citation.position, citation.position + len(citation.text)
+            if old_end > start and old_start < end - delta:
+                start = min(start, old_start)
+                end = max(end, old_end + delta)
+        
+        kept = []
+        for citation in self._previous_citations:
+            if citation.position + len(citation.text) <= start:
+                kept.append(Citation(citation.text, citation.style, citation.position))
+            elif citation.position >= end - delta:
+                kept.append(Citation(citation.text, citation.style, citation.position + delta))
+        
+        citations = kept + self._extract_citations(text, start, end)
+        citations.sort(key=lambda x: x.position)
+        return citations
+    
+    def _extract_citations(self, text: str, start: int = 0, end: Optional[int] = None) -> List[Citation]:
+        """Extract all citations from the text - improved version
+        
+        `start`/`end` limit matching to a span of the text; positions stay relative to the whole text.
+        """
+        if end is None:
+            end = len(text)
         citations = []
         seen_positions = set()  # Track positions to avoid duplicates
         
         # First, handle "References [X] through [Y]" pattern
-        ref_range_pattern = r'[Rr]eferences\s*\[(\d+)\]\s*through\s*\[(\d+)\]'
-        for match in re.finditer(ref_range_pattern, text):
+        for match in re.compile(REFERENCE_RANGE_PATTERN).finditer(text, start, end):
             start_num = int(match.group(1))
             end_num = int(match.group(2))
             # Add each number in the range as individual citations
             for num in range(start_num, end_num + 1):
                 # Check if this number exists as an individual citation
                 individual_pattern = rf'\[{num}\]'
-                ind_matches = list(re.finditer(individual_pattern, text))
+                ind_matches = list(re.compile(individual_pattern).finditer(text, start, end))
                 if ind_matches:
                     # Use the actual position of the individual citation
                     for ind_match in ind_matches:
@@ -557,7 +975,7 @@ class CitationAnalyzer:
                 continue  # Skip range pattern
                 
             try:
-                matches = re.finditer(pattern, text, re.MULTILINE)
+                matches = re.compile(pattern, re.MULTILINE).finditer(text, start, end)
                 for match in matches:
                     position = match.start()
                     
@@ -614,24 +1032,71 @@ class CitationAnalyzer:
         # Return the most common style
         return max(style_counts, key=style_counts.get)
     
+    @staticmethod
+    def _canonical_key(citation: Citation) -> str:
+        """Key shared by every occurrence of the same citation (style plus normalized text)"""
+        text = unicodedata.normalize('NFKC', citation.text)
+        return f"{citation.style}|{' '.join(text.split())}"
+    
+    def _group_citations(self, citations: List[Citation]) -> Dict[str, List[Citation]]:
+        """Group occurrences by canonical key, in order of first appearance"""
+        groups = {}
+        for citation in citations:
+            groups.setdefault(self._canonical_key(citation), []).append(citation)
+        return groups
+    
+    @staticmethod
+    def _copy_result(analyzed: Citation, citation: Citation):
+        """Copy analysis results (not text or position) from one citation to another"""
+        citation.is_valid = analyzed.is_valid
+        citation.confidence_score = analyzed.confidence_score
+        citation.issues = analyzed.issues
+        citation.suggestions = analyzed.suggestions
+        citation.model_used = analyzed.model_used
+        citation.degraded = analyzed.degraded
+        citation.tier = analyzed.tier
+        citation.references = analyzed.references
+        citation.doi = analyzed.doi
+        citation.doi_valid = analyzed.doi_valid
+        citation.doi_data = analyzed.doi_data
+    
+    def _fan_out_results(self, groups: Dict[str, List[Citation]]):
+        """Copy the analysis of each group's first occurrence to the others (positions stay their own)"""
+        for occurrences in groups.values():
+            for citation in occurrences[1:]:
+                self._copy_result(occurrences[0], citation)
+    
     def _analyze_single_citation(self, citation: Citation, expected_style: str) -> Citation:
-        """Analyze a single citation using AI"""
-        # For numeric citations, apply simpler validation
-        if citation.style in ['ieee', 'chicago'] and re.match(r'^\[\d+\]$', citation.text):
-            citation.is_valid = True
-            citation.confidence_score = 0.95
-            return citation
-            
-        # For range citations like "[4] through [6]", validate directly
-        if re.match(r'\[\d+\]\s*(?:through|to|and|-|–)\s*\[\d+\]', citation.text):
-            citation.is_valid = True
-            citation.confidence_score = 0.95
+        """Analyze a single citation: rules and the bibliography first, then each AI tier until the answer is confident"""
+        # Resolve the citation against the user's bibliography, when there is one
+        missing = []
+        if self.bibliography is not None:
+            started = time.time()
+            entries, missing = self.bibliography.match(citation.text)
+            self._record_tier('bibliography', time.time() - started)
+            citation.references = tuple(dict.fromkeys(reference_id(entry) for entry in entries)) or EMPTY
+        
+        # Settle well-formed citations and known mistakes locally; only ambiguous ones reach the model
+        started = time.time()
+        verdict = self.rule_engine.evaluate(citation.text, citation.style, expected_style)
+        self._record_tier('rules', time.time() - started)
+        if verdict is not None:
+            citation.is_valid = verdict.is_valid
+            citation.confidence_score = verdict.confidence_score
+            citation.issues = tuple(verdict.issues)
+            citation.suggestions = tuple(verdict.suggestions)
+            citation.tier = 'rules'
+            if missing:
+                self._apply_missing_references(citation, missing)
             return citation
         
-        # Use rule-based validation for common patterns
-        if self._is_valid_by_rules(citation):
+        # A citation the bibliography resolves (or can't) needs no model to tell whether it points somewhere
+        if citation.references or missing:
             citation.is_valid = True
             citation.confidence_score = 0.9
+            citation.tier = 'bibliography'
+            if missing:
+                self._apply_missing_references(citation, missing)
             return citation
         
         # Only use AI for complex citations
@@ -661,81 +1126,125 @@ class CitationAnalyzer:
         """
         
         try:
-            response = self.api_provider.analyze_citation(prompt)
-            result = json.loads(response)
+            result = None
+            failed = None
+            for tier, models in self.analysis_tiers.items():
+                started = time.time()
+                tier_result = json.loads(self.api_provider.analyze_citation(prompt, models=models))
+                self._record_tier(tier, time.time() - started)
+                
+                if tier_result.get("degraded") or tier_result.get("quota_exhausted") or tier_result.get("error"):
+                    failed = tier_result
+                    continue
+                result = tier_result
+                citation.tier = tier
+                # Escalate to the next tier only when this one is unsure
+                if result.get("is_valid") is not None and result.get("confidence_score", 0.0) >= self.confidence_threshold:
+                    break
+            
+            if result is None:
+                # Every model is rate limited or out of quota: settle for a rule-based verdict instead of waiting
+                if failed is None or not failed.get("error"):
+                    return self._apply_degraded_verdict(citation)
+                result = failed
             
             citation.is_valid = result.get("is_valid", False)
             citation.confidence_score = result.get("confidence_score", 0.0)
-            citation.issues = result.get("issues", [])
-            citation.suggestions = result.get("suggestions", [])
+            citation.issues = tuple(result.get("issues") or EMPTY)
+            citation.suggestions = tuple(result.get("suggestions") or EMPTY)
             citation.model_used = result.get("model_used", "unknown")
             
         except Exception as e:
             citation.is_valid = None
-            citation.issues = [f"Analysis error: {str(e)}"]
+            citation.issues = (f"Analysis error: {str(e)}",)
             
         return citation
     
-    def _is_valid_by_rules(self, citation: Citation) -> bool:
-        """Apply rule-based validation for common citation patterns"""
-        text = citation.text.strip()
-        
-        # Numeric citations [1], [2], etc.
-        if re.match(r'^\[\d+\]$', text):
-            return True
-            
-        # Numeric ranges
-        if re.match(r'^\[\d+\]\s*(?:through|to|and|-|–)\s*\[\d+\]$', text):
-            return True
-        
-        # Basic APA: (Author, Year) or Author (Year)
-        if re.match(r'^\([A-Z][a-z]+(?:\s+et\s+al\.?)?,\s*\d{4}\)$', text):
-            return True
-        if re.match(r'^[A-Z][a-z]+(?:\s+et\s+al\.?)?\s+\(\d{4}\)$', text):
-            return True
-            
-        # APA with multiple authors
-        if re.match(r'^\([A-Z][a-z]+\s+(?:&|and)\s+[A-Z][a-z]+,\s*\d{4}\)$', text):
-            return True
-        if re.match(r'^[A-Z][a-z]+\s+(?:and|&)\s+[A-Z][a-z]+\s+\(\d{4}\)$', text):
-            return True
-        
-        # Basic Harvard: (Author Year)
-        if re.match(r'^\([A-Z][a-z]+(?:\s+et\s+al\.?)?\s+\d{4}\)$', text):
-            return True
-        
-        # MLA with page: (Author Year, p. X)
-        if re.match(r'^\([A-Z][a-z]+\s+\d{4},\s*p\.?\s*\d+\)$', text):
-            return True
-        
-        return False
+    @staticmethod
+    def _apply_missing_references(citation: Citation, missing: List[str]):
+        """Mark a citation invalid for referring to works missing from the bibliography"""
+        citation.is_valid = False
+        citation.issues = citation.issues + (f"No bibliography entry for {', '.join(missing)}",)
+        citation.suggestions = citation.suggestions + ("Add the work to the bibliography or correct the citation",)
+    
+    def _record_tier(self, tier: str, seconds: float):
+        """Count one call to an analysis tier and its latency"""
+        with self._tier_lock:
+            stats = self.tier_stats.setdefault(tier, {'calls': 0, 'total_latency': 0.0})
+            stats['calls'] += 1
+            stats['total_latency'] += seconds
+    
+    def _tier_summary(self, citations: List[Citation]) -> Dict[str, Dict[str, Any]]:
+        """Calls, resolved citations and average latency per analysis tier"""
+        summary = {}
+        local = ['rules', 'bibliography'] if self.bibliography is not None else ['rules']
+        for tier in local + list(self.analysis_tiers):
+            stats = self.tier_stats.get(tier, {'calls': 0, 'total_latency': 0.0})
+            summary[tier] = {
+                "calls": stats['calls'],
+                "resolved": sum(1 for c in citations if c.tier == tier),
+                "average_latency": stats['total_latency'] / stats['calls'] if stats['calls'] else 0.0
+            }
+        return summary
+    
+    def _apply_degraded_verdict(self, citation: Citation) -> Citation:
+        """Structural rule check used when no AI model can take the request"""
+        issues = []
+        if not re.search(r"[A-Z][A-Za-z\-']+", citation.text):
+            issues.append("Missing author name")
+        if citation.style == 'mla':
+            if not re.search(r'\d', citation.text):
+                issues.append("Missing page number")
+        elif not re.search(r'\b\d{4}[a-z]?\b|n\.d\.', citation.text):
+            issues.append("Missing publication year")
+        
+        citation.is_valid = not issues
+        citation.confidence_score = 0.5
+        citation.issues = tuple(issues)
+        citation.model_used = "rules"
+        citation.degraded = True
+        return citation
     
     def _validate_citation_dois(self, citations: List[Citation]) -> Dict[str, Any]:
         """Validate DOIs found in citations"""
         doi_results = []
         
+        # Extract DOIs from citation text
+        pairs = []
         for citation in citations:
-            # Extract DOIs from citation text
-            dois = self.doi_validator.extract_dois_from_text(citation.text)
+            for doi in self.doi_validator.extract_dois_from_text(citation.text):
+                pairs.append((citation, doi))
+        
+        # Look all new DOIs up concurrently; DOIs settled in the previous run reuse their result
+        dois = list(dict.fromkeys(doi for _, doi in pairs))
+        results = {doi: self._doi_cache[doi] for doi in dois if doi in self._doi_cache}
+        new_dois = [doi for doi in dois if doi not in results]
+        if new_dois:
+            results.update(zip(new_dois, self.doi_validator.batch_validate(new_dois)))
+        # Timeouts, rate limits and server errors are looked up again next run
+        self._doi_cache = {doi: result for doi, result in results.items() if not result.get('retryable')}
+        
+        for citation, doi in pairs:
+            result = results[doi]
+            # Store DOI info in citation object
+            citation.doi = doi
+            citation.doi_valid = result['success']
+            if result['success']:
+                citation.doi_data = result.get('data')
             
-            if dois:
-                for doi in dois:
-                    result = self.doi_validator.get_publication_info(doi)
-                    
-                    # Store DOI info in citation object
-                    citation.doi = doi
-                    citation.doi_valid = result['success']
-                    if result['success']:
-                        citation.doi_data = result.get('data')
-                    
-                    doi_results.append({
-                        'citation': citation.text,
-                        'doi': doi,
-                        'valid': result['success'],
-                        'data': result.get('data') if result['success'] else None,
-                        'error': result.get('error') if not result['success'] else None
-                    })
-        
+            doi_results.append({
+                'citation': citation.text,
+                'doi': doi,
+                'valid': result['success'],
+                'data': result.get('data') if result['success'] else None,
+                'error': result.get('error') if not result['success'] else None
+            })
+        
+        return self._doi_summary(doi_results)
+    
+    @staticmethod
+    def _doi_summary(doi_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Totals over per-citation DOI results"""
         return {
             'total_dois_found': len(doi_results),
             'valid_dois': sum(1 for r in doi_results if r['valid']),
@@ -743,78 +1252,54 @@ class CitationAnalyzer:
             'results': doi_results
         }
     
-    def _generate_report(self, text: str, citations: List[Citation], style: str) -> Dict[str, Any]:
+    def _generate_report(self, citations: List[Citation], style: str, source: Optional[str], text_length: int, word_count: int) -> Dict[str, Any]:
         """Generate comprehensive analysis report"""
-        total_citations = len(citations)
-        valid_citations = sum(1 for c in citations if c.is_valid is True)
-        invalid_citations = sum(1 for c in citations if c.is_valid is False)
-        uncertain_citations = sum(1 for c in citations if c.is_valid is None)
-        
-        # Calculate overall score
-        if total_citations > 0:
-            validity_score = (valid_citations / total_citations) * 100
-            avg_confidence = sum(c.confidence_score for c in citations) / total_citations
-        else:
-            validity_score = 0
-            avg_confidence = 0
+        # Aggregate over the columnar form in one pass; per-citation dicts are only built for the citations list
+        table = CitationTable.from_citations(citations, source)
+        aggregate = ReportAggregate.from_table(table)
         
         # Get model used for analysis
         model_used = None
         if hasattr(self.api_provider, 'model_name'):
             model_used = self.api_provider.model_name
         
-        # Common issues
-        all_issues = []
-        for c in citations:
-            all_issues.extend(c.issues)
-        
-        issue_counts = {}
-        for issue in all_issues:
-            issue_counts[issue] = issue_counts.get(issue, 0) + 1
-        
-        common_issues = sorted(issue_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        summary = aggregate.summary()
+        summary.update({
+            "detected_style": style,
+            "analysis_timestamp": datetime.now().isoformat(),
+            "model_used": model_used,
+            "analysis_tiers": self._tier_summary(citations)
+        })
         
         return {
-            "summary": {
-                "total_citations": total_citations,
-                "valid_citations": valid_citations,
-                "invalid_citations": invalid_citations,
-                "uncertain_citations": uncertain_citations,
-                "detected_style": style,
-                "validity_score": validity_score,
-                "average_confidence": avg_confidence,
-                "analysis_timestamp": datetime.now().isoformat(),
-                "model_used": model_used
-            },
-            "citations": [c.to_dict() for c in citations],
-            "common_issues": common_issues,
-            "recommendations": self._generate_recommendations(citations, style),
-            "text_length": len(text),
-            "citation_density": (total_citations / len(text.split())) * 100 if text else 0
+            "summary": summary,
+            "citations": list(table.iter_dicts()),
+            "common_issues": aggregate.common_issues(),
+            "recommendations": self._generate_recommendations(aggregate, style),
+            "text_length": text_length,
+            "citation_density": (aggregate.total / word_count) * 100 if word_count else 0
         }
     
-    def _generate_recommendations(self, citations: List[Citation], style: str) -> List[str]:
+    def _generate_recommendations(self, aggregate: ReportAggregate, style: str) -> List[str]:
         """Generate overall recommendations"""
         recommendations = []
         
         # Style consistency
-        styles = set(c.style for c in citations)
-        if len(styles) > 1:
+        if len(aggregate.styles) > 1:
             recommendations.append("Consider using a consistent citation style throughout your document.")
         
         # Common issues
-        issue_types = {}
-        for c in citations:
-            for issue in c.issues:
-                issue_type = issue.split(':')[0] if ':' in issue else issue
-                issue_types[issue_type] = issue_types.get(issue_type, 0) + 1
-        
-        if issue_types:
-            most_common = max(issue_types, key=issue_types.get)
+        most_common = aggregate.most_common_issue_type()
+        if most_common:
             recommendations.append(f"Address recurring issue: {most_common}")
         
+        # Degraded analysis
+        degraded = aggregate.degraded
+        if degraded:
+            recommendations.append(f"AI models were rate limited, so {degraded} citation(s) were checked with rules only - re-run later for a full review.")
+        
         # DOI recommendations
-        dois_found = sum(1 for c in citations if c.doi)
+        dois_found = aggregate.dois
         if dois_found > 0:
             recommendations.append(f"Found {dois_found} DOI(s) - verify they are correct and accessible.")
         
@@ -842,38 +1327,64 @@ class CitationAnalyzer:
         searched = 0
         
         # Search for missing references (limit to first few)
-        missing_refs = self.web_searcher.find_missing_references(text[:1000])  # Only check first 1000 chars
+        checked_text = text[:1000]  # Only check first 1000 chars
+        if checked_text not in self._missing_refs_cache:
+            self._missing_refs_cache = {checked_text: self.web_searcher.find_missing_references(checked_text)}
+        missing_refs = self._missing_refs_cache[checked_text]
         if missing_refs:
             report["missing_references"] = missing_refs[:3]  # Limit to 3
             report["recommendations"].insert(0, f"Found {len(missing_refs)} potential missing citations that need references.")
         
-        # Enhance only a few citations with web search
+        # Skip numeric citations - they don't need web search - and ones the bibliography resolved; search each distinct citation once
+        candidates = {}
         for i, citation in enumerate(citations):
-            if searched >= max_searches:
-                break
-                
-            # Skip numeric citations - they don't need web search
             if citation.style in ['ieee', 'chicago'] and re.match(r'^\[\d+\]', citation.text):
                 continue
-                
-            try:
-                search_results = self.web_searcher.search_for_citation(citation.text)
+            if citation.references:
+                continue
+            candidates.setdefault(self._canonical_key(citation), []).append(i)
+        keys = list(candidates)
+        
+        # Enhance only a few citations with web search, searching a window at a time concurrently
+        for window_start in range(0, len(keys), max_searches):
+            if searched >= max_searches:
+                break
+            
+            window = keys[window_start:window_start + max_searches]
+            results = {key: self._web_cache[key] for key in window if key in self._web_cache}
+            uncached = [key for key in window if key not in results]
+            if uncached:
+                try:
+                    results.update(zip(uncached, self.web_searcher.batch_search(
+                        [citations[candidates[key][0]].text for key in uncached]
+                    )))
+                except:
+                    # Skip on any error
+                    continue
+                # Searches that failed on the network are tried again next run
+                self._web_cache.update((key, results[key]) for key in uncached if not results[key].get('retryable'))
+            
+            for key in window:
+                search_results = results[key]
+                if searched >= max_searches:
+                    break
                 
                 if search_results["found"]:
                     searched += 1
-                    # Add search results to citation
-                    report["citations"][i]["web_search"] = {
-                        "found": True,
-                        "sources": search_results["sources"][:1],  # Only top match
-                        "suggestions": search_results["suggestions"][:2]
-                    }
-                    
-                    # Add web-based suggestions
-                    if search_results["suggestions"]:
-                        report["citations"][i]["suggestions"].extend(search_results["suggestions"][:1])
-            except:
-                # Skip on any error
-                continue
+                    for i in candidates[key]:
+                        # Add search results to citation
+                        report["citations"][i]["web_search"] = {
+                            "found": True,
+                            "sources": search_results["sources"][:1],  # Only top match
+                            "suggestions": search_results["suggestions"][:2]
+                        }
+                        
+                        # Add web-based suggestions
+                        if search_results["suggestions"]:
+                            report["citations"][i]["suggestions"].extend(search_results["suggestions"][:1])
+        
+        # Only keep results for citations still in the text
+        self._web_cache = {key: result for key, result in self._web_cache.items() if key in candidates}
         
         # Update summary with web search info
         web_enhanced = sum(1 for c in report["citations"] if "web_search" in c and c["web_search"]["found"])
@@ -0,0 +1,243 @@
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+
+from src.csl_styles import CSLStyle, CSLStyleLibrary, get_csl_library
+
+# Reference templates: {field} is replaced by the field's text, and a [bracketed]
+# part is only kept when the fields directly inside it are all non-empty
+STYLE_TEMPLATES = {
+    'apa': ('apa', '{authors} ({year}).[ {title}.][ {journal}[, {volume}[({issue})]][, {pages}].][ https://doi.org/{doi}]'),
+    'mla': ('mla', '{authors}.[ "{title}."][ {journal}[, vol. {volume}[, no. {issue}]][, {year}][, pp. {pages}].][ https://doi.org/{doi}.]'),
+    'chicago': ('chicago', '{authors}.[ "{title}."][ {journal}[ {volume}[, no. {issue}]][ ({year})][: {pages}].][ https://doi.org/{doi}.]'),
+    'harvard': ('apa', '{authors} ({year}).[ {title}.][ {journal}[, {volume}[({issue})]][, {pages}].][ https://doi.org/{doi}]'),
+    'ieee': ('ieee', '{authors}[, "{title},"][ {journal}[, vol. {volume}[, no. {issue}]][, pp. {pages}][, {year}].]'),
+}
+STYLE_TITLES = {'apa': 'APA', 'mla': 'MLA', 'chicago': 'Chicago', 'harvard': 'Harvard', 'ieee': 'IEEE'}
+DEFAULT_STYLE = 'apa'
+TEMPLATE_FIELDS = ('authors', 'title', 'journal', 'volume', 'issue', 'pages', 'year', 'doi')
+
+Name = Tuple[str, str, str]  # family, given, initial ("J." or "")
+
+
+def _lone_name(author: Dict[str, str]) -> Name:
+    """An author with no family or no given name (often an organization): the one name there is"""
+    return author.get('family') or author.get('given') or author.get('full_name') or '', '', ''
+
+
+def _names(authors: List[Dict[str, str]]) -> List[Name]:
+    """Family name, given names and first initial of each author"""
+    names = []
+    for author in authors:
+        family = author.get('family')
+        given = author.get('given')
+        names.append((family, given, given[0] + '.') if family and given else _lone_name(author))
+    return names
+
+
+def _apa_authors(authors: List[Dict[str, str]]) -> str:
+    # Up to 20 authors are listed; beyond that the first 19, an ellipsis and the last
+    names = _names(authors if len(authors) <= 20 else authors[:19] + authors[-1:])
+    inverted = [f"{family}, {initial}" if initial else family for family, _, initial in names]
+    if len(names) == 1:
+        return inverted[0]
+    if len(authors) <= 20:
+        return ', '.join(inverted[:-1]) + f", & {inverted[-1]}"
+    return ', '.join(inverted[:-1]) + f", ... {inverted[-1]}"
+
+
+def _mla_authors(authors: List[Dict[str, str]]) -> str:
+    names = _names(authors[:2])
+    family, given, _ = names[0]
+    first = f"{family}, {given}" if given else family
+    if len(authors) == 1:
+        return first
+    if len(authors) == 2:
+        family, given, _ = names[1]
+        return f"{first}, and {given} {family}" if given else f"{first}, and {family}"
+    return f"{first}, et al"
+
+
+def _chicago_authors(authors: List[Dict[str, str]]) -> str:
+    names = _names(authors)
+    if len(names) == 1:
+        family, given, _ = names[0]
+        return f"{family}, {given}" if given else family
+    natural = [f"{given} {family}" if given else family for family, given, _ in names]
+    return ', '.join(natural[:-1]) + f", and {natural[-1]}"
+
+
+def _ieee_authors(authors: List[Dict[str, str]]) -> str:
+    initials = ', '.join(f"{initial} {family}" if initial else family for family, _, initial in _names(authors[:6]))
+    return initials + ', et al.' if len(authors) > 6 else initials
+
+
+AUTHOR_FORMATS = {'apa': _apa_authors, 'mla': _mla_authors, 'chicago': _chicago_authors, 'ieee': _ieee_authors}
+
+
+def _parse_template(template: str, position: int = 0, closing: bool = False) -> Tuple[List[Any], int]:
+    """Template as a list of literal strings, ('field', name) and ('group', parts), and where parsing stopped"""
+    parts = []
+    literal = ''
+    while position < len(template):
+        char = template[position]
+        if char in '{[]':
+            if literal:
+                parts.append(literal)
+                literal = ''
+            if char == '{':
+                end = template.index('}', position)
+                parts.append(('field', template[position + 1:end]))
+                position = end + 1
+            elif char == '[':
+                group, position = _parse_template(template, position + 1, closing=True)
+                parts.append(('group', group))
+            elif closing:
+                return parts, position + 1
+            else:
+                raise ValueError(f"Unbalanced ']' at {position} in template: {template}")
+            continue
+        literal += char
+        position += 1
+    if closing:
+        raise ValueError(f"Unclosed '[' in template: {template}")
+    if literal:
+        parts.append(literal)
+    return parts, position
+
+
+def _field_index(name: str) -> int:
+    """Position of a field in the values a template is rendered from (the authors come first)"""
+    if name not in TEMPLATE_FIELDS:
+        raise ValueError(f"Unknown template field: {name}")
+    return TEMPLATE_FIELDS.index(name)
+
+
+def _segments(parts: List[Any]) -> List[Any]:
+    """Parsed template parts as literal strings, field indexes and (required field indexes, segments) groups"""
+    segments = []
+    for part in parts:
+        if isinstance(part, str):
+            segments.append(part)
+        elif part[0] == 'field':
+            segments.append(_field_index(part[1]))
+        else:
+            # A group is kept when its own fields (not those of groups nested in it) are all set
+            required = tuple(_field_index(inner[1]) for inner in part[1] if not isinstance(inner, str) and inner[0] == 'field')
+            segments.append((required, _segments(part[1])))
+    return segments
+
+
+def _format_string(segments: List[Any], present: Tuple[bool, ...]) -> str:
+    """str.format string of the segments for records whose fields after the authors are `present`"""
+    out = []
+    for segment in segments:
+        if segment.__class__ is str:
+            out.append(segment.replace('{', '{{').replace('}', '}}'))
+        elif segment.__class__ is int:
+            out.append(f"{{{segment}}}")
+        elif all(index == 0 or present[index - 1] for index in segment[0]):
+            # The author list (index 0) is never empty
+            out.append(_format_string(segment[1], present))
+    return ''.join(out)
+
+
+def compile_template(template: str) -> Callable[..., str]:
+    """Turn a reference template into a function of the author list, the record's other field texts and
+    which of them are non-empty (see CitationFormatter.record_fields) to the formatted reference
+
+    The template is parsed once into segments. Which groups a reference
+    keeps depends only on which fields are empty, so each such pattern gets
+    a plain format string the first time it's seen, and formatting a record
+    is one dict lookup and one str.format call.
+    """
+    segments = _segments(_parse_template(template)[0])
+    formats = {}
+
+    def render(authors: str, values: Tuple[str, ...], present: Tuple[bool, ...]) -> str:
+        format_string = formats.get(present)
+        if format_string is None:
+            format_string = formats[present] = _format_string(segments, present)
+        return format_string.format(authors, *values)
+    return render
+
+
+class CitationFormatter:
+    """Formats publication records (DOIValidator._parse_work_data output) as references in several styles
+
+    Each style is an author-list format plus a template parsed once into
+    a renderer; styles are looked up in a dispatch table. Fields shared by
+    every style are prepared once per record, and the author list once per
+    author format, so one record in five styles costs little more than one.
+
+    CSL styles (src.csl_styles) are offered alongside the built-in ones, and
+    a CSL style replaces a built-in style of the same name.
+    """
+
+    def __init__(self, templates: Optional[Dict[str, Tuple[str, str]]] = None, library: Optional[CSLStyleLibrary] = None):
+        self.styles = {}
+        for style, (author_format, template) in (templates or STYLE_TEMPLATES).items():
+            self.styles[style] = (author_format, compile_template(template))
+        self.library = library  # None: the process-wide CSL styles from get_csl_library()
+
+    def _csl_style(self, style: str) -> Optional[CSLStyle]:
+        return (self.library if self.library is not None else get_csl_library()).get(style)
+
+    def style_titles(self) -> Dict[str, str]:
+        """Display title of every style by name: the built-in styles, then the CSL styles"""
+        titles = {style: STYLE_TITLES.get(style, style.upper()) for style in self.styles}
+        titles.update((self.library if self.library is not None else get_csl_library()).titles())
+        return titles
+
+    def _style(self, style: str) -> Tuple[str, Callable[..., str]]:
+        """Author format and compiled template of a style (unknown styles fall back to APA)"""
+        return self.styles.get(style.lower(), self.styles[DEFAULT_STYLE])
+
+    @staticmethod
+    def record_fields(data: Dict[str, Any]) -> Tuple[str, ...]:
+        """Text of every template field after the authors (in TEMPLATE_FIELDS order), with missing fields empty"""
+        doi = data.get('doi') or ''
+        url = data.get('url') or ''
+        if not doi and 'doi.org/' in url:
+            doi = url.split('doi.org/', 1)[1]
+        return (
+            f"{data.get('title') or ''}",
+            f"{data.get('journal') or ''}",
+            f"{data.get('volume') or ''}",
+            f"{data.get('issue') or ''}",
+            f"{data.get('pages') or ''}",
+            f"{(data.get('date') or {}).get('year') or 'n.d.'}",
+            doi,
+        )
+
+    def format(self, data: Dict[str, Any], style: str = DEFAULT_STYLE) -> str:
+        """One record as a reference in one style"""
+        csl_style = self._csl_style(style)
+        if csl_style is not None:
+            return csl_style.render(data)
+        author_format, render = self._style(style)
+        authors = data.get('authors')
+        values = self.record_fields(data)
+        return render(AUTHOR_FORMATS[author_format](authors) if authors else 'Unknown Author', values, tuple(map(bool, values)))
+
+    def format_many(self, records: Iterable[Dict[str, Any]], styles: Iterable[str]) -> List[Dict[str, str]]:
+        """Each record as a reference in each style: one {style: reference} dict per record"""
+        records = list(records)
+        csl_styles = {style: self._csl_style(style) for style in styles}
+        compiled = [(style, *self._style(style)) for style, csl_style in csl_styles.items() if csl_style is None]
+        author_formats = [(name, AUTHOR_FORMATS[name]) for name in dict.fromkeys(name for _, name, _ in compiled)]
+        unknown = {name: 'Unknown Author' for name, _ in author_formats}
+        formatted = []
+        for data in records:
+            values = self.record_fields(data)
+            present = tuple(map(bool, values))
+            authors = data.get('authors')
+            # Styles sharing an author format (APA and Harvard) share the author list
+            author_lists = {name: format_authors(authors) for name, format_authors in author_formats} if authors else unknown
+            formatted.append({style: render(author_lists[name], values, present) for style, name, render in compiled})
+        for style, csl_style in csl_styles.items():
+            if csl_style is not None:
+                for references, reference in zip(formatted, csl_style.render_many(records)):
+                    references[style] = reference
+        return formatted
+
+
+FORMATTER = CitationFormatter()  # shared, so the templates are compiled once
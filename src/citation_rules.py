@@ -0,0 +1,225 @@
+import re
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+# Grammar building blocks shared by every style.
+# Names allow diacritics, apostrophes (O'Neil), hyphens (Smith-Jones) and
+# lowercase particles (van der Berg, de la Cruz).
+UPPER = r"[A-ZÀ-ÖØ-ÞĀĂĄĆĈĊČĎĐĒĔĖĘĚĜĞĠĢĤĦĨĪĬĮİĴĶĹĻĽĿŁŃŅŇŊŌŎŐŒŔŖŘŚŜŞŠŢŤŦŨŪŬŮŰŲŴŶŸŹŻŽ]"
+LETTER = r"[^\W\d_]"
+PARTICLE = r"(?:van|von|der|den|de|del|della|des|di|da|du|dos|le|la|ten|ter|bin|ibn|al|el|St\.)"
+SURNAME = rf"(?:{PARTICLE}\s+)*(?:{UPPER}['’])?{UPPER}{LETTER}*(?:[-'’]{LETTER}+)*"
+ET_AL = r"\s+et\s+al\."
+YEAR = r"(?:\d{4}[a-z]?|n\.d\.)"
+YEARS = rf"{YEAR}(?:,\s*{YEAR})*"
+PAGES = r"\d+(?:[-–]\d+)?"
+# A bare number that looks like a year (1500-2099) is left to the author-date styles
+PAGES_NOT_YEAR = rf"(?!(?:1[5-9]|20)\d\d\b){PAGES}"
+LOCATOR = rf"(?:p\.\s*{PAGES}|pp\.\s*\d+[-–]\d+|para\.\s*\d+|ch\.\s*\d+|sec\.\s*\d+)"
+
+# Author lists: parenthetical APA joins with '&', everything else with 'and'
+AUTHORS_AMP = rf"{SURNAME}(?:{ET_AL}|(?:,\s*{SURNAME})*,?\s*&\s*{SURNAME})?"
+AUTHORS_AND = rf"{SURNAME}(?:{ET_AL}|(?:,\s*{SURNAME})*,?\s+and\s+{SURNAME})?"
+AUTHORS_ANY = rf"{SURNAME}(?:{ET_AL}|(?:,\s*{SURNAME})*,?\s*(?:&|and)\s*{SURNAME})?"
+
+
+@dataclass
+class Rule:
+    """A single grammar rule
+
+    Rules with no issue describe valid forms. Rules with an issue describe a
+    known mistake; `fix` turns the citation text into a corrected version.
+    """
+    name: str
+    pattern: str
+    issue: Optional[str] = None
+    suggestion: Optional[str] = None
+    fix: Optional[Callable[[str], str]] = None
+    compiled: Any = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.compiled = re.compile(rf"^(?:{self.pattern})$")
+
+
+@dataclass
+class RuleVerdict:
+    """Outcome of validating a citation with the rule engine"""
+    is_valid: bool
+    confidence_score: float
+    rule: str
+    style: str
+    issues: List[str] = field(default_factory=list)
+    suggestions: List[str] = field(default_factory=list)
+
+# One work inside a parenthetical citation; several are joined with semicolons
+APA_ENTRY = rf"{AUTHORS_AMP},\s*{YEARS}(?:,\s*{LOCATOR})?"
+MLA_ENTRY = rf"{AUTHORS_AND}\s+{PAGES_NOT_YEAR}(?:,\s*{PAGES_NOT_YEAR})*"
+CHICAGO_ENTRY = rf"{AUTHORS_AND}\s+{YEARS}(?:,\s*{PAGES})?"
+HARVARD_ENTRY = rf"{AUTHORS_ANY},?\s+{YEARS}(?:(?:,\s*|:\s*){LOCATOR}|:\s*{PAGES})?"
+
+
+def _fix_page_locator(text: str) -> str:
+    """Rewrite 'pg 12' / 'page 12-15' style locators as 'p. 12' / 'pp. 12-15'"""
+    def replace(match):
+        pages = match.group(1)
+        prefix = 'pp. ' if re.search(r'[-–]', pages) else 'p. '
+        return prefix + pages + ')'
+    return re.sub(r'(?:pg\.?\s*|page\s+|p\s+)(\d+(?:[-–]\d+)?)\)$', replace, text)
+
+
+def _segments(pattern: str) -> str:
+    """Allow several citations separated by semicolons inside one set of parentheses"""
+    return rf"{pattern}(?:;\s*{pattern})*"
+
+
+# Per-style rule tables. Rules without an issue are valid forms; the rest are known mistakes.
+STYLE_RULES: Dict[str, List[Rule]] = {
+    'apa': [
+        Rule('apa_parenthetical', rf"\({_segments(APA_ENTRY)}\)"),
+        Rule('apa_narrative', rf"{AUTHORS_AND}\s+\({YEARS}(?:,\s*{LOCATOR})?\)"),
+        Rule('apa_and_in_parenthetical',
+             rf"\({SURNAME}(?:,\s*{SURNAME})*,?\s+and\s+{SURNAME},\s*{YEARS}(?:,\s*{LOCATOR})?\)",
+             issue="Parenthetical APA citations join authors with '&', not 'and'",
+             fix=lambda text: re.sub(r'\s+and\s+', ' & ', text)),
+        Rule('apa_ampersand_in_narrative',
+             rf"{SURNAME}(?:,\s*{SURNAME})*,?\s*&\s*{SURNAME}\s+\({YEARS}(?:,\s*{LOCATOR})?\)",
+             issue="Narrative APA citations join authors with 'and', not '&'",
+             fix=lambda text: re.sub(r'\s*&\s*', ' and ', text)),
+        Rule('apa_missing_comma',
+             rf"\({AUTHORS_AMP}\s+{YEARS}(?:,\s*{LOCATOR})?\)",
+             issue="APA parenthetical citations need a comma between author and year",
+             fix=lambda text: re.sub(r'\s+(\d{4}[a-z]?|n\.d\.)', r', \1', text, count=1)),
+        Rule('apa_et_al_period',
+             rf"\({SURNAME}\s+et\s+al,?\s*{YEARS}(?:,\s*{LOCATOR})?\)|{SURNAME}\s+et\s+al\s+\({YEARS}\)",
+             issue="'et al.' needs a period after 'al'",
+             fix=lambda text: re.sub(r'et\s+al\b,?\s*', 'et al., ' if text.startswith('(') else 'et al. ', text)),
+        Rule('apa_bare_page',
+             rf"\({AUTHORS_AMP},\s*{YEARS},\s*(?:pg\.?\s*|page\s+|p\s+){PAGES}\)",
+             issue="Page locators are written 'p. 12' or 'pp. 12-15'",
+             fix=lambda text: _fix_page_locator(text)),
+    ],
+    'mla': [
+        Rule('mla_parenthetical', rf"\({_segments(MLA_ENTRY)}\)"),
+        Rule('mla_page_only', rf"\({PAGES_NOT_YEAR}\)"),
+        Rule('mla_year_page', rf"\({SURNAME}\s+{YEAR},\s*p\.?\s*{PAGES}\)"),
+        Rule('mla_comma_before_page', rf"\({AUTHORS_AND},\s*{PAGES_NOT_YEAR}\)",
+             issue="MLA citations do not put a comma between author and page",
+             fix=lambda text: re.sub(r',\s*(\d)', r' \1', text, count=1)),
+        Rule('mla_page_abbreviation', rf"\({AUTHORS_AND},?\s+pp?\.\s*{PAGES}\)",
+             issue="MLA citations give the page number without 'p.' or 'pp.'",
+             fix=lambda text: re.sub(r',?\s+pp?\.\s*', ' ', text, count=1)),
+    ],
+    'chicago': [
+        Rule('chicago_author_date', rf"\({_segments(CHICAGO_ENTRY)}\)"),
+        Rule('chicago_narrative', rf"{AUTHORS_AND}\s+\({YEARS}(?:,\s*{PAGES})?\)"),
+        Rule('chicago_note', r"\[\d+(?:[-–]\d+)?\]"),
+        Rule('chicago_comma_before_year', rf"\({AUTHORS_AND},\s*{YEARS}(?:,\s*{PAGES})?\)",
+             issue="Chicago author-date citations do not put a comma between author and year",
+             fix=lambda text: re.sub(r',\s*(\d{4}[a-z]?|n\.d\.)', r' \1', text, count=1)),
+    ],
+    'harvard': [
+        Rule('harvard_parenthetical', rf"\({_segments(HARVARD_ENTRY)}\)"),
+        Rule('harvard_narrative', rf"{AUTHORS_AND}\s+\({YEARS}(?:,\s*{LOCATOR}|:\s*{PAGES})?\)"),
+    ],
+    'ieee': [
+        Rule('ieee_numeric', r"\[\d+(?:[-–]\d+)?(?:,\s*\d+(?:[-–]\d+)?)*\]"),
+        Rule('ieee_range', r"\[\d+\]\s*(?:through|to|and|-|–)\s*\[\d+\]"),
+        Rule('ieee_inner_spaces', r"\[\s+\d+\s*\]|\[\s*\d+\s+\]",
+             issue="IEEE reference numbers are written without spaces inside the brackets",
+             fix=lambda text: re.sub(r'\[\s*(\d+)\s*\]', r'[\1]', text)),
+        Rule('ieee_parentheses', r"\(\d+\)",
+             issue="IEEE reference numbers go in square brackets",
+             fix=lambda text: '[' + text[1:-1] + ']'),
+    ],
+}
+
+# Extraction labels that don't name a style map onto the closest grammar
+STYLE_ALIASES = {
+    'simple': 'harvard',
+    'numeric': 'ieee',
+}
+
+
+class CitationRuleEngine:
+    """Declarative, per-style validation of in-text citations
+
+    Returns a concrete verdict (with issues and a corrected suggestion for
+    known mistakes) for the forms it recognises, and None for anything
+    ambiguous so the caller can fall back to an AI model.
+    """
+
+    def __init__(self, style_rules: Optional[Dict[str, List[Rule]]] = None):
+        self.style_rules = style_rules or STYLE_RULES
+
+    def _styles_to_try(self, style: str, expected_style: Optional[str]) -> Tuple[List[str], List[str]]:
+        """The document's and the citation's own style, then every other style"""
+        primary = []
+        for candidate in (expected_style, style):
+            candidate = STYLE_ALIASES.get(candidate, candidate)
+            if candidate in self.style_rules and candidate not in primary:
+                primary.append(candidate)
+        others = [name for name in self.style_rules if name not in primary]
+        return primary, others
+
+    def _match_valid(self, text: str, style_name: str, confidence: float) -> Optional[RuleVerdict]:
+        """Verdict for the first valid form of a style that matches the text"""
+        for rule in self.style_rules[style_name]:
+            if rule.issue is None and rule.compiled.match(text):
+                return RuleVerdict(True, confidence, rule.name, style_name)
+        return None
+
+    def evaluate(self, text: str, style: str = 'unknown', expected_style: Optional[str] = None) -> Optional[RuleVerdict]:
+        """Validate a citation; None means the rules can't decide"""
+        text = ' '.join(text.split())
+        primary, others = self._styles_to_try(style, expected_style)
+
+        # The document's style decides first, then the citation's own: a valid
+        # form passes, a known mistake fails with a concrete fix. A mistake in
+        # the document's style isn't excused by looking valid in another one.
+        for style_name in primary:
+            verdict = self._match_valid(text, style_name, 0.9)
+            if verdict:
+                return verdict
+            for rule in self.style_rules[style_name]:
+                if rule.issue is not None and rule.compiled.match(text):
+                    suggestions = []
+                    if rule.fix:
+                        suggestions.append(f"Change to: {rule.fix(text)}")
+                    if rule.suggestion:
+                        suggestions.append(rule.suggestion)
+                    return RuleVerdict(False, 0.85, rule.name, style_name, [rule.issue], suggestions)
+
+        # A well-formed citation in another style is still a valid citation
+        for style_name in others:
+            verdict = self._match_valid(text, style_name, 0.8)
+            if verdict:
+                return verdict
+
+        return None
+
+
+def measure_coverage(engine: CitationRuleEngine, corpus: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Share of a labelled corpus the rules decide, and how often they decide correctly
+
+    Each corpus entry has 'text', 'style' and 'valid' keys.
+    """
+    decided = 0
+    correct = 0
+    misses = []
+    for entry in corpus:
+        verdict = engine.evaluate(entry['text'], entry.get('style', 'unknown'))
+        if verdict is None:
+            misses.append(entry['text'])
+            continue
+        decided += 1
+        if verdict.is_valid == entry['valid']:
+            correct += 1
+
+    total = len(corpus)
+    return {
+        'total': total,
+        'decided': decided,
+        'coverage': decided / total if total else 0.0,
+        'accuracy': correct / decided if decided else 0.0,
+        'undecided': misses
+    }
@@ -0,0 +1,707 @@
+"""CSL (Citation Style Language) styles: .csl files compiled into reference renderers
+
+A style's XML is compiled once into nested Python functions, one per
+element, so rendering a record walks no XML and reads no attributes.
+The engine covers what reference lists need: macros, choose, groups
+(suppressed when the variables they call are all empty), names with
+et-al, initials and substitution, dates, numbers, labels, en-US terms
+(overridden by the style's own locale), text case, quotes, affixes,
+font styles (with HTML markup), sorting and citation numbers.
+Disambiguation, year suffixes and notes are not implemented.
+"""
+import html
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+
+from config.settings import CSL_STYLES_DIR
+
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+# en-US terms as (singular, plural) by (name, form); a style's <locale> overrides them
+TERMS = {
+    ('and', 'long'): ('and', 'and'),
+    ('and', 'symbol'): ('&', '&'),
+    ('et-al', 'long'): ('et al.', 'et al.'),
+    ('and others', 'long'): ('and others', 'and others'),
+    ('no date', 'long'): ('no date', 'no date'),
+    ('no date', 'short'): ('n.d.', 'n.d.'),
+    ('in', 'long'): ('in', 'in'),
+    ('available at', 'long'): ('available at', 'available at'),
+    ('accessed', 'long'): ('accessed', 'accessed'),
+    ('retrieved', 'long'): ('retrieved', 'retrieved'),
+    ('from', 'long'): ('from', 'from'),
+    ('page', 'long'): ('page', 'pages'),
+    ('page', 'short'): ('p.', 'pp.'),
+    ('volume', 'long'): ('volume', 'volumes'),
+    ('volume', 'short'): ('vol.', 'vols.'),
+    ('issue', 'long'): ('issue', 'issues'),
+    ('issue', 'short'): ('no.', 'nos.'),
+    ('edition', 'long'): ('edition', 'editions'),
+    ('edition', 'short'): ('ed.', 'eds.'),
+    ('editor', 'long'): ('editor', 'editors'),
+    ('editor', 'short'): ('ed.', 'eds.'),
+    ('open-quote', 'long'): ('“', '“'),
+    ('close-quote', 'long'): ('”', '”'),
+    ('open-inner-quote', 'long'): ('‘', '‘'),
+    ('close-inner-quote', 'long'): ('’', '’'),
+    ('page-range-delimiter', 'long'): ('–', '–'),
+}
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+SHORT_MONTHS = ['Jan.', 'Feb.', 'Mar.', 'Apr.', 'May', 'June', 'July', 'Aug.', 'Sept.', 'Oct.', 'Nov.', 'Dec.']
+for number, (month, short_month) in enumerate(zip(MONTHS, SHORT_MONTHS), 1):
+    TERMS[(f'month-{number:02d}', 'long')] = (month, month)
+    TERMS[(f'month-{number:02d}', 'short')] = (short_month, short_month)
+TERM_FORM_FALLBACK = {'verb-short': 'verb', 'verb': 'long', 'symbol': 'short', 'short': 'long'}
+
+# en-US localized dates (<date form="text|numeric">) as (part, attributes) lists
+LOCALE_DATES = {
+    'text': [('month', {'suffix': ' '}), ('day', {'suffix': ', '}), ('year', {})],
+    'numeric': [('month', {'form': 'numeric-leading-zeros', 'suffix': '/'}),
+                ('day', {'form': 'numeric-leading-zeros', 'suffix': '/'}), ('year', {})],
+}
+DATE_PART_INDEX = {'year': 0, 'month': 1, 'day': 2}
+
+# Name options a style, its <citation>/<bibliography> and <names> pass down to <name>
+NAME_OPTIONS = {'and': 'and', 'delimiter-precedes-et-al': 'delimiter-precedes-et-al',
+                'delimiter-precedes-last': 'delimiter-precedes-last', 'et-al-min': 'et-al-min',
+                'et-al-use-first': 'et-al-use-first', 'et-al-use-last': 'et-al-use-last', 'initialize': 'initialize',
+                'initialize-with': 'initialize-with', 'name-as-sort-order': 'name-as-sort-order',
+                'sort-separator': 'sort-separator', 'name-form': 'form', 'name-delimiter': 'delimiter'}
+
+# CrossRef work types (_parse_work_data turns journal-article into "Journal Article") as CSL item types
+ITEM_TYPES = {
+    'journal-article': 'article-journal', 'book-chapter': 'chapter', 'book-section': 'chapter', 'book-part': 'chapter',
+    'proceedings-article': 'paper-conference', 'dissertation': 'thesis', 'posted-content': 'article',
+    'monograph': 'book', 'edited-book': 'book', 'reference-book': 'book', 'book': 'book', 'report': 'report',
+    'reference-entry': 'entry-encyclopedia', 'dataset': 'dataset', 'standard': 'standard', 'peer-review': 'review',
+}
+
+FONT_TAGS = {
+    ('font-style', 'italic'): ('<i>', '</i>'),
+    ('font-style', 'oblique'): ('<i>', '</i>'),
+    ('font-weight', 'bold'): ('<b>', '</b>'),
+    ('font-variant', 'small-caps'): ('<span style="font-variant:small-caps">', '</span>'),
+    ('text-decoration', 'underline'): ('<u>', '</u>'),
+    ('vertical-align', 'sup'): ('<sup>', '</sup>'),
+    ('vertical-align', 'sub'): ('<sub>', '</sub>'),
+}
+TITLE_CASE_STOP_WORDS = frozenset('a an and as at but by down for from in into nor of on onto or over so the till to up '
+                                  'via with yet'.split())
+
+NUMERIC = re.compile(r'\s*\d+[a-z]?\s*(?:[-–,&]\s*\d+[a-z]?\s*)*$', re.I)
+PLURAL = re.compile(r'\d\s*(?:[-–,&]|and)\s*\d')
+DOUBLED_PERIOD = re.compile(r'([.?!])\.')
+MARKUP_TAG = re.compile(r'<[^>]+>')
+NO_SUPPRESSED = frozenset()
+
+
+def _title_case(text: str) -> str:
+    words = text.split(' ')
+    last = len(words) - 1
+    return ' '.join(word[:1].upper() + word[1:] if word.islower() and (index in (0, last) or word not in TITLE_CASE_STOP_WORDS)
+                    else word for index, word in enumerate(words))
+
+
+TEXT_CASES = {
+    'lowercase': str.lower,
+    'uppercase': str.upper,
+    'capitalize-first': lambda text: text[:1].upper() + text[1:],
+    'sentence': lambda text: text[:1].upper() + text[1:],
+    'capitalize-all': lambda text: ' '.join(word[:1].upper() + word[1:] for word in text.split(' ')),
+    'title': _title_case,
+}
+
+
+def _ordinal(number: str) -> str:
+    if not number.isdigit():
+        return number
+    value = int(number)
+    suffix = 'th' if 10 <= value % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(value % 10, 'th')
+    return number + suffix
+
+
+def _initials(given: str, initialize_with: str) -> str:
+    """Given names as initials: "Jean-Paul Marie" is "J.-P. M." with initialize-with ". " and "JM" with ''"""
+    mark = initialize_with.rstrip()
+    gap = initialize_with[len(mark):]
+    return gap.join('-'.join(part[0] + mark for part in word.split('-') if part)
+                    for word in given.replace('.', ' ').split()).strip()
+
+
+def _first(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return f"{value[0]}" if value else ''
+    return f"{value or ''}"
+
+
+def csl_item(data: Dict[str, Any], citation_number: Optional[int] = None) -> Dict[str, Any]:
+    """A record (DOIValidator._parse_work_data output) as CSL variables
+
+    Names become (family, given) pairs, the issue date a (year, month, day)
+    tuple and every other variable a string, empty when the record lacks it.
+    """
+    kind = (data.get('type') or '').lower().replace(' ', '-')
+    date = data.get('date') or {}
+    url = data.get('url') or ''
+    doi = data.get('doi') or (url.split('doi.org/', 1)[1] if 'doi.org/' in url else '')
+    authors = []
+    for author in data.get('authors') or []:
+        family = author.get('family') or ''
+        given = author.get('given') or ''
+        authors.append((family, given) if family else (given or author.get('full_name') or '', ''))
+    publisher = data.get('publisher') or ''
+    return {
+        'type': ITEM_TYPES.get(kind, kind or 'article-journal'),
+        'title': f"{data.get('title') or ''}",
+        'container-title': f"{data.get('journal') or ''}",
+        'publisher': '' if publisher == 'N/A' else publisher,
+        'volume': f"{data.get('volume') or ''}",
+        'issue': f"{data.get('issue') or ''}",
+        'page': f"{data.get('pages') or ''}",
+        'DOI': doi,
+        'URL': url,
+        'ISBN': _first(data.get('isbn')),
+        'ISSN': _first(data.get('issn')),
+        'abstract': f"{data.get('abstract') or ''}",
+        'issued': (date['year'], date.get('month'), date.get('day')) if date.get('year') else None,
+        'author': authors,
+        'citation-number': f"{citation_number or data.get('citation-number') or ''}",
+    }
+
+
+def _without_namespace(root: ET.Element) -> ET.Element:
+    """A style's XML with the CSL namespace dropped from tag names"""
+    for element in root.iter():
+        element.tag = element.tag.rpartition('}')[2]
+    return root
+
+
+class _State:
+    """One rendering of one item: counts of variables called and found (for group suppression)"""
+    __slots__ = ('item', 'called', 'found', 'suppressed')
+
+    def __init__(self, item: Dict[str, Any]):
+        self.item = item
+        self.called = 0
+        self.found = 0
+        self.suppressed = NO_SUPPRESSED  # variables a <substitute> has already rendered
+
+
+Render = Callable[[_State], str]
+
+
+def _join(renderers: List[Render], delimiter: str = '') -> Render:
+    if not renderers:
+        return lambda state: ''
+    if len(renderers) == 1:
+        return renderers[0]
+
+    def join(state: _State) -> str:
+        return delimiter.join([text for text in [render(state) for render in renderers] if text])
+    return join
+
+
+class _Compiler:
+    """Compiles one layout of a style (its <bibliography> or <citation>) into render functions"""
+
+    def __init__(self, root: ET.Element, context: ET.Element, markup: str):
+        self.macros = {macro.get('name'): macro for macro in root.findall('macro')}
+        self.compiled_macros = {}
+        self.terms = dict(TERMS)
+        self.dates = dict(LOCALE_DATES)
+        self.punctuation_in_quote = True
+        for locale in root.findall('locale'):
+            if not locale.get(XML_LANG, 'en').startswith('en'):
+                continue
+            for term in locale.iter('term'):
+                single, multiple = term.find('single'), term.find('multiple')
+                value = (single.text or '', multiple.text or '') if single is not None and multiple is not None \
+                    else (term.text or '', term.text or '')
+                self.terms[(term.get('name'), term.get('form', 'long'))] = value
+            for date in locale.findall('date'):
+                self.dates[date.get('form')] = [(part.get('name'), dict(part.attrib)) for part in date.findall('date-part')]
+            options = locale.find('style-options')
+            if options is not None and options.get('punctuation-in-quote'):
+                self.punctuation_in_quote = options.get('punctuation-in-quote') == 'true'
+        self.html = markup == 'html'
+        self.name_options = {}
+        for element in (root, context):
+            self.name_options.update({NAME_OPTIONS[name]: value for name, value in element.attrib.items() if name in NAME_OPTIONS})
+        self.names_delimiter = context.get('names-delimiter', root.get('names-delimiter', ''))
+
+    def escape(self, text: str) -> str:
+        return html.escape(text, quote=False) if self.html else text
+
+    def term(self, name: str, form: str = 'long', plural: bool = False) -> str:
+        while form:
+            value = self.terms.get((name, form))
+            if value is not None:
+                return value[plural]
+            form = TERM_FORM_FALLBACK.get(form)
+        return ''
+
+    def node(self, element: ET.Element) -> Optional[Render]:
+        compile_element = getattr(self, 'compile_' + element.tag.replace('-', '_'), None)
+        if compile_element is None:
+            return None
+        return self.decorate(compile_element(element), element.attrib)
+
+    def children(self, element: ET.Element) -> List[Render]:
+        return [render for render in map(self.node, element) if render is not None]
+
+    def decorate(self, render: Callable[[Any], str], attributes: Dict[str, str]) -> Callable[[Any], str]:
+        """Wrap a renderer in its element's text case, quotes, font style and affixes (only those it has)"""
+        case = TEXT_CASES.get(attributes.get('text-case'))
+        strip_periods = attributes.get('strip-periods') == 'true'
+        quotes = (self.term('open-quote'), self.term('close-quote')) if attributes.get('quotes') == 'true' else None
+        tags = [FONT_TAGS[key] for key in attributes.items() if key in FONT_TAGS] if self.html else []
+        opening = ''.join(tag for tag, _ in tags)
+        closing = ''.join(tag for _, tag in reversed(tags))
+        prefix = self.escape(attributes.get('prefix', ''))
+        suffix = self.escape(attributes.get('suffix', ''))
+        if not (case or strip_periods or quotes or tags):
+            if not (prefix or suffix):
+                return render
+
+            def affixed(state: Any) -> str:
+                text = render(state)
+                return f"{prefix}{text}{suffix}" if text else ''
+            return affixed
+
+        def decorated(state: Any) -> str:
+            text = render(state)
+            if not text:
+                return ''
+            if case:
+                text = case(text)
+            if strip_periods:
+                text = text.replace('.', '')
+            if quotes:
+                text = f"{quotes[0]}{text}{quotes[1]}"
+            return f"{prefix}{opening}{text}{closing}{suffix}"
+        return decorated
+
+    def compile_layout(self, element: ET.Element) -> Render:
+        return _join(self.children(element))
+
+    def compile_text(self, element: ET.Element) -> Render:
+        if element.get('variable'):
+            return self.variable(element.get('variable'), element.get('form'))
+        if element.get('macro'):
+            return self.macro(element.get('macro'))
+        if element.get('term'):
+            term = self.escape(self.term(element.get('term'), element.get('form', 'long'), element.get('plural') == 'true'))
+        else:
+            term = self.escape(element.get('value', ''))
+        return lambda state: term
+
+    def variable(self, name: str, form: Optional[str] = None, transform: Optional[Callable[[str], str]] = None) -> Render:
+        keys = (f"{name}-short", name) if form == 'short' else (name,)
+        escape = self.escape
+        range_delimiter = self.term('page-range-delimiter') if name == 'page' else None
+
+        def variable(state: _State) -> str:
+            state.called += 1
+            if name in state.suppressed:
+                return ''
+            for key in keys:
+                value = state.item.get(key)
+                if value and isinstance(value, str):
+                    break
+            else:
+                return ''
+            state.found += 1
+            if range_delimiter and '-' in value:
+                value = value.replace('-', range_delimiter)
+            if transform:
+                value = transform(value)
+            return escape(value)
+        return variable
+
+    def compile_number(self, element: ET.Element) -> Render:
+        ordinal = element.get('form') in ('ordinal', 'long-ordinal')
+        return self.variable(element.get('variable'), transform=_ordinal if ordinal else None)
+
+    def macro(self, name: str) -> Render:
+        if name not in self.compiled_macros:
+            if name not in self.macros:
+                raise ValueError(f"Unknown CSL macro: {name}")
+            self.compiled_macros[name] = _join(self.children(self.macros[name]))
+        return self.compiled_macros[name]
+
+    def compile_label(self, element: ET.Element) -> Render:
+        name = element.get('variable')
+        form = element.get('form', 'long')
+        plural = element.get('plural', 'contextual')
+        single = self.escape(self.term(name, form))
+        multiple = self.escape(self.term(name, form, plural=True))
+
+        def label(state: _State) -> str:
+            value = state.item.get(name)
+            if not value or not isinstance(value, str) or name in state.suppressed:
+                return ''
+            return multiple if plural == 'always' or (plural == 'contextual' and PLURAL.search(value)) else single
+        return label
+
+    def compile_group(self, element: ET.Element) -> Render:
+        renderers = self.children(element)
+        delimiter = self.escape(element.get('delimiter', ''))
+
+        def group(state: _State) -> str:
+            called, found = state.called, state.found
+            texts = [text for text in [render(state) for render in renderers] if text]
+            if not texts or (state.called > called and state.found == found):
+                return ''
+            return delimiter.join(texts)
+        return group
+
+    def compile_choose(self, element: ET.Element) -> Render:
+        branches = []
+        for branch in element:
+            if branch.tag in ('if', 'else-if'):
+                branches.append((self.condition(branch), _join(self.children(branch))))
+            elif branch.tag == 'else':
+                branches.append((None, _join(self.children(branch))))
+
+        def choose(state: _State) -> str:
+            for test, render in branches:
+                if test is None or test(state.item):
+                    return render(state)
+            return ''
+        return choose
+
+    @staticmethod
+    def condition(branch: ET.Element) -> Callable[[Dict[str, Any]], bool]:
+        kinds = frozenset(branch.get('type', '').split())
+        if kinds and branch.get('match') == 'any' and set(branch.attrib) == {'type', 'match'}:
+            return lambda item: item['type'] in kinds  # the usual test, as one set lookup
+        tests = [lambda item, kind=kind: item['type'] == kind for kind in branch.get('type', '').split()]
+        tests += [lambda item, name=name: bool(item.get(name)) for name in branch.get('variable', '').split()]
+        tests += [lambda item, name=name: isinstance(item.get(name), str) and bool(NUMERIC.match(item[name]))
+                  for name in branch.get('is-numeric', '').split()]
+        # Cite positions, locators, uncertain dates and disambiguation never apply to a reference list entry
+        for attribute in ('position', 'locator', 'is-uncertain-date', 'disambiguate'):
+            tests += [lambda item: False for _ in branch.get(attribute, '').split()]
+        match = branch.get('match', 'all')
+        if match == 'any':
+            return lambda item: any(test(item) for test in tests)
+        if match == 'none':
+            return lambda item: not any(test(item) for test in tests)
+        return lambda item: all(test(item) for test in tests)
+
+    def compile_date(self, element: ET.Element) -> Render:
+        name = element.get('variable')
+        if element.get('form') in self.dates:
+            overrides = {part.get('name'): part.attrib for part in element.findall('date-part')}
+            shown = element.get('date-parts', 'year-month-day').split('-')
+            parts = [(part, {**attributes, **overrides.get(part, {})})
+                     for part, attributes in self.dates[element.get('form')] if part in shown]
+        else:
+            parts = [(part.get('name'), part.attrib) for part in element.findall('date-part')]
+        renderers = [self.decorate(self.date_part(part, attributes), attributes) for part, attributes in parts]
+        delimiter = self.escape(element.get('delimiter', ''))
+
+        def date(state: _State) -> str:
+            state.called += 1
+            value = state.item.get(name)
+            if not value or name in state.suppressed:
+                return ''
+            state.found += 1
+            return delimiter.join([text for text in [render(value) for render in renderers] if text])
+        return date
+
+    def date_part(self, part: str, attributes: Dict[str, str]) -> Callable[[Tuple], str]:
+        index = DATE_PART_INDEX[part]
+        form = attributes.get('form')
+        short = part == 'year' and form == 'short'
+        if part == 'year':
+            texts = None
+        elif part == 'month':
+            if form in ('numeric', 'numeric-leading-zeros'):
+                texts = [''] + [f"{month:02d}" if form == 'numeric-leading-zeros' else f"{month}" for month in range(1, 13)]
+            else:
+                texts = [''] + [self.escape(self.term(f'month-{month:02d}', form or 'long')) for month in range(1, 13)]
+        else:
+            texts = [''] + [_ordinal(f"{day}") if form == 'ordinal' else f"{day:02d}" if form == 'numeric-leading-zeros'
+                            else f"{day}" for day in range(1, 32)]
+
+        def date_part(value: Tuple) -> str:
+            number = value[index]
+            if not number:
+                return ''
+            if texts is None:
+                return f"{number}"[-2:] if short else f"{number}"
+            return texts[number] if 0 < number < len(texts) else ''
+        return date_part
+
+    def compile_names(self, element: ET.Element, inherited: Optional[ET.Element] = None) -> Render:
+        names = element.get('variable', '').split()
+        parts = {child.tag: child for child in element}
+        if inherited is not None:
+            for child in inherited:
+                if child.tag in ('name', 'et-al', 'label'):
+                    parts.setdefault(child.tag, child)
+        format_names = self.name_list(parts.get('name'), parts.get('et-al'))
+        label = parts.get('label')
+        label_first = label is not None and 'name' in parts and list(parts).index('label') < list(parts).index('name')
+        if label is not None:
+            form = label.get('form', 'long')
+            terms = {name: (self.escape(self.term(name, form)), self.escape(self.term(name, form, plural=True)))
+                     for name in names}
+            decorate_label = self.decorate(lambda text: text, label.attrib)
+        delimiter = self.escape(element.get('delimiter', self.names_delimiter))
+        substitutes = []
+        if 'substitute' in parts:
+            for child in parts['substitute']:
+                render = self.decorate(self.compile_names(child, element), child.attrib) if child.tag == 'names' \
+                    else self.node(child)
+                if render is not None:
+                    substitutes.append((render, self.variables_used(child)))
+
+        def render_names(state: _State) -> str:
+            state.called += 1
+            texts = []
+            for name in names:
+                people = state.item.get(name)
+                if people and name not in state.suppressed:
+                    text = format_names(people)
+                    if label is not None:
+                        term = decorate_label(terms[name][len(people) > 1])
+                        text = term + text if label_first else text + term
+                    texts.append(text)
+            if texts:
+                state.found += 1
+                return delimiter.join(texts)
+            for render, used in substitutes:
+                text = render(state)
+                if text:
+                    state.suppressed = state.suppressed | used
+                    return text
+            return ''
+        return render_names
+
+    def variables_used(self, element: ET.Element) -> frozenset:
+        """Variables an element renders, directly or through macros"""
+        used = set()
+        for node in element.iter():
+            used.update(node.get('variable', '').split())
+            if node.tag == 'text' and node.get('macro') in self.macros:
+                used |= self.variables_used(self.macros[node.get('macro')])
+        return frozenset(used)
+
+    def name_list(self, name: Optional[ET.Element], et_al: Optional[ET.Element]) -> Callable[[List[Tuple[str, str]]], str]:
+        """Function formatting a list of (family, given) names as <name> asks"""
+        options = dict(self.name_options)
+        if name is not None:
+            options.update(name.attrib)
+        form = options.get('form', 'long')
+        and_word = {'text': self.term('and'), 'symbol': self.term('and', 'symbol')}.get(options.get('and'))
+        delimiter = options.get('delimiter', ', ')
+        precedes_last = options.get('delimiter-precedes-last', 'contextual')
+        precedes_et_al = options.get('delimiter-precedes-et-al', 'contextual')
+        et_al_min = int(options.get('et-al-min', 0))
+        use_first = int(options.get('et-al-use-first', 1))
+        use_last = options.get('et-al-use-last') == 'true'
+        sort_order = options.get('name-as-sort-order')
+        sort_separator = options.get('sort-separator', ', ')
+        initialize_with = options.get('initialize-with') if options.get('initialize', 'true') == 'true' else None
+        et_al_term = self.term(et_al.get('term', 'et-al') if et_al is not None else 'et-al')
+        if et_al is not None:
+            et_al_term = self.decorate(lambda text: text, et_al.attrib)(et_al_term)
+        escape = self.escape
+
+        def one(person: Tuple[str, str], inverted: bool) -> str:
+            family, given = person
+            if not given or form == 'short':
+                return escape(family)
+            if initialize_with is not None:
+                given = _initials(given, initialize_with)
+            return escape(f"{family}{sort_separator}{given}" if inverted else f"{given} {family}")
+
+        def inverted(index: int) -> bool:
+            return sort_order == 'all' or (sort_order == 'first' and index == 0)
+
+        def separator(option: str, count: int, last_index: int) -> str:
+            if option == 'always' or (option == 'contextual' and count > 2) or \
+                    (option == 'after-inverted-name' and inverted(last_index)):
+                return delimiter
+            return ' '
+
+        def format_names(people: List[Tuple[str, str]]) -> str:
+            count = len(people)
+            if form == 'count':
+                return f"{min(count, use_first) if et_al_min and count >= et_al_min else count}"
+            if et_al_min and count >= et_al_min:
+                texts = [one(person, inverted(index)) for index, person in enumerate(people[:use_first])]
+                if use_last and count > use_first + 1:
+                    return f"{delimiter.join(texts)}{delimiter}… {one(people[-1], inverted(count - 1))}"
+                if not et_al_term:
+                    return delimiter.join(texts)
+                joiner = separator(precedes_et_al, len(texts) + 1, len(texts) - 1)
+                return f"{delimiter.join(texts)}{joiner}{et_al_term}"
+            texts = [one(person, inverted(index)) for index, person in enumerate(people)]
+            if count == 1 or not and_word:
+                return delimiter.join(texts)
+            return f"{delimiter.join(texts[:-1])}{separator(precedes_last, count, count - 2)}{and_word} {texts[-1]}"
+        return format_names
+
+    def sort_key(self, key: ET.Element) -> Callable[[Dict[str, Any]], str]:
+        """Function giving an item's value for one <sort> key, as text that sorts correctly"""
+        if key.get('macro'):
+            render = self.macro(key.get('macro'))
+            return lambda item: MARKUP_TAG.sub('', render(_State(item))).casefold()
+        name = key.get('variable')
+
+        def value(item: Dict[str, Any]) -> str:
+            value = item.get(name)
+            if not value:
+                return ''
+            if isinstance(value, tuple):
+                return ''.join(f"{part or 0:04d}" for part in value)
+            if isinstance(value, list):
+                return ' '.join(f"{family} {given}" for family, given in value).casefold()
+            return value.zfill(12) if value.isdigit() else value.casefold()
+        return value
+
+
+class CSLStyle:
+    """A CSL style compiled into a reference renderer
+
+    Rendering uses the style's <bibliography> layout (its <citation>
+    layout when it has none) and gives plain text, or HTML for markup='html'.
+    """
+
+    def __init__(self, root: ET.Element, markup: str = 'text'):
+        info = root.find('info')
+        self.id = (info.findtext('id') if info is not None else None) or ''
+        self.title = (info.findtext('title') if info is not None else None) or self.id
+        context = root.find('bibliography')
+        if context is None or context.find('layout') is None:
+            context = root.find('citation')
+        if context is None or context.find('layout') is None:
+            raise ValueError(f"CSL style has no layout (a dependent style needs its parent): {self.title}")
+        compiler = _Compiler(root, context, markup)
+        self._layout = compiler.decorate(compiler.compile_layout(context.find('layout')), context.find('layout').attrib)
+        sort = context.find('sort')
+        self._sort_keys = [(compiler.sort_key(key), key.get('sort') == 'descending')
+                           for key in (sort.findall('key') if sort is not None else [])]
+        close_quote = re.escape(compiler.escape(compiler.term('close-quote')))
+        self._quote_punctuation = re.compile(f'({close_quote})([.,])') if compiler.punctuation_in_quote else None
+
+    @classmethod
+    def load(cls, path: str, markup: str = 'text') -> 'CSLStyle':
+        """Compile a .csl file"""
+        return cls(_without_namespace(ET.parse(path).getroot()), markup)
+
+    @classmethod
+    def from_xml(cls, text: str, markup: str = 'text') -> 'CSLStyle':
+        """Compile a style's XML"""
+        return cls(_without_namespace(ET.fromstring(text)), markup)
+
+    def _render(self, item: Dict[str, Any]) -> str:
+        text = self._layout(_State(item))
+        if self._quote_punctuation:
+            text = self._quote_punctuation.sub(r'\2\1', text)
+        return DOUBLED_PERIOD.sub(r'\1', text)
+
+    def render(self, data: Dict[str, Any]) -> str:
+        """One record (DOIValidator._parse_work_data output) as a reference"""
+        return self._render(csl_item(data))
+
+    def render_many(self, records: Iterable[Dict[str, Any]]) -> List[str]:
+        """Each record as a reference, in the given order"""
+        render = self._render
+        return [render(csl_item(data)) for data in records]
+
+    def bibliography(self, records: Iterable[Dict[str, Any]]) -> List[str]:
+        """Records as a reference list: numbered in the given (citation) order, then sorted as the style says"""
+        items = [csl_item(data, number) for number, data in enumerate(records, 1)]
+        # Sort by the last key first: Python's stable sort then orders by all keys.
+        # Items without a value for a key come last either way
+        for key, descending in reversed(self._sort_keys):
+            def sort_value(item: Dict[str, Any], key=key, descending=descending) -> Tuple[bool, str]:
+                value = key(item)
+                return (bool(value) if descending else not value), value
+            items.sort(key=sort_value, reverse=descending)
+        render = self._render
+        return [render(item) for item in items]
+
+
+class CSLStyleLibrary:
+    """The .csl files in a directory, each compiled the first time it is asked for and then reused
+
+    Styles are named after their files (config/csl/vancouver.csl is
+    "vancouver"). A dependent style, which only points at its parent with
+    an independent-parent link, renders with the parent when the parent's
+    file is in the same directory.
+    """
+
+    def __init__(self, directory: str, markup: str = 'text'):
+        self.directory = directory
+        self.markup = markup
+        self.paths = {}
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.lower().endswith('.csl'):
+                    self.paths[name[:-4].lower()] = os.path.join(directory, name)
+        self.styles = {}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self.paths
+
+    def names(self) -> List[str]:
+        return list(self.paths)
+
+    def get(self, name: str) -> Optional[CSLStyle]:
+        """Compiled style, or None when there is no such file or it isn't a usable style"""
+        name = name.lower()
+        if name in self.styles:
+            return self.styles[name]
+        if name not in self.paths:
+            return None
+        with self.lock:
+            if name not in self.styles:
+                self.styles[name] = self._load(name)
+        return self.styles[name]
+
+    def titles(self) -> Dict[str, str]:
+        """Title of every usable style by name"""
+        return {name: style.title for name, style in ((name, self.get(name)) for name in self.paths) if style is not None}
+
+    def _load(self, name: str) -> Optional[CSLStyle]:
+        try:
+            root = _without_namespace(ET.parse(self.paths[name]).getroot())
+            if root.find('bibliography') is None and root.find('citation') is None:
+                link = root.find("info/link[@rel='independent-parent']")
+                parent = link.get('href', '').rstrip('/').rsplit('/', 1)[-1].lower() if link is not None else ''
+                if parent not in self.paths or parent == name:
+                    raise ValueError(f"parent style {parent or '(none)'} is not in {self.directory}")
+                style = CSLStyle.load(self.paths[parent], self.markup)
+                style.id, style.title = root.findtext('info/id') or style.id, root.findtext('info/title') or style.title
+                return style
+            return CSLStyle(root, self.markup)
+        except (ET.ParseError, ValueError, KeyError) as e:
+            print(f"Error loading CSL style {self.paths[name]}: {str(e)}")
+            return None
+
+
+_shared_library = None
+_shared_library_lock = threading.Lock()
+
+
+def get_csl_library() -> CSLStyleLibrary:
+    """Process-wide library of the styles in CSL_STYLES_DIR (the environment variable, else the setting)"""
+    global _shared_library
+    directory = os.environ.get("CSL_STYLES_DIR") or CSL_STYLES_DIR
+    with _shared_library_lock:
+        if _shared_library is None or _shared_library.directory != directory:
+            _shared_library = CSLStyleLibrary(directory)
+    return _shared_library
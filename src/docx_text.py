@@ -0,0 +1,101 @@
+import re
+import zipfile
+from typing import List
+from xml.etree.ElementTree import iterparse
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+PARAGRAPH = W + 'p'
+CELL = W + 'tc'
+TEXT = W + 't'
+# Run content that stands for a character
+SPECIAL_CHARACTERS = {W + 'tab': '\t', W + 'br': '\n', W + 'cr': '\n', W + 'noBreakHyphen': '-', W + 'softHyphen': ''}
+
+HEADER_FOOTER_PART = re.compile(r'word/(?:header|footer)(\d*)\.xml$')
+
+
+def _part_texts(archive: zipfile.ZipFile, name: str) -> List[str]:
+    """Non-empty paragraphs and table cells of one XML part, in document order
+
+    The part is streamed with iterparse and finished elements are dropped,
+    so memory stays flat however long the document is. A table cell becomes
+    one item (its paragraphs joined by newlines); vertically merged cells
+    carry no text in the XML, so merged text isn't repeated. Text boxes are
+    read from their current markup only, not the legacy fallback copy.
+    """
+    items = []
+    paragraphs = []  # text pieces of the paragraphs being read (text boxes nest them)
+    cells = []  # paragraph texts of the table cells being read (tables nest too)
+    fallback_depth = 0
+    open_elements = []
+
+    with archive.open(name) as part:
+        for event, element in iterparse(part, events=('start', 'end')):
+            tag = element.tag
+            if event == 'start':
+                open_elements.append(element)
+                if tag == FALLBACK:
+                    fallback_depth += 1
+                elif fallback_depth:
+                    pass
+                elif tag == PARAGRAPH:
+                    paragraphs.append([])
+                elif tag == CELL:
+                    cells.append([])
+                continue
+
+            open_elements.pop()
+            if tag == FALLBACK:
+                fallback_depth -= 1
+            elif fallback_depth:
+                pass
+            elif tag == TEXT:
+                if paragraphs:
+                    paragraphs[-1].append(element.text or '')
+            elif tag in SPECIAL_CHARACTERS:
+                if paragraphs:
+                    paragraphs[-1].append(SPECIAL_CHARACTERS[tag])
+            elif tag == PARAGRAPH:
+                text = ''.join(paragraphs.pop())
+                if cells:
+                    cells[-1].append(text)
+                elif text.strip():
+                    items.append(text)
+            elif tag == CELL:
+                text = '\n'.join(paragraph for paragraph in cells.pop() if paragraph.strip())
+                if cells:
+                    cells[-1].append(text)
+                elif text:
+                    items.append(text)
+
+            if open_elements and not paragraphs and not cells:
+                # Drop finished elements outside paragraphs and cells, so the tree never holds the whole part
+                element.clear()
+                open_elements[-1].remove(element)
+    return items
+
+
+def docx_to_text(file) -> str:
+    """Text of a DOCX file, read straight from its XML parts
+
+    Body paragraphs and tables come first in document order, then footnotes
+    and endnotes, then headers and footers. Header and footer text that
+    repeats (the same header on every section, or first-page and default
+    headers that match) is included once.
+    """
+    with zipfile.ZipFile(file) as archive:
+        names = set(archive.namelist())
+        items = _part_texts(archive, 'word/document.xml')
+        for notes in ('word/footnotes.xml', 'word/endnotes.xml'):
+            if notes in names:
+                items.extend(_part_texts(archive, notes))
+
+        parts = sorted((name for name in names if HEADER_FOOTER_PART.match(name)),
+                       key=lambda name: (name.startswith('word/footer'), int(HEADER_FOOTER_PART.match(name).group(1) or 0)))
+        seen = set()
+        for name in parts:
+            for text in _part_texts(archive, name):
+                if text not in seen:
+                    seen.add(text)
+                    items.append(text)
+    return '\n\n'.join(items)
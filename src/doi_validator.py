@@ -1,19 +1,27 @@
 import requests
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import re
 from datetime import datetime
+from src.http_client import RateLimitedSession, get_async_client, gather_limited, run_sync
+from src.offline_index import OfflineIndex, get_offline_index
+from src.citation_formats import FORMATTER
+from config.settings import CROSSREF_WORK_FIELDS, CROSSREF_EXTRA_FIELDS
 
 class DOIValidator:
     """DOI validation and metadata retrieval using CrossRef API"""
     
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, offline_index: Optional[OfflineIndex] = None):
+        self.session = RateLimitedSession()
         self.session.headers.update({
             'User-Agent': 'Psyte/1.0 (Academic Citation Checker)',
             'Accept': 'application/json',
         })
         self.crossref_api = 'https://api.crossref.org/works'
         self.timeout = 15
+        self.async_client = get_async_client()
+        # Local records answer first; CrossRef is only asked about DOIs the index doesn't have
+        self.offline_index = offline_index if offline_index is not None else get_offline_index()
+        self.formatter = FORMATTER  # per-style templates, compiled once per process
         
     def clean_doi(self, doi: str) -> str:
         """Clean and normalize DOI"""
@@ -29,57 +37,143 @@ class DOIValidator:
         doi_pattern = r'^10\.\d{4,}/[-._;()/:\w]+$'
         return bool(re.match(doi_pattern, doi))
     
-    def get_publication_info(self, doi: str) -> Dict[str, Any]:
-        """Retrieve publication information from CrossRef"""
+    def get_publication_info(self, doi: str, include_extras: bool = True) -> Dict[str, Any]:
+        """Retrieve publication information from CrossRef
+        
+        Only the fields we read are fetched; the abstract and license are
+        left out (empty in the result) unless include_extras is set.
+        """
         doi = self.clean_doi(doi)
         
         if not self.validate_doi_format(doi):
-            return {
-                'success': False,
-                'error': 'Invalid DOI format',
-                'doi': doi
-            }
+            return self._invalid_format_result(doi)
+        
+        offline = self._offline_result(doi)
+        if offline is not None:
+            return offline
         
         try:
-            response = self.session.get(
-                f"{self.crossref_api}/{doi}",
-                timeout=self.timeout
-            )
+            url, params = self._work_request(doi, include_extras)
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            if response.status_code == 400 and params:
+                # CrossRef rejected the field selection: fall back to the whole record
+                response = self.session.get(f"{self.crossref_api}/{doi}", timeout=self.timeout)
+            return self._build_publication_result(response, doi)
             
-            if response.status_code == 404:
-                return {
-                    'success': False,
-                    'error': 'DOI not found in CrossRef database',
-                    'doi': doi
-                }
-            elif response.status_code != 200:
-                return {
-                    'success': False,
-                    'error': f'Error: {response.status_code} {response.reason}',
-                    'doi': doi
-                }
-            
-            data = response.json()
-            work = data.get('message', {})
-            
-            return {
-                'success': True,
-                'doi': doi,
-                'data': self._parse_work_data(work, doi)
-            }
+        except requests.exceptions.Timeout:
+            return self._timeout_result(doi)
+        except Exception as e:
+            return self._network_error_result(doi, e)
+    
+    async def get_publication_info_async(self, doi: str, include_extras: bool = True) -> Dict[str, Any]:
+        """Retrieve publication information from CrossRef without blocking the event loop"""
+        doi = self.clean_doi(doi)
+        
+        if not self.validate_doi_format(doi):
+            return self._invalid_format_result(doi)
+        
+        offline = self._offline_result(doi)
+        if offline is not None:
+            return offline
+        
+        try:
+            url, params = self._work_request(doi, include_extras)
+            headers = dict(self.session.headers)
+            response = await self.async_client.get(url, params=params, headers=headers, timeout=self.timeout)
+            if response.status_code == 400 and params:
+                response = await self.async_client.get(f"{self.crossref_api}/{doi}", headers=headers, timeout=self.timeout)
+            return self._build_publication_result(response, doi)
             
         except requests.exceptions.Timeout:
-            return {
-                'success': False,
-                'error': 'Request timeout - CrossRef API is not responding',
-                'doi': doi
-            }
+            return self._timeout_result(doi)
         except Exception as e:
+            return self._network_error_result(doi, e)
+    
+    def _work_request(self, doi: str, include_extras: bool) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """URL and query parameters fetching a work's fields
+        
+        CrossRef only supports select on /works queries, so the DOI is looked
+        up with a doi filter; a DOI with a comma can't be filtered on and its
+        whole record (/works/{doi}) is fetched instead.
+        """
+        if ',' in doi:
+            return f"{self.crossref_api}/{doi}", None
+        fields = CROSSREF_WORK_FIELDS + CROSSREF_EXTRA_FIELDS if include_extras else CROSSREF_WORK_FIELDS
+        return self.crossref_api, {'filter': f'doi:{doi}', 'select': ','.join(fields), 'rows': 1}
+    
+    def _offline_result(self, doi: str) -> Optional[Dict[str, Any]]:
+        """Publication info from the offline index, or None when it isn't there"""
+        if self.offline_index is None:
+            return None
+        work = self.offline_index.get_by_doi(doi)
+        if work is None:
+            return None
+        return {
+            'success': True,
+            'doi': doi,
+            'data': self._parse_work_data(work, doi),
+            'source': 'offline_index'
+        }
+    
+    def _build_publication_result(self, response, doi: str) -> Dict[str, Any]:
+        """Turn a CrossRef response into a publication info result"""
+        if response.status_code == 404:
+            return self._not_found_result(doi)
+        elif response.status_code != 200:
             return {
                 'success': False,
-                'error': f'Network error: {str(e)}',
-                'doi': doi
+                'error': f'Error: {response.status_code} {response.reason}',
+                'doi': doi,
+                'retryable': True
             }
+        
+        data = response.json()
+        work = data.get('message', {})
+        if 'items' in work:
+            # A filtered /works query: the work is its only item, if CrossRef has it
+            if not work['items']:
+                return self._not_found_result(doi)
+            work = work['items'][0]
+        
+        return {
+            'success': True,
+            'doi': doi,
+            'data': self._parse_work_data(work, doi)
+        }
+    
+    def _not_found_result(self, doi: str) -> Dict[str, Any]:
+        """Result for a DOI CrossRef doesn't know"""
+        return {
+            'success': False,
+            'error': 'DOI not found in CrossRef database',
+            'doi': doi
+        }
+    
+    def _invalid_format_result(self, doi: str) -> Dict[str, Any]:
+        """Result for a DOI that fails format validation"""
+        return {
+            'success': False,
+            'error': 'Invalid DOI format',
+            'doi': doi
+        }
+    
+    def _timeout_result(self, doi: str) -> Dict[str, Any]:
+        """Result for a CrossRef request that timed out"""
+        return {
+            'success': False,
+            'error': 'Request timeout - CrossRef API is not responding',
+            'doi': doi,
+            'retryable': True
+        }
+    
+    def _network_error_result(self, doi: str, error: Exception) -> Dict[str, Any]:
+        """Result for any other request failure"""
+        return {
+            'success': False,
+            'error': f'Network error: {str(error)}',
+            'doi': doi,
+            'retryable': True
+        }
     
     def _parse_work_data(self, work: Dict, doi: str) -> Dict[str, Any]:
         """Parse CrossRef work data into structured format"""
@@ -136,7 +230,7 @@ class DOIValidator:
         }
         
         # Try different date fields in order of preference
-        for date_type in ['published-print', 'published-online', 'published', 'created']:
+        for date_type in ['published-print', 'published-online', 'published', 'issued', 'created']:
             if work.get(date_type):
                 date_parts = work[date_type].get('date-parts', [[]])
                 if date_parts and date_parts[0]:
@@ -183,189 +277,19 @@ class DOIValidator:
     
     def format_citation(self, data: Dict[str, Any], style: str = 'apa') -> str:
         """Format publication data as a citation"""
-        if style.lower() == 'apa':
-            return self._format_apa_citation(data)
-        elif style.lower() == 'mla':
-            return self._format_mla_citation(data)
-        elif style.lower() == 'chicago':
-            return self._format_chicago_citation(data)
-        elif style.lower() == 'harvard':
-            return self._format_harvard_citation(data)
-        elif style.lower() == 'ieee':
-            return self._format_ieee_citation(data)
-        else:
-            return self._format_apa_citation(data)
-    
-    def _format_apa_citation(self, data: Dict[str, Any]) -> str:
-        """Format citation in APA style"""
-        authors = data.get('authors', [])
-        year = data.get('date', {}).get('year', 'n.d.')
-        title = data.get('title', '')
-        journal = data.get('journal', '')
-        volume = data.get('volume', '')
-        issue = data.get('issue', '')
-        pages = data.get('pages', '')
-        doi = data.get('doi', '')
-        
-        # Format authors
-        if not authors:
-            author_str = 'Unknown Author'
-        elif len(authors) == 1:
-            author_str = f"{authors[0]['family']}, {authors[0]['given'][0]}."
-        elif len(authors) <= 20:
-            author_list = [f"{a['family']}, {a['given'][0]}." for a in authors[:-1]]
-            author_str = ', '.join(author_list) + f", & {authors[-1]['family']}, {authors[-1]['given'][0]}."
-        else:
-            first_19 = [f"{a['family']}, {a['given'][0]}." for a in authors[:19]]
-            author_str = ', '.join(first_19) + f", ... {authors[-1]['family']}, {authors[-1]['given'][0]}."
-        
-        # Build citation
-        citation = f"{author_str} ({year}). {title}."
-        
-        if journal:
-            citation += f" {journal}"
-            if volume:
-                citation += f", {volume}"
-                if issue:
-                    citation += f"({issue})"
-            if pages:
-                citation += f", {pages}"
-            citation += "."
-        
-        if doi:
-            citation += f" https://doi.org/{doi}"
-        
-        return citation
+        return self.formatter.format(data, style)
     
-    def _format_mla_citation(self, data: Dict[str, Any]) -> str:
-        """Format citation in MLA style"""
-        authors = data.get('authors', [])
-        title = data.get('title', '')
-        journal = data.get('journal', '')
-        volume = data.get('volume', '')
-        issue = data.get('issue', '')
-        year = data.get('date', {}).get('year', 'n.d.')
-        pages = data.get('pages', '')
-        doi = data.get('doi', '')
-        
-        # Format authors
-        if not authors:
-            author_str = 'Unknown Author'
-        elif len(authors) == 1:
-            author_str = f"{authors[0]['family']}, {authors[0]['given']}"
-        elif len(authors) == 2:
-            author_str = f"{authors[0]['family']}, {authors[0]['given']}, and {authors[1]['given']} {authors[1]['family']}"
-        else:
-            author_str = f"{authors[0]['family']}, {authors[0]['given']}, et al"
-        
-        # Build citation
-        citation = f'{author_str}. "{title}."'
-        
-        if journal:
-            citation += f" {journal}"
-            if volume:
-                citation += f", vol. {volume}"
-                if issue:
-                    citation += f", no. {issue}"
-            if year:
-                citation += f", {year}"
-            if pages:
-                citation += f", pp. {pages}"
-            citation += "."
-        
-        if doi:
-            citation += f" https://doi.org/{doi}."
-        
-        return citation
+    def format_citations(self, records: List[Dict[str, Any]], styles: List[str]) -> List[Dict[str, str]]:
+        """Format many publication records in several styles at once: one {style: citation} dict per record"""
+        return self.formatter.format_many(records, styles)
     
-    def _format_chicago_citation(self, data: Dict[str, Any]) -> str:
-        """Format citation in Chicago style"""
-        authors = data.get('authors', [])
-        year = data.get('date', {}).get('year', 'n.d.')
-        title = data.get('title', '')
-        journal = data.get('journal', '')
-        volume = data.get('volume', '')
-        issue = data.get('issue', '')
-        pages = data.get('pages', '')
-        doi = data.get('doi', '')
-        
-        # Format authors
-        if not authors:
-            author_str = 'Unknown Author'
-        elif len(authors) == 1:
-            author_str = f"{authors[0]['family']}, {authors[0]['given']}"
-        else:
-            author_list = [f"{a['given']} {a['family']}" for a in authors[:-1]]
-            author_str = ', '.join(author_list) + f", and {authors[-1]['given']} {authors[-1]['family']}"
-        
-        # Build citation
-        citation = f'{author_str}. "{title}."'
-        
-        if journal:
-            citation += f" {journal}"
-            if volume:
-                citation += f" {volume}"
-                if issue:
-                    citation += f", no. {issue}"
-            if year:
-                citation += f" ({year})"
-            if pages:
-                citation += f": {pages}"
-            citation += "."
-        
-        if doi:
-            citation += f" https://doi.org/{doi}."
-        
-        return citation
-    
-    def _format_harvard_citation(self, data: Dict[str, Any]) -> str:
-        """Format citation in Harvard style"""
-        return self._format_apa_citation(data)  # Similar to APA
-    
-    def _format_ieee_citation(self, data: Dict[str, Any]) -> str:
-        """Format citation in IEEE style"""
-        authors = data.get('authors', [])
-        year = data.get('date', {}).get('year', 'n.d.')
-        title = data.get('title', '')
-        journal = data.get('journal', '')
-        volume = data.get('volume', '')
-        issue = data.get('issue', '')
-        pages = data.get('pages', '')
-        
-        # Format authors
-        if not authors:
-            author_str = 'Unknown Author'
-        else:
-            author_initials = [f"{a['given'][0]}. {a['family']}" for a in authors[:6]]
-            if len(authors) > 6:
-                author_str = ', '.join(author_initials) + ', et al.'
-            else:
-                author_str = ', '.join(author_initials)
-        
-        # Build citation
-        citation = f'{author_str}, "{title},"'
-        
-        if journal:
-            citation += f" {journal}"
-            if volume:
-                citation += f", vol. {volume}"
-                if issue:
-                    citation += f", no. {issue}"
-            if pages:
-                citation += f", pp. {pages}"
-            if year:
-                citation += f", {year}"
-            citation += "."
-        
-        return citation
+    def batch_validate(self, dois: List[str], include_extras: bool = False) -> List[Dict[str, Any]]:
+        """Validate multiple DOIs (lookups overlap on a single thread)"""
+        return run_sync(self.batch_validate_async(dois, include_extras))
     
-    def batch_validate(self, dois: List[str]) -> List[Dict[str, Any]]:
-        """Validate multiple DOIs"""
-        results = []
-        for doi in dois:
-            result = self.get_publication_info(doi)
-            results.append(result)
-        return results
+    async def batch_validate_async(self, dois: List[str], include_extras: bool = False) -> List[Dict[str, Any]]:
+        """Validate multiple DOIs concurrently, preserving input order (without abstracts and licenses unless asked)"""
+        return await gather_limited(self.get_publication_info_async(doi, include_extras) for doi in dois)
     
     def extract_dois_from_text(self, text: str) -> List[str]:
         """Extract DOIs from text"""
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+from config.settings import EXTRACTION_CACHE_MAX_BYTES, EXTRACTION_CACHE_DISK_BYTES
+
+HASH_CHUNK_SIZE = 1024 * 1024  # bytes read at a time when hashing a file
+
+
+def hash_file(file) -> str:
+    """Content hash of an uploaded file, without copying the whole file
+
+    In-memory uploads (BytesIO) are hashed straight from their buffer; other
+    file objects are read in chunks. The file position is reset afterwards.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    getbuffer = getattr(file, 'getbuffer', None)
+    if getbuffer is not None:
+        with getbuffer() as buffer:
+            digest.update(buffer)
+    else:
+        file.seek(0)
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+        file.seek(0)
+    return digest.hexdigest()
+
+
+def _entry_size(entry: Dict[str, Any]) -> int:
+    """Approximate memory held by a cached extraction"""
+    offset_map = entry.get('offset_map') or {}
+    return len(entry['text']) + 8 * (len(entry.get('page_offsets', [])) + sum(len(values) for values in offset_map.values()))
+
+
+class ExtractionCache:
+    """Extracted text keyed by file content hash
+
+    An in-memory LRU bounded by `max_bytes`, optionally backed by a directory
+    of JSON files bounded by `disk_bytes` (least recently used files are
+    removed first).
+    """
+
+    def __init__(self, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES, directory: Optional[str] = None,
+                 disk_bytes: int = EXTRACTION_CACHE_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached extraction for a key, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+
+        if self.directory:
+            path = self._path(key)
+            try:
+                with open(path, encoding='utf-8') as f:
+                    entry = json.load(f)
+                os.utime(path)  # mark as recently used for disk eviction
+            except (OSError, ValueError):
+                return None
+            self._remember(key, entry)
+            return entry
+        return None
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        """Store an extraction in memory and, if configured, on disk"""
+        self._remember(key, entry)
+        if self.directory:
+            self._write(key, entry)
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        size = _entry_size(entry)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= _entry_size(previous)
+            self.entries[key] = entry
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= _entry_size(evicted)
+
+    def _write(self, key: str, entry: Dict[str, Any]):
+        path = self._path(key)
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Could not write extraction cache: {str(e)}")
+            return
+        self._enforce_disk_cap()
+
+    def _enforce_disk_cap(self):
+        """Delete least recently used files until the directory fits its cap"""
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        """Drop all in-memory entries"""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Process-wide cache, so Streamlit reruns of the same upload skip extraction"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ExtractionCache(directory=os.environ.get("EXTRACTION_CACHE_DIR"))
+    return _shared_cache
@@ -1,130 +1,195 @@
 import io
-from typing import Optional
+from bisect import bisect_right
+from typing import Optional, Dict, Any, List, Tuple
 import PyPDF2
-import docx
-import markdown
 import chardet
+import codecs
+from src.extraction_cache import ExtractionCache, get_extraction_cache, hash_file
+from src.markdown_text import markdown_to_text
+from src.offset_map import OffsetMap
+from src.normalization import Normalizer
+from src.docx_text import docx_to_text
+from src.bibliography import BibliographyIndex
+from config.settings import ENCODING_SAMPLE_BYTES
+
+# Try to import the C implementation of chardet for faster detection
+try:
+    import cchardet
+    HAS_CCHARDET = True
+except ImportError:
+    HAS_CCHARDET = False
+
+BIBLIOGRAPHY_EXTENSIONS = ('bib', 'ris', 'json')  # BibTeX, RIS and CSL-JSON
+
+EXTRACTOR_VERSION = 6  # bump when extraction output changes, to invalidate on-disk cache entries
+
+# Byte order marks, longest first (the UTF-32 LE mark starts with the UTF-16 LE one)
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+def detect_encoding(sample: bytes) -> Optional[str]:
+    """Guess the encoding of a byte sample with the fastest detector available"""
+    detector = cchardet if HAS_CCHARDET else chardet
+    return detector.detect(sample)['encoding']
+
+def decode_bytes(raw_data: bytes, sample_size: int = ENCODING_SAMPLE_BYTES) -> str:
+    """Decode text, cheapest check first
+    
+    A byte order mark decides the encoding outright; otherwise strict UTF-8
+    (which also covers ASCII) is tried, and only if that fails is a detector
+    run, on a bounded sample around the first byte that isn't valid UTF-8
+    rather than the whole buffer.
+    """
+    for bom, encoding in BOMS:
+        if raw_data.startswith(bom):
+            return raw_data.decode(encoding, errors='replace')
+    
+    try:
+        return raw_data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        sample_start = max(0, e.start - sample_size // 2)
+    
+    encoding = detect_encoding(raw_data[sample_start:sample_start + sample_size]) or 'utf-8'
+    try:
+        return raw_data.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        # Fallback to utf-8 with error handling
+        return raw_data.decode('utf-8', errors='replace')
 
 class FileHandler:
     """Handle different file types for citation extraction"""
     
+    def __init__(self, cache: Optional[ExtractionCache] = None):
+        self.cache = cache if cache is not None else get_extraction_cache()
+    
     def extract_text(self, uploaded_file) -> Optional[str]:
         """Extract text from uploaded file"""
+        extracted = self.extract(uploaded_file)
+        return extracted['text'] if extracted else None
+    
+    def extract(self, uploaded_file) -> Optional[Dict[str, Any]]:
+        """Extract text and page start offsets, reusing the result for identical file content
+        
+        Returns None for unsupported or unreadable files. Failed and empty
+        extractions aren't cached, so the file is read again next time.
+        """
         try:
             file_extension = uploaded_file.name.split('.')[-1].lower()
+            if file_extension not in ('txt', 'pdf', 'docx', 'md'):
+                return None
+            
+            key = f"{hash_file(uploaded_file)}-{file_extension}-v{EXTRACTOR_VERSION}"
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
             
-            if file_extension == 'txt':
-                return self._extract_from_txt(uploaded_file)
-            elif file_extension == 'pdf':
-                return self._extract_from_pdf(uploaded_file)
-            elif file_extension == 'docx':
-                return self._extract_from_docx(uploaded_file)
-            elif file_extension == 'md':
-                return self._extract_from_markdown(uploaded_file)
+            offset_map = None
+            if file_extension == 'pdf':
+                text, page_offsets, offset_map = self._extract_pdf_pages(uploaded_file)
             else:
-                return None
+                if file_extension == 'txt':
+                    text = self._extract_from_txt(uploaded_file)
+                elif file_extension == 'docx':
+                    text = self._extract_from_docx(uploaded_file)
+                else:
+                    text, offset_map = self._extract_markdown(uploaded_file)
+                page_offsets = [0]
+            
+            extracted = {'text': text, 'page_offsets': page_offsets}
+            if offset_map is not None:
+                extracted['offset_map'] = offset_map.to_dict()
+            if text.strip():
+                self.cache.put(key, extracted)
+            return extracted
                 
         except Exception as e:
             print(f"Error extracting text: {str(e)}")
             return None
     
+    def load_bibliography(self, uploaded_file) -> Optional[BibliographyIndex]:
+        """Index an uploaded BibTeX, RIS or CSL-JSON bibliography, for resolving the document's citations locally"""
+        try:
+            file_extension = uploaded_file.name.split('.')[-1].lower()
+            if file_extension not in BIBLIOGRAPHY_EXTENSIONS:
+                return None
+            
+            text = decode_bytes(uploaded_file.read())
+            uploaded_file.seek(0)
+            return BibliographyIndex.from_text(uploaded_file.name, text)
+            
+        except Exception as e:
+            print(f"Error reading bibliography: {str(e)}")
+            return None
+    
+    @staticmethod
+    def page_for_position(position: int, page_offsets: List[int]) -> int:
+        """1-based page number containing a text position"""
+        return max(bisect_right(page_offsets, position), 1)
+    
+    @staticmethod
+    def offset_map(extracted: Dict[str, Any]) -> Optional[OffsetMap]:
+        """Map from extracted text positions to source positions and lines, for formats that keep one"""
+        data = extracted.get('offset_map')
+        return OffsetMap.from_dict(data) if data else None
+    
     def _extract_from_txt(self, file) -> str:
         """Extract text from TXT file"""
-        # Try to detect encoding
         raw_data = file.read()
         file.seek(0)  # Reset file pointer
         
-        result = chardet.detect(raw_data)
-        encoding = result['encoding'] or 'utf-8'
-        
-        try:
-            return raw_data.decode(encoding)
-        except:
-            # Fallback to utf-8 with error handling
-            return raw_data.decode('utf-8', errors='replace')
+        return decode_bytes(raw_data)
     
     def _extract_from_pdf(self, file) -> str:
         """Extract text from PDF file"""
-        text = ""
-        try:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                page_text = page.extract_text()
-                
-                # Clean up text
-                page_text = page_text.replace('\n\n', '\n')
-                page_text = ' '.join(page_text.split())
-                
-                text += page_text + "\n\n"
-                
-        except Exception as e:
-            print(f"Error reading PDF: {str(e)}")
+        return self._extract_pdf_pages(file)[0]
+    
+    def _extract_pdf_pages(self, file) -> Tuple[str, List[int], OffsetMap]:
+        """Extract text from PDF file along with the offset where each page starts
+        
+        Whitespace is collapsed page by page; the offset map leads from the
+        cleaned text back to the page and line each position came from.
+        Unreadable files raise.
+        """
+        normalizer = Normalizer(compatibility=False)
+        page_offsets = []
+        source = 0  # position in the raw page texts, one after another
+        pdf_reader = PyPDF2.PdfReader(file)
+        
+        for page_num in range(len(pdf_reader.pages)):
+            page = pdf_reader.pages[page_num]
+            page_text = page.extract_text()
             
-        return text.strip()
+            # Clean up text; pages are separated by a blank line
+            page_offsets.append(normalizer.add_page(page_text, source))
+            source += len(page_text)
+        
+        text, offset_map = normalizer.result()
+        return text, page_offsets, offset_map
     
     def _extract_from_docx(self, file) -> str:
-        """Extract text from DOCX file"""
-        try:
-            doc = docx.Document(file)
-            
-            full_text = []
-            
-            # Extract text from paragraphs
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    full_text.append(paragraph.text)
-            
-            # Extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            full_text.append(cell.text)
-            
-            # Also check headers and footers
-            for section in doc.sections:
-                # Header
-                header = section.header
-                for paragraph in header.paragraphs:
-                    if paragraph.text.strip():
-                        full_text.append(paragraph.text)
-                
-                # Footer
-                footer = section.footer
-                for paragraph in footer.paragraphs:
-                    if paragraph.text.strip():
-                        full_text.append(paragraph.text)
-            
-            return '\n\n'.join(full_text)
-            
-        except Exception as e:
-            print(f"Error reading DOCX: {str(e)}")
-            return ""
+        """Extract text from DOCX file
+        
+        Reads the XML parts directly: body and tables in document order,
+        footnotes and endnotes (where Chicago citations live), then headers
+        and footers without repeats. Unreadable files raise.
+        """
+        return docx_to_text(file)
     
     def _extract_from_markdown(self, file) -> str:
         """Extract text from Markdown file"""
-        try:
-            # Read the markdown content
-            content = file.read().decode('utf-8')
-            
-            # Convert to HTML then extract text
-            html = markdown.markdown(content)
-            
-            # Simple HTML tag removal
-            import re
-            text = re.sub('<[^<]+?>', '', html)
-            
-            # Decode HTML entities
-            import html as html_module
-            text = html_module.unescape(text)
-            
-            return text.strip()
-            
-        except Exception as e:
-            print(f"Error reading Markdown: {str(e)}")
-            return ""
+        return self._extract_markdown(file)[0]
+    
+    def _extract_markdown(self, file) -> Tuple[str, OffsetMap]:
+        """Extract text from Markdown file, with a map back to positions and lines in the source"""
+        # Markdown is reduced to text in one pass, without rendering HTML
+        content = decode_bytes(file.read())
+        file.seek(0)
+        return markdown_to_text(content)
     
     def get_file_info(self, uploaded_file) -> dict:
         """Get information about the uploaded file"""
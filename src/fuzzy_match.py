@@ -0,0 +1,154 @@
+import re
+import unicodedata
+from typing import List, Dict, Any, Optional, Tuple, NamedTuple, Iterable
+from config.settings import MATCH_WEIGHTS
+
+# Use rapidfuzz's C++ token-set ratio when it's installed
+try:
+    from rapidfuzz import fuzz, process
+    HAS_RAPIDFUZZ = True
+except ImportError:
+    HAS_RAPIDFUZZ = False
+
+NON_WORD = re.compile(r'[\W_]+')
+YEAR = re.compile(r'\b(1[5-9]\d{2}|20\d{2})\b')
+
+
+def normalize_title(title: str) -> str:
+    """Lowercase title without accents or punctuation"""
+    decomposed = unicodedata.normalize('NFKD', title)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(NON_WORD.sub(' ', stripped.casefold()).split())
+
+
+def _lcs_length(a: str, b: str) -> int:
+    """Length of the longest common subsequence, bit-parallel over `a` (one big-int step per character of `b`)"""
+    masks = {}
+    for position, char in enumerate(a):
+        masks[char] = masks.get(char, 0) | (1 << position)
+    all_ones = (1 << len(a)) - 1
+    row = all_ones
+    for char in b:
+        matches = row & masks.get(char, 0)
+        row = ((row + matches) | (row - matches)) & all_ones
+    return len(a) - bin(row).count('1')
+
+
+def _token_set_ratio(a: Tuple[str, ...], b: Tuple[str, ...]) -> float:
+    """Token-set similarity of two sorted token tuples (0-1), as rapidfuzz's token_set_ratio
+
+    Shared tokens count in full, so a title missing its subtitle, or with
+    words reordered, still scores 1; the tokens only one side has are
+    compared character by character.
+    """
+    if not a or not b:
+        return 0.0
+    shared = set(a) & set(b)
+    only_a = ' '.join(token for token in a if token not in shared)
+    only_b = ' '.join(token for token in b if token not in shared)
+    if shared and (not only_a or not only_b):
+        return 1.0
+
+    # Lengths of "shared + own tokens" on each side; only the own tokens can differ
+    shared_length = len(' '.join(shared))
+    separator = 1 if shared else 0
+    with_a = shared_length + separator + len(only_a)
+    with_b = shared_length + separator + len(only_b)
+    distance = len(only_a) + len(only_b) - 2 * _lcs_length(only_a, only_b)
+    best = 1 - distance / (with_a + with_b)
+    if shared:
+        # Either side against the shared tokens alone
+        for own in (len(only_a), len(only_b)):
+            best = max(best, 1 - (separator + own) / (2 * shared_length + separator + own))
+    return best
+
+
+class Prepared(NamedTuple):
+    """A citation or candidate source reduced to what matching compares"""
+    title: str  # normalized, tokens sorted
+    tokens: Tuple[str, ...]
+    surnames: frozenset  # candidate author surnames, or every word of a citation
+    year: Optional[int]
+
+
+class FuzzyMatcher:
+    """Scores how well candidate sources match a citation, on title, authors and year
+
+    Citations and candidates are normalized once into token sets, so scoring
+    a pair is set arithmetic plus, for the tokens only one side has, a
+    bit-parallel character comparison (or rapidfuzz's token-set ratio when
+    it's installed). Missing fields don't count against a candidate: the
+    score is the weighted mean of the fields both sides have.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        self.weights = weights or MATCH_WEIGHTS
+
+    def prepare_citation(self, text: str, title: Optional[str] = None, year: Optional[int] = None) -> Prepared:
+        """A citation's fields; without a separate title, the citation text stands in for it"""
+        tokens = tuple(sorted(set(normalize_title(title or text).split())))
+        if year is None:
+            year_match = YEAR.search(text)
+            year = int(year_match.group()) if year_match else None
+        # Any word of the citation may be an author surname
+        return Prepared(' '.join(tokens), tokens, frozenset(normalize_title(text).split()), year)
+
+    def prepare_source(self, source: Dict[str, Any]) -> Prepared:
+        """A search result's fields (title, authors as names or CrossRef dicts, year)"""
+        tokens = tuple(sorted(set(normalize_title(source.get('title') or '').split())))
+        surnames = set()
+        for author in (source.get('authors') or [])[:3]:
+            name = (author.get('family') or author.get('full_name') or '') if isinstance(author, dict) else (author or '')
+            words = normalize_title(name).split()
+            if words:
+                surnames.add(words[-1])
+        year = source.get('year')
+        if isinstance(year, str):
+            year = int(year) if year.isdigit() else None
+        return Prepared(' '.join(tokens), tokens, frozenset(surnames), year)
+
+    def title_similarity(self, a: str, b: str) -> float:
+        """Token-set similarity of two titles (0-1)"""
+        first = tuple(sorted(set(normalize_title(a).split())))
+        second = tuple(sorted(set(normalize_title(b).split())))
+        return self._title_scores([(first, second)])[0]
+
+    def _title_scores(self, pairs: List[Tuple[Tuple[str, ...], Tuple[str, ...]]]) -> List[float]:
+        if HAS_RAPIDFUZZ and hasattr(process, 'cpdist'):
+            scores = process.cpdist([' '.join(a) for a, _ in pairs], [' '.join(b) for _, b in pairs],
+                                    scorer=fuzz.token_set_ratio)
+            return [float(score) / 100 for score in scores]
+        if HAS_RAPIDFUZZ:
+            return [fuzz.token_set_ratio(' '.join(a), ' '.join(b)) / 100 for a, b in pairs]
+        # The same pair often recurs in a batch (one citation against re-ranked pages of results)
+        cache = {}
+        scores = []
+        for pair in pairs:
+            if pair not in cache:
+                cache[pair] = _token_set_ratio(*pair)
+            scores.append(cache[pair])
+        return scores
+
+    def score_pairs(self, pairs: Iterable[Tuple[Prepared, Prepared]]) -> List[float]:
+        """Match scores (0-1) of many (citation, candidate) pairs at once"""
+        pairs = list(pairs)
+        titles = self._title_scores([(citation.tokens, source.tokens) for citation, source in pairs])
+        scores = []
+        for (citation, source), title in zip(pairs, titles):
+            fields = {}
+            if citation.tokens and source.tokens:
+                fields['title'] = title
+            if source.surnames:
+                fields['authors'] = len(source.surnames & citation.surnames) / len(source.surnames)
+            if citation.year and source.year:
+                difference = abs(citation.year - source.year)
+                # Online-first and print dates are often a year apart
+                fields['year'] = 1.0 if difference == 0 else 0.5 if difference == 1 else 0.0
+            weight = sum(self.weights[field] for field in fields)
+            scores.append(sum(self.weights[field] * value for field, value in fields.items()) / weight if weight else 0.0)
+        return scores
+
+    def rank(self, citation: Prepared, sources: List[Dict[str, Any]]) -> List[Tuple[float, Dict[str, Any]]]:
+        """Candidates with their scores, best first (ties keep the search engine's order)"""
+        scores = self.score_pairs((citation, self.prepare_source(source)) for source in sources)
+        return sorted(zip(scores, sources), key=lambda pair: pair[0], reverse=True)
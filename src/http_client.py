@@ -0,0 +1,183 @@
+import asyncio
+import json
+import threading
+import weakref
+from typing import Optional, Dict, Any, List, Awaitable, Iterable
+import requests
+from config.settings import API_TIMEOUT, HTTP_MAX_CONNECTIONS, HTTP_CONCURRENCY
+from src.rate_limiter import HostRateLimiter, get_rate_limiter
+
+# httpx gives us a native asyncio client with HTTP/2 keep-alive; fall back to
+# running requests in worker threads when it is not installed
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
+try:
+    import h2  # noqa: F401 - only needed so httpx can negotiate HTTP/2
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+
+class AsyncResponse:
+    """Minimal response object exposing the parts of requests.Response we use"""
+    def __init__(self, status_code: int, reason: str, headers: Dict[str, str], content: bytes):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class RateLimitedSession(requests.Session):
+    """requests.Session that waits for the shared per-host rate limiter"""
+
+    def __init__(self, rate_limiter: Optional[HostRateLimiter] = None):
+        super().__init__()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+
+    def request(self, method, url, *args, **kwargs):
+        self.rate_limiter.wait(url)
+        response = super().request(method, url, *args, **kwargs)
+        self.rate_limiter.record_response(url, response.status_code, response.headers)
+        return response
+
+
+class AsyncHTTPClient:
+    """Shared asyncio HTTP client with one connection pool per event loop"""
+
+    def __init__(self, timeout: float = API_TIMEOUT, max_connections: int = HTTP_MAX_CONNECTIONS,
+                 rate_limiter: Optional[HostRateLimiter] = None):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._fallback_session = None if HAS_HTTPX else requests.Session()  # limiter is applied in get()
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        """Get (or lazily create) the pooled client bound to the running loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(
+                    http2=HAS_HTTP2,
+                    timeout=self.timeout,
+                    follow_redirects=True,
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections
+                    )
+                )
+                self._clients[loop] = client
+        return client
+
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None,
+                  headers: Optional[Dict[str, str]] = None,
+                  timeout: Optional[float] = None) -> AsyncResponse:
+        """Perform a GET request; timeouts raise requests.exceptions.Timeout"""
+        # Drop None values the same way requests does
+        if params:
+            params = {k: v for k, v in params.items() if v is not None}
+
+        await self.rate_limiter.wait_async(url)
+
+        if not HAS_HTTPX:
+            response = await asyncio.to_thread(
+                self._fallback_session.get,
+                url,
+                params=params,
+                headers=headers,
+                timeout=timeout or self.timeout
+            )
+            self.rate_limiter.record_response(url, response.status_code, response.headers)
+            return AsyncResponse(response.status_code, response.reason, dict(response.headers), response.content)
+
+        try:
+            response = await self._get_client().get(
+                url,
+                params=params,
+                headers=headers,
+                timeout=timeout or self.timeout
+            )
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+        self.rate_limiter.record_response(url, response.status_code, response.headers)
+        return AsyncResponse(response.status_code, response.reason_phrase, dict(response.headers), response.content)
+
+    async def aclose(self):
+        """Close the connection pool bound to the running loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_async_client() -> AsyncHTTPClient:
+    """Get the process-wide async HTTP client"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = AsyncHTTPClient()
+    return _shared_client
+
+
+async def gather_limited(coroutines: Iterable[Awaitable], limit: int = HTTP_CONCURRENCY) -> List[Any]:
+    """Run coroutines concurrently with at most `limit` in flight, preserving order"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(c) for c in coroutines))
+
+
+_sync_loop = None
+_sync_loop_lock = threading.Lock()
+
+
+def _get_sync_loop() -> asyncio.AbstractEventLoop:
+    """Get the background event loop that run_sync() schedules coroutines on"""
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name='http-client-loop', daemon=True).start()
+    return _sync_loop
+
+
+def run_sync(coro: Awaitable) -> Any:
+    """Run a coroutine to completion from synchronous code
+
+    Every call runs on the same long-lived background loop, so the pooled
+    connections get_async_client() opens for that loop stay alive between
+    calls. This also works when the caller is itself inside an event loop
+    (e.g. a notebook), which is blocked until the coroutine finishes.
+    """
+    loop = _get_sync_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_sync() cannot wait for a coroutine on its own loop; await it instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
@@ -0,0 +1,231 @@
+import codecs
+import mmap
+import re
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+from src.file_handlers import BOMS, detect_encoding
+from config.settings import ENCODING_SAMPLE_BYTES, MAPPED_WINDOW_BYTES
+
+WINDOW_OVERLAP = 4096  # bytes past a window's end that matches starting inside it may reach into
+REFERENCE_RANGE_BYTES = rb'[Rr]eferences\s*\[(\d+)\]\s*through\s*\[(\d+)\]'
+BRACKET_NUMBER_BYTES = rb'\[(\d+)\]'
+
+# UTF-8 continuation bytes; every other byte starts a character
+CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+# Maps ASCII whitespace to b' ' and everything else to b'x', so words are counted as b' x' pairs
+WORD_BOUNDARIES = bytes(0x20 if byte in b' \t\n\r\x0b\x0c' else 0x78 for byte in range(256))
+
+
+def _bytes_pattern(pattern: str, encoding: str) -> bytes:
+    """Byte-level version of a text pattern
+
+    A bytes character class matches single bytes, so classes holding
+    characters that encode to several bytes become alternations.
+    """
+    def expand(match):
+        members = match.group(1)
+        wide = [char for char in members if len(char.encode(encoding, errors='ignore')) > 1]
+        if not wide:
+            return match.group(0)
+        narrow = ''.join(char for char in members if char not in wide)
+        return '(?:' + '|'.join(([f'[{narrow}]'] if narrow else []) + wide) + ')'
+
+    return re.sub(r'(?<!\\)\[((?:\\.|[^\]\\])*)\]', expand, pattern).encode(encoding, errors='ignore')
+
+
+class MappedText:
+    """A large text file scanned for citations in place
+
+    The file is memory-mapped and the citation patterns run over the mapped
+    bytes a window at a time, so only citation spans (and any context asked
+    for) are decoded; the text itself is never held in memory as a whole.
+    Positions are reported as character offsets into the decoded text, like
+    the ones `CitationAnalyzer._extract_citations` produces.
+
+    Scanning works for UTF-8 and single-byte encodings; for anything else
+    (UTF-16/32, multi-byte CJK encodings) `mappable` is False and the file
+    has to be decoded normally.
+    """
+
+    def __init__(self, path: str, window_bytes: int = MAPPED_WINDOW_BYTES):
+        self.path = path
+        self.window_bytes = window_bytes
+        self.file = open(path, 'rb')
+        self.size = self.file.seek(0, 2)
+        # mmap can't map an empty file
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.start = 0  # first byte of text, after any byte order mark
+        self.encoding = self._detect_encoding()
+        self.mappable = self.encoding is not None
+        self.char_count = 0
+        self.word_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.file.close()
+
+    def _detect_encoding(self) -> Optional[str]:
+        """Encoding of the file from a sample at its start, or None if it can't be scanned as bytes"""
+        sample = self.buffer[:ENCODING_SAMPLE_BYTES]
+        for bom, encoding in BOMS:
+            if sample.startswith(bom):
+                if encoding != 'utf-8-sig':
+                    return None
+                self.start = len(bom)
+                return 'utf-8'
+
+        try:
+            sample.decode('utf-8')
+            return 'utf-8'
+        except UnicodeDecodeError as e:
+            # A character cut off by the end of the sample doesn't count against UTF-8
+            if e.start >= len(sample) - 3 and len(sample) == ENCODING_SAMPLE_BYTES:
+                return 'utf-8'
+
+        encoding = detect_encoding(sample) or 'utf-8'
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            return None
+        # Single-byte encodings decode every byte on its own; multi-byte ones join some into fewer characters
+        if len(bytes(range(256)).decode(encoding, errors='replace')) != 256:
+            return None
+        return encoding
+
+    def _count_chars(self, start: int, end: int) -> int:
+        """Characters encoded by a byte range"""
+        if self.encoding != 'utf-8':
+            return end - start
+        return len(self.buffer[start:end].translate(None, CONTINUATION_BYTES))
+
+    def _window_end(self, start: int) -> int:
+        """End of the window starting at `start`, moved to the next line break where there is one nearby"""
+        end = start + self.window_bytes
+        if end >= self.size:
+            return self.size
+        newline = self.buffer.find(b'\n', end, end + self.window_bytes)
+        return newline + 1 if newline != -1 else end
+
+    def _scan_limit(self, end: int) -> int:
+        """Position matches in a window may run to: the overlap, extended to the end of its line
+
+        Reference-list patterns match to the end of a line, so the limit is
+        a line end however far away that is.
+        """
+        limit = min(end + WINDOW_OVERLAP, self.size)
+        newline = self.buffer.find(b'\n', limit)
+        return newline if newline != -1 else self.size
+
+    def windows(self) -> Iterator[Tuple[int, int]]:
+        """Byte ranges covering the text, each ending on a line break where possible
+
+        Pages of finished windows are handed back to the OS, so resident
+        memory stays around one window however large the file.
+        """
+        start = self.start
+        released = 0
+        while start < self.size:
+            end = self._window_end(start)
+            yield start, end
+            start = end
+            # Keep the page holding the byte before the next window; patterns look back one byte
+            upto = (start - 1) // mmap.PAGESIZE * mmap.PAGESIZE
+            if upto > released and hasattr(mmap, 'MADV_DONTNEED'):
+                self.buffer.madvise(mmap.MADV_DONTNEED, released, upto - released)
+                released = upto
+
+    def decode(self, start: int, end: int) -> str:
+        """Text of a byte range"""
+        return self.buffer[start:end].decode(self.encoding, errors='replace')
+
+    def context(self, start: int, end: int, radius: int = 100) -> str:
+        """Text around a byte range, about `radius` bytes either side"""
+        return self.decode(max(start - radius, self.start), min(end + radius, self.size)).strip()
+
+    def head(self, chars: int) -> str:
+        """First characters of the text"""
+        return self.decode(self.start, min(self.start + 4 * chars, self.size))[:chars]
+
+    def _referenced_numbers(self) -> set:
+        """Numbers covered by "References [X] through [Y]" anywhere in the text"""
+        pattern = re.compile(REFERENCE_RANGE_BYTES)
+        numbers = set()
+        for start, end in self.windows():
+            for match in pattern.finditer(self.buffer, start, self._scan_limit(end)):
+                if match.start() >= end:
+                    break
+                numbers.update(range(int(match.group(1)), int(match.group(2)) + 1))
+        return numbers
+
+    def scan(self, patterns: Dict[str, str]) -> Iterator[Tuple[int, int, str, str]]:
+        """Citations in the text as (character position, byte position, text, style)
+
+        Mirrors `CitationAnalyzer._extract_citations`: numbers in a
+        "References [X] through [Y]" range are IEEE citations, earlier
+        patterns win at the same position and overlapping matches are
+        dropped. Counts characters and words along the way.
+        """
+        if not self.mappable:
+            raise ValueError(f"{self.path} is not in an encoding that can be scanned in place")
+
+        compiled = []
+        for style, pattern in patterns.items():
+            if 'numeric_range' in style:
+                continue
+            pattern = _bytes_pattern(pattern, self.encoding)
+            if self.start and pattern.startswith(b'^'):
+                # The text starts after the byte order mark, which isn't a line start as far as ^ goes
+                pattern = b'(?:^|(?<=\\A' + re.escape(self.buffer[:self.start]) + b'))' + pattern[1:]
+            compiled.append((style.split('_')[0], re.compile(pattern, re.MULTILINE)))
+        numbers = self._referenced_numbers()
+        bracket_number = re.compile(BRACKET_NUMBER_BYTES)
+
+        self.char_count = 0
+        self.word_count = 0
+        last_end = -1
+        for start, end in self.windows():
+            limit = self._scan_limit(end)
+            found = {}  # byte position -> (match end, style); the first pattern to match a position keeps it
+            if numbers:
+                for match in bracket_number.finditer(self.buffer, start, limit):
+                    if match.start() >= end:
+                        break
+                    if int(match.group(1)) in numbers:
+                        found.setdefault(match.start(), (match.end(), 'ieee'))
+            for style, pattern in compiled:
+                for match in pattern.finditer(self.buffer, start, limit):
+                    if match.start() >= end:
+                        break
+                    found.setdefault(match.start(), (match.end(), style))
+
+            cursor, chars = start, self.char_count
+            for position in sorted(found):
+                if position < last_end:
+                    continue
+                match_end, style = found[position]
+                raw = self.buffer[position:match_end].rstrip()
+                last_end = position + len(raw)
+                chars += self._count_chars(cursor, position)
+                cursor = position
+                yield chars, position, raw.decode(self.encoding, errors='replace').strip(), style
+
+            self.char_count = chars + self._count_chars(cursor, end)
+            # A word at the window's start only counts here if the previous window didn't end inside it
+            window = self.buffer[max(start - 1, self.start):end].translate(WORD_BOUNDARIES)
+            self.word_count += window.count(b' x') + (start == self.start and window.startswith(b'x'))
+
+    def extract_citations(self, patterns: Dict[str, str]) -> Tuple[List[Tuple[int, str, str]], array]:
+        """All citations as (character position, text, style), plus the byte position of each"""
+        citations = []
+        byte_positions = array('q')
+        for position, byte_position, text, style in self.scan(patterns):
+            citations.append((position, text, style))
+            byte_positions.append(byte_position)
+        return citations, byte_positions
@@ -0,0 +1,138 @@
+import html
+import re
+from typing import Callable, Tuple
+from src.offset_map import OffsetMap
+
+FENCE = re.compile(r' {0,3}(`{3,}|~{3,})')
+BLANK = re.compile(r'[ \t]*$')
+INDENTED = re.compile(r'(?: {4}|\t)')
+RULE = re.compile(r' {0,3}(?:(?:-[ \t]*){3,}|(?:\*[ \t]*){3,}|(?:_[ \t]*){3,}|=+[ \t]*)$')
+LINK_DEFINITION = re.compile(r' {0,3}\[[^\]]+\]:[ \t]')
+BLOCKQUOTE = re.compile(r' {0,3}>[ \t]?')
+HEADING = re.compile(r' {0,3}#{1,6}(?:[ \t]+|$)')
+HEADING_CLOSE = re.compile(r'[ \t]+#+[ \t]*$')
+LIST_ITEM = re.compile(r'[ \t]*(?:[-*+]|\d{1,9}[.)])[ \t]+')
+
+# One alternation per kind of inline markup; text between matches is copied as is
+INLINE = re.compile(r'''
+    (?P<escape>\\[!-/:-@\[-`{-~])
+  | (?P<code>(`+)[ ]?(?P<code_text>.+?)[ ]?(?<!`)\3(?!`))
+  | (?P<image>!\[(?P<alt>[^\]]*)\]\([^)]*\))
+  | (?P<link>\[(?P<label>[^\]]+)\](?:\([^)]*\)|\[[^\]]*\]))
+  | (?P<autolink><(?P<url>(?:https?|ftp)://[^>\s]+|[^>\s@]+@[^>\s]+)>)
+  | (?P<tag><!--.*?-->|</?[A-Za-z][^>]*>)
+  | (?P<entity>&(?:\#\d+|\#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);)
+  | (?P<emphasis>\*+|(?<!\w)_+|_+(?!\w)|~~)
+''', re.VERBOSE)
+
+
+def _inline(text: str, source: int, emit: Callable[[str, int], None]):
+    """Plain text of one line's inline markup; `source` is where `text` starts in the file"""
+    cursor = 0
+    for match in INLINE.finditer(text):
+        emit(text[cursor:match.start()], source + cursor)
+        kind = match.lastgroup
+        if kind == 'escape':
+            emit(match.group()[1], source + match.start() + 1)
+        elif kind == 'code':
+            emit(match.group('code_text'), source + match.start('code_text'))
+        elif kind == 'image':
+            emit(match.group('alt'), source + match.start('alt'))
+        elif kind == 'link':
+            _inline(match.group('label'), source + match.start('label'), emit)
+        elif kind == 'autolink':
+            emit(match.group('url'), source + match.start('url'))
+        elif kind == 'entity':
+            emit(html.unescape(match.group()), source + match.start())
+        elif kind == 'emphasis':
+            before = text[match.start() - 1:match.start()]
+            after = text[match.end():match.end() + 1]
+            # A lone * between spaces ("2 * 3") is text, not emphasis
+            if before.isspace() and after.isspace():
+                emit(match.group(), source + match.start())
+        cursor = match.end()
+    emit(text[cursor:], source + cursor)
+
+
+def markdown_to_text(source: str) -> Tuple[str, OffsetMap]:
+    """Plain text of a markdown document and a map from text positions back to the source
+
+    One pass over the lines: code blocks, rules and link definitions are
+    dropped, block markers (headings, quotes, list bullets) are stripped and
+    inline markup is reduced to its text. Line breaks are kept, so the text
+    has the same line structure as the source minus the dropped lines.
+    """
+    offset_map = OffsetMap()
+    parts = []
+    length = 0
+
+    def emit(piece: str, at: int):
+        nonlocal length
+        if piece:
+            offset_map.add(length, at)
+            parts.append(piece)
+            length += len(piece)
+
+    fence = None
+    in_code = False
+    in_list = False
+    previous_blank = True
+    start = 0
+    for line in source.splitlines(keepends=True):
+        line_start, start = start, start + len(line)
+        if line_start:
+            offset_map.add_line(line_start)
+        content = line.rstrip('\r\n')
+
+        if fence:
+            closing = FENCE.match(content)
+            if closing and closing.group(1)[0] == fence[0] and len(closing.group(1)) >= len(fence):
+                fence = None
+            continue
+        opening = FENCE.match(content)
+        if opening:
+            fence = opening.group(1)
+            continue
+
+        if BLANK.match(content):
+            previous_blank = True
+            if length:
+                emit('\n', line_start)
+            continue
+
+        indented = INDENTED.match(content)
+        if indented and (previous_blank or in_code) and not in_list:
+            in_code = True
+            continue
+        in_code = False
+        if previous_blank and not indented and not LIST_ITEM.match(content):
+            in_list = False
+        previous_blank = False
+
+        if RULE.match(content) or LINK_DEFINITION.match(content):
+            continue
+
+        offset = 0
+        quote = BLOCKQUOTE.match(content)
+        while quote:
+            offset = quote.end()
+            quote = BLOCKQUOTE.match(content, offset)
+        heading = HEADING.match(content, offset)
+        if heading:
+            offset = heading.end()
+            closing = HEADING_CLOSE.search(content, offset)
+            if closing:
+                content = content[:closing.start()]
+        else:
+            item = LIST_ITEM.match(content, offset)
+            if item:
+                offset = item.end()
+                in_list = True
+
+        body = content[offset:].rstrip()
+        stripped = body.lstrip()
+        _inline(stripped, line_start + offset + len(body) - len(stripped), emit)
+        emit('\n', line_start + len(content))
+
+    text = ''.join(parts).rstrip()
+    return text, offset_map
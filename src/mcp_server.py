@@ -1,16 +1,19 @@
-import requests
 from typing import Optional, Dict, Any
 import os
 import json
 from datetime import datetime
+from src.http_client import RateLimitedSession, get_async_client, gather_limited, run_sync
+from src.offline_index import OfflineIndex, get_offline_index
+from src.fuzzy_match import FuzzyMatcher
+from config.settings import TITLE_MATCH_THRESHOLD, TITLE_MISMATCH_THRESHOLD
 
 class MCPServer:
     """Model Context Protocol (MCP) server integration for reliable citation verification"""
     
-    def __init__(self, server_url: Optional[str] = None):
+    def __init__(self, server_url: Optional[str] = None, offline_index: Optional[OfflineIndex] = None):
         # Note: MCP is a new protocol - using established APIs for citation verification
         self.timeout = 10
-        self.session = requests.Session()
+        self.session = RateLimitedSession()
         self.session.headers.update({
             'User-Agent': 'CiteScope/1.0 (Citation Verification Tool)'
         })
@@ -22,6 +25,9 @@ class MCPServer:
             'pubmed': 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils',
             'semantic_scholar': 'https://api.semanticscholar.org/v1'
         }
+        self.async_client = get_async_client()
+        self.offline_index = offline_index if offline_index is not None else get_offline_index()
+        self.matcher = FuzzyMatcher()
         
     def verify_citation(self, citation_text: str) -> Optional[Dict[str, Any]]:
         """Verify a citation against external databases"""
@@ -38,11 +44,25 @@ class MCPServer:
             return verification
             
         except Exception as e:
-            return {
-                "verified": False,
-                "error": str(e),
-                "timestamp": datetime.now().isoformat()
-            }
+            return self._error_result(e)
+    
+    async def verify_citation_async(self, citation_text: str) -> Optional[Dict[str, Any]]:
+        """Async variant of verify_citation"""
+        try:
+            citation_info = self._parse_citation(citation_text)
+            search_results = await self._search_source_async(citation_info)
+            return self._verify_details(citation_info, search_results)
+            
+        except Exception as e:
+            return self._error_result(e)
+    
+    def _error_result(self, error: Exception) -> Dict[str, Any]:
+        """Verification result for an unexpected failure"""
+        return {
+            "verified": False,
+            "error": str(error),
+            "timestamp": datetime.now().isoformat()
+        }
     
     def _parse_citation(self, citation_text: str) -> Dict[str, Any]:
         """Parse citation text to extract key information"""
@@ -88,180 +108,224 @@ class MCPServer:
     
     def _search_source(self, citation_info: Dict[str, Any]) -> Dict[str, Any]:
         """Search for the source in external databases"""
-        search_results = {
+        offline = self._search_offline(citation_info)
+        if offline is not None:
+            return self._build_search_results(*offline)
+        
+        strategy = self._select_search_strategy(citation_info)
+        if not strategy:
+            return self._empty_search_results()
+        
+        kind, url, params, parser = strategy
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            found = parser(response) if response.status_code == 200 else None
+        except Exception as e:
+            print(f"{kind} lookup error: {e}")
+            found = None
+        
+        return self._build_search_results(kind, found)
+    
+    async def _search_source_async(self, citation_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of _search_source"""
+        offline = self._search_offline(citation_info)
+        if offline is not None:
+            return self._build_search_results(*offline)
+        
+        strategy = self._select_search_strategy(citation_info)
+        if not strategy:
+            return self._empty_search_results()
+        
+        kind, url, params, parser = strategy
+        try:
+            response = await self.async_client.get(
+                url,
+                params=params,
+                headers=dict(self.session.headers),
+                timeout=self.timeout
+            )
+            found = parser(response) if response.status_code == 200 else None
+        except Exception as e:
+            print(f"{kind} lookup error: {e}")
+            found = None
+        
+        return self._build_search_results(kind, found)
+    
+    def _search_offline(self, citation_info: Dict[str, Any]) -> Optional[tuple]:
+        """Look the citation up in the offline index by DOI, ISBN or title
+        
+        Returns (kind, found) for _build_search_results, or None on a miss
+        (the caller then goes to the live APIs).
+        """
+        if self.offline_index is None:
+            return None
+        
+        found = None
+        if citation_info.get("doi"):
+            kind = "doi"
+            work = self.offline_index.get_by_doi(citation_info["doi"])
+            if work is not None:
+                found = self._parse_doi_response({"message": work}, citation_info["doi"])
+        elif citation_info.get("isbn"):
+            kind = "isbn"
+            work = self.offline_index.get_by_isbn(citation_info["isbn"])
+            if work is not None:
+                found = self._parse_doi_response({"message": work}, work.get("DOI"))
+                found.update({"type": "book", "isbn": citation_info["isbn"], "publisher": work.get("publisher", "")})
+        elif citation_info.get("title"):
+            kind = "title"
+            works = self.offline_index.search_title(citation_info["title"], year=citation_info.get("year"))
+            found = self._parse_title_response({"message": {"items": works}}) or None
+        else:
+            return None
+        
+        if found is None:
+            return None
+        for source in (found if isinstance(found, list) else [found]):
+            source["source"] = "offline_index"
+        return kind, found
+    
+    def _empty_search_results(self) -> Dict[str, Any]:
+        """Search results when nothing was found"""
+        return {
             "found": False,
             "sources": [],
             "confidence": 0.0
         }
+    
+    def _select_search_strategy(self, citation_info: Dict[str, Any]) -> Optional[tuple]:
+        """Pick the lookup to run based on available identifiers
         
-        # Try different search strategies based on available identifiers
+        Returns (kind, url, params, parser) or None when there is nothing to search by.
+        """
         if citation_info.get("doi"):
-            doi_result = self._search_by_doi(citation_info["doi"])
-            if doi_result:
-                search_results["found"] = True
-                search_results["sources"].append(doi_result)
-                search_results["confidence"] = 0.95
+            doi = citation_info["doi"]
+            return ("doi", f"{self.endpoints['crossref']}/works/{doi}", None,
+                    lambda response: self._parse_doi_response(response.json(), doi))
         
         elif citation_info.get("isbn"):
-            isbn_result = self._search_by_isbn(citation_info["isbn"])
-            if isbn_result:
-                search_results["found"] = True
-                search_results["sources"].append(isbn_result)
-                search_results["confidence"] = 0.90
+            isbn = citation_info["isbn"]
+            params = {
+                "bibkeys": f"ISBN:{isbn}",
+                "format": "json",
+                "jscmd": "data"
+            }
+            return ("isbn", f"{self.endpoints['openlibrary']}/api/books", params,
+                    lambda response: self._parse_isbn_response(response.json(), isbn))
         
         elif citation_info.get("pmid"):
-            pmid_result = self._search_by_pmid(citation_info["pmid"])
-            if pmid_result:
-                search_results["found"] = True
-                search_results["sources"].append(pmid_result)
-                search_results["confidence"] = 0.95
+            pmid = citation_info["pmid"]
+            params = {
+                "db": "pubmed",
+                "id": pmid,
+                "retmode": "json"
+            }
+            return ("pmid", f"{self.endpoints['pubmed']}/esummary.fcgi", params,
+                    lambda response: self._parse_pmid_response(response.json(), pmid))
         
-        else:
-            # Fallback to text search if we have a title
-            if citation_info.get("title"):
-                text_results = self._search_by_title(citation_info)
-                if text_results:
-                    search_results["found"] = True
-                    search_results["sources"] = text_results
-                    search_results["confidence"] = 0.70
+        # Fallback to text search if we have a title
+        elif citation_info.get("title"):
+            params = {
+                "query.title": citation_info["title"],
+                "rows": 3,
+                "filter": f"from-pub-date:{citation_info['year']}" if citation_info.get("year") else None
+            }
+            return ("title", f"{self.endpoints['crossref']}/works", params,
+                    lambda response: self._parse_title_response(response.json()))
+        
+        return None
+    
+    def _build_search_results(self, kind: str, found: Any) -> Dict[str, Any]:
+        """Wrap a lookup result with the confidence for its strategy"""
+        search_results = self._empty_search_results()
+        
+        if found:
+            search_results["found"] = True
+            search_results["sources"] = found if isinstance(found, list) else [found]
+            search_results["confidence"] = {
+                "doi": 0.95,
+                "isbn": 0.90,
+                "pmid": 0.95,
+                "title": 0.70
+            }[kind]
         
         return search_results
     
-    def _search_by_doi(self, doi: str) -> Optional[Dict[str, Any]]:
-        """Search for a source by DOI using CrossRef API"""
-        try:
-            response = self.session.get(
-                f"{self.endpoints['crossref']}/works/{doi}",
-                timeout=self.timeout
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                work = data.get("message", {})
-                
-                return {
-                    "type": "journal_article",
-                    "title": work.get("title", [""])[0],
-                    "authors": self._extract_crossref_authors(work.get("author", [])),
-                    "year": work.get("published-print", {}).get("date-parts", [[None]])[0][0],
-                    "journal": work.get("container-title", [""])[0],
-                    "volume": work.get("volume"),
-                    "issue": work.get("issue"),
-                    "pages": work.get("page"),
-                    "doi": doi,
-                    "source": "crossref",
-                    "url": work.get("URL")
-                }
-        except Exception as e:
-            print(f"CrossRef API error: {e}")
+    def _parse_doi_response(self, data: Dict[str, Any], doi: str) -> Dict[str, Any]:
+        """Parse a CrossRef work response"""
+        work = data.get("message", {})
         
-        return None
+        return {
+            "type": "journal_article",
+            "title": work.get("title", [""])[0],
+            "authors": self._extract_crossref_authors(work.get("author", [])),
+            "year": work.get("published-print", {}).get("date-parts", [[None]])[0][0],
+            "journal": work.get("container-title", [""])[0],
+            "volume": work.get("volume"),
+            "issue": work.get("issue"),
+            "pages": work.get("page"),
+            "doi": doi,
+            "source": "crossref",
+            "url": work.get("URL")
+        }
     
-    def _search_by_isbn(self, isbn: str) -> Optional[Dict[str, Any]]:
-        """Search for a book by ISBN using Open Library API"""
-        try:
-            response = self.session.get(
-                f"{self.endpoints['openlibrary']}/api/books",
-                params={
-                    "bibkeys": f"ISBN:{isbn}",
-                    "format": "json",
-                    "jscmd": "data"
-                },
-                timeout=self.timeout
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if f"ISBN:{isbn}" in data:
-                    book_data = data[f"ISBN:{isbn}"]
-                    
-                    return {
-                        "type": "book",
-                        "title": book_data.get("title", ""),
-                        "authors": [author.get("name", "") for author in book_data.get("authors", [])],
-                        "year": self._extract_year_from_date(book_data.get("publish_date", "")),
-                        "publisher": book_data.get("publishers", [{}])[0].get("name", "") if book_data.get("publishers") else "",
-                        "isbn": isbn,
-                        "pages": book_data.get("number_of_pages"),
-                        "source": "openlibrary",
-                        "url": book_data.get("url")
-                    }
-        except Exception as e:
-            print(f"Open Library API error: {e}")
+    def _parse_isbn_response(self, data: Dict[str, Any], isbn: str) -> Optional[Dict[str, Any]]:
+        """Parse an Open Library books response"""
+        if f"ISBN:{isbn}" not in data:
+            return None
         
-        return None
+        book_data = data[f"ISBN:{isbn}"]
+        
+        return {
+            "type": "book",
+            "title": book_data.get("title", ""),
+            "authors": [author.get("name", "") for author in book_data.get("authors", [])],
+            "year": self._extract_year_from_date(book_data.get("publish_date", "")),
+            "publisher": book_data.get("publishers", [{}])[0].get("name", "") if book_data.get("publishers") else "",
+            "isbn": isbn,
+            "pages": book_data.get("number_of_pages"),
+            "source": "openlibrary",
+            "url": book_data.get("url")
+        }
     
-    def _search_by_pmid(self, pmid: str) -> Optional[Dict[str, Any]]:
-        """Search for an article by PubMed ID"""
-        try:
-            # Fetch article details from PubMed
-            response = self.session.get(
-                f"{self.endpoints['pubmed']}/esummary.fcgi",
-                params={
-                    "db": "pubmed",
-                    "id": pmid,
-                    "retmode": "json"
-                },
-                timeout=self.timeout
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if "result" in data and pmid in data["result"]:
-                    article = data["result"][pmid]
-                    
-                    return {
-                        "type": "journal_article",
-                        "title": article.get("title", ""),
-                        "authors": [author.get("name", "") for author in article.get("authors", [])],
-                        "year": int(article.get("pubdate", "").split()[0]) if article.get("pubdate") else None,
-                        "journal": article.get("source", ""),
-                        "volume": article.get("volume"),
-                        "issue": article.get("issue"),
-                        "pages": article.get("pages"),
-                        "pmid": pmid,
-                        "doi": article.get("elocationid", "").replace("doi: ", "") if "doi" in article.get("elocationid", "") else None,
-                        "source": "pubmed"
-                    }
-        except Exception as e:
-            print(f"PubMed API error: {e}")
+    def _parse_pmid_response(self, data: Dict[str, Any], pmid: str) -> Optional[Dict[str, Any]]:
+        """Parse a PubMed esummary response"""
+        if "result" not in data or pmid not in data["result"]:
+            return None
         
-        return None
+        article = data["result"][pmid]
+        
+        return {
+            "type": "journal_article",
+            "title": article.get("title", ""),
+            "authors": [author.get("name", "") for author in article.get("authors", [])],
+            "year": int(article.get("pubdate", "").split()[0]) if article.get("pubdate") else None,
+            "journal": article.get("source", ""),
+            "volume": article.get("volume"),
+            "issue": article.get("issue"),
+            "pages": article.get("pages"),
+            "pmid": pmid,
+            "doi": article.get("elocationid", "").replace("doi: ", "") if "doi" in article.get("elocationid", "") else None,
+            "source": "pubmed"
+        }
     
-    def _search_by_title(self, citation_info: Dict[str, Any]) -> list:
-        """Search by title using CrossRef API"""
+    def _parse_title_response(self, data: Dict[str, Any]) -> list:
+        """Parse a CrossRef title search response"""
         results = []
+        items = data.get("message", {}).get("items", [])
         
-        try:
-            # Search CrossRef by title
-            response = self.session.get(
-                f"{self.endpoints['crossref']}/works",
-                params={
-                    "query.title": citation_info["title"],
-                    "rows": 3,
-                    "filter": f"from-pub-date:{citation_info['year']}" if citation_info.get("year") else None
-                },
-                timeout=self.timeout
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                items = data.get("message", {}).get("items", [])
-                
-                for item in items[:1]:  # Take only the best match
-                    result = {
-                        "type": item.get("type", "unknown"),
-                        "title": item.get("title", [""])[0],
-                        "authors": self._extract_crossref_authors(item.get("author", [])),
-                        "year": item.get("published-print", {}).get("date-parts", [[None]])[0][0],
-                        "journal": item.get("container-title", [""])[0] if item.get("container-title") else None,
-                        "doi": item.get("DOI"),
-                        "source": "crossref",
-                        "match_score": item.get("score", 0)
-                    }
-                    results.append(result)
-        except Exception as e:
-            print(f"Title search error: {e}")
+        for item in items:  # _verify_details picks the one that best matches the citation
+            result = {
+                "type": item.get("type", "unknown"),
+                "title": item.get("title", [""])[0],
+                "authors": self._extract_crossref_authors(item.get("author", [])),
+                "year": item.get("published-print", {}).get("date-parts", [[None]])[0][0],
+                "journal": item.get("container-title", [""])[0] if item.get("container-title") else None,
+                "doi": item.get("DOI"),
+                "source": "crossref",
+                "match_score": item.get("score", 0)
+            }
+            results.append(result)
         
         return results
     
@@ -280,8 +344,8 @@ class MCPServer:
             verification["suggestions"].append("Source not found in external databases")
             return verification
         
-        # Compare with the first source found
-        source = search_results["sources"][0]
+        # Compare with the source that best matches the citation, not just the first hit
+        source = self._best_source(citation_info, search_results["sources"])
         verification["source_info"] = source
         
         # Check year
@@ -292,11 +356,14 @@ class MCPServer:
                 verification["mismatched_fields"].append("year")
                 verification["suggestions"].append(f"Year should be {source['year']}")
         
-        # Check title similarity if available
+        # Check title similarity if available (token-set similarity tolerates reordering, subtitles and typos)
         if citation_info.get("title") and source.get("title"):
-            # Simple similarity check (could be improved with fuzzy matching)
-            if citation_info["title"].lower() in source["title"].lower() or source["title"].lower() in citation_info["title"].lower():
+            similarity = self.matcher.title_similarity(citation_info["title"], source["title"])
+            if similarity >= TITLE_MATCH_THRESHOLD:
                 verification["matched_fields"].append("title")
+            elif similarity < TITLE_MISMATCH_THRESHOLD:
+                verification["mismatched_fields"].append("title")
+                verification["suggestions"].append(f"Title should be \"{source['title']}\"")
         
         # Overall verification status
         if len(verification["matched_fields"]) > len(verification["mismatched_fields"]):
@@ -305,6 +372,14 @@ class MCPServer:
         
         return verification
     
+    def _best_source(self, citation_info: Dict[str, Any], sources: list) -> Dict[str, Any]:
+        """Source whose title, authors and year best match the citation"""
+        if len(sources) == 1:
+            return sources[0]
+        citation = self.matcher.prepare_citation(citation_info["raw_text"], citation_info.get("title") or None,
+                                                 citation_info.get("year"))
+        return self.matcher.rank(citation, sources)[0][1]
+    
     def _extract_crossref_authors(self, authors: list) -> list:
         """Extract author names from CrossRef format"""
         extracted = []
@@ -325,11 +400,12 @@ class MCPServer:
         return None
     
     def batch_verify(self, citations: list) -> Dict[str, Any]:
-        """Verify multiple citations in batch"""
-        results = []
-        for citation in citations:
-            result = self.verify_citation(citation)
-            results.append(result)
+        """Verify multiple citations in batch (lookups overlap on a single thread)"""
+        return run_sync(self.batch_verify_async(citations))
+    
+    async def batch_verify_async(self, citations: list) -> Dict[str, Any]:
+        """Verify multiple citations concurrently"""
+        results = await gather_limited(self.verify_citation_async(citation) for citation in citations)
         
         return {
             "total": len(citations),
@@ -0,0 +1,70 @@
+import threading
+from typing import Dict, List, Optional
+from src.quota_scheduler import QuotaScheduler
+
+DEFAULT_LATENCY = 2.0  # seconds assumed for a model we have not timed yet
+LATENCY_SMOOTHING = 0.3  # weight of the newest sample in the latency average
+
+
+class ModelLoadBalancer:
+    """Smooth weighted round-robin over a preset's models
+
+    A model's weight is its remaining quota headroom divided by its observed
+    latency, so fast models with spare quota take proportionally more of the
+    traffic while every model in the preset keeps receiving some of it.
+    """
+
+    def __init__(self, models: List[str], quota_scheduler: QuotaScheduler):
+        self.models = list(models)
+        self.quota_scheduler = quota_scheduler
+        self.latency = {name: None for name in self.models}
+        self.current_weight = {name: 0.0 for name in self.models}
+        self.lock = threading.Lock()
+
+    def _weights(self, available: List[str]) -> Dict[str, float]:
+        """Headroom-over-latency weight of each available model"""
+        utilization = self.quota_scheduler.utilization()
+        weights = {}
+        for name in available:
+            usage = utilization.get(name, {})
+            headroom = 1.0 - max(usage.get('rpm_utilization', 0.0), usage.get('tpm_utilization', 0.0))
+            latency = self.latency.get(name) or DEFAULT_LATENCY
+            weights[name] = max(headroom, 0.0) / latency
+        return weights
+
+    def order(self, exclude: Optional[List[str]] = None) -> List[str]:
+        """Models to try for the next request, the round-robin pick first"""
+        exclude = set(exclude or [])
+        available = [name for name in self.models if name not in exclude]
+        if not available:
+            return []
+
+        weights = self._weights(available)
+        total = sum(weights.values())
+        if total <= 0:
+            # Everything is saturated: keep preset order and let the scheduler wait
+            return available
+
+        with self.lock:
+            for name in available:
+                self.current_weight[name] += weights[name]
+            chosen = max(available, key=lambda name: self.current_weight[name])
+            self.current_weight[chosen] -= total
+
+        # Fall back to the other models by descending weight
+        rest = sorted((name for name in available if name != chosen), key=lambda name: -weights[name])
+        return [chosen] + rest
+
+    def record_latency(self, model_name: str, seconds: float):
+        """Fold a response time into the model's moving average"""
+        with self.lock:
+            previous = self.latency.get(model_name)
+            if previous is None:
+                self.latency[model_name] = seconds
+            else:
+                self.latency[model_name] = (1 - LATENCY_SMOOTHING) * previous + LATENCY_SMOOTHING * seconds
+
+    def stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Observed latency per model"""
+        with self.lock:
+            return {name: {'latency': self.latency[name]} for name in self.models}
@@ -0,0 +1,101 @@
+import re
+import unicodedata
+from typing import Tuple
+from src.offset_map import OffsetMap
+
+# Whitespace other than a plain space; replaced one for one, so positions don't move
+OTHER_WHITESPACE = re.compile(r'[^\S ]')
+# Runs of spaces that collapse to one; single spaces between words don't match, so prose yields few matches
+COLLAPSIBLE = re.compile(r' {2,}')
+# The same, plus runs of non-ASCII characters, which NFKD may decompose
+COLLAPSIBLE_OR_WIDE = re.compile(r' {2,}|[^\x00-\x7f ]+')
+
+
+class Normalizer:
+    """Builds normalized text from pieces of a source, keeping an OffsetMap back to it
+
+    Each piece has whitespace runs collapsed to one space and its ends
+    stripped (and with `compatibility`, NFKD applied). Only the spots that
+    change start a new run in the map, so normalizing is a regex scan plus
+    one join, and the map stays small enough to keep for every document.
+    """
+
+    def __init__(self, compatibility: bool = False, lines: bool = True):
+        self.compatibility = compatibility
+        self.lines = lines
+        self.offset_map = OffsetMap()
+        self.parts = []
+        self.length = 0
+
+    def _emit(self, piece: str, source: int):
+        if piece:
+            self.offset_map.add(self.length, source)
+            self.parts.append(piece)
+            self.length += len(piece)
+
+    def _emit_decomposed(self, run: str, source: int):
+        """NFKD of a run of non-ASCII characters, mapped character by character where lengths change"""
+        normalized = unicodedata.normalize('NFKD', run)
+        if len(normalized) == len(run):
+            self._emit(normalized, source)
+            return
+        pieces = [unicodedata.normalize('NFKD', char) for char in run]
+        if ''.join(pieces) != normalized:
+            # Combining marks were reordered across characters; map the run as a whole,
+            # with any characters beyond its length mapped to its last character
+            self._emit(normalized[:len(run)], source)
+            for char in normalized[len(run):]:
+                self._emit(char, source + len(run) - 1)
+            return
+        for offset, piece in enumerate(pieces):
+            # Every character a source character expands into maps back to it
+            for char in piece:
+                self._emit(char, source + offset)
+
+    def add(self, text: str, source: int = 0):
+        """Append normalized `text`, which starts at `source` in the source"""
+        if self.lines:
+            newline = text.find('\n')
+            while newline != -1:
+                self.offset_map.add_line(source + newline + 1)
+                newline = text.find('\n', newline + 1)
+
+        # Both passes run in C; Python only sees the spots where the length changes
+        text = OTHER_WHITESPACE.sub(' ', text)
+        start = len(text) - len(text.lstrip(' '))
+        end = len(text.rstrip(' '))
+        pattern = COLLAPSIBLE_OR_WIDE if self.compatibility else COLLAPSIBLE
+        cursor = start
+        for match in pattern.finditer(text, start, end):
+            self._emit(text[cursor:match.start()], source + cursor)
+            run = match.group()
+            if run[0] == ' ':
+                self._emit(' ', source + match.start())
+            else:
+                self._emit_decomposed(run, source + match.start())
+            cursor = match.end()
+        self._emit(text[cursor:end], source + cursor)
+
+    def add_page(self, text: str, source: int, separator: str = "\n\n") -> int:
+        """Append a page's normalized text, starting a new page in the map
+
+        Pages are joined by `separator`; blank pages add nothing. Returns the
+        position in the normalized text where the page starts.
+        """
+        self.offset_map.add_page(source)
+        if self.length and text and not text.isspace():
+            self._emit(separator, source)
+        start = self.length
+        self.add(text, source)
+        return start
+
+    def result(self) -> Tuple[str, OffsetMap]:
+        """Normalized text and its offset map"""
+        return ''.join(self.parts), self.offset_map
+
+
+def normalize_text(text: str, compatibility: bool = True) -> Tuple[str, OffsetMap]:
+    """Collapse whitespace, strip and (by default) NFKD-normalize text, with a map back to the original"""
+    normalizer = Normalizer(compatibility)
+    normalizer.add(text)
+    return normalizer.result()
@@ -0,0 +1,281 @@
+"""Offline bibliographic index: CrossRef/OpenAlex dumps and BibTeX/RIS libraries in SQLite
+
+Usage: python -m src.offline_index INDEX.sqlite DUMP [DUMP ...]
+
+Point OFFLINE_INDEX_PATH at the index and DOIValidator, WebSearcher and
+MCPServer answer from it, only calling their live APIs on a miss.
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Optional, Dict, Any, List, Iterator, Iterable
+
+from src.bib_parsers import parse_bibtex, parse_ris, clean_doi, split_name
+from src.fuzzy_match import normalize_title
+from config.settings import OFFLINE_INGEST_BATCH, OFFLINE_QUERY_TRIGRAMS, OFFLINE_CANDIDATES, OFFLINE_TITLE_THRESHOLD, OFFLINE_CACHE_KIB
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS works (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,  -- DOI, or normalized title and year for works without one
+    doi TEXT UNIQUE,
+    title TEXT NOT NULL,  -- normalized, for re-ranking fuzzy matches
+    year INTEGER,
+    work TEXT NOT NULL  -- CrossRef-style work JSON
+);
+CREATE TABLE IF NOT EXISTS isbns (isbn TEXT NOT NULL, work_id INTEGER NOT NULL, PRIMARY KEY (isbn, work_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS title_trigrams (trigram TEXT NOT NULL, work_id INTEGER NOT NULL, PRIMARY KEY (trigram, work_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS trigram_counts (trigram TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID;
+"""
+
+
+def title_trigrams(normalized: str) -> set:
+    """Trigrams of each word padded with two spaces before and one after (as pg_trgm does)"""
+    return {padded[i:i + 3] for padded in (f"  {word} " for word in normalized.split()) for i in range(len(padded) - 2)}
+
+
+def similarity(a: set, b: set) -> float:
+    """Shared trigrams over all trigrams of two titles"""
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def normalize_isbn(isbn: str) -> Optional[str]:
+    """ISBN-13 digits of an ISBN-10 or ISBN-13, or None if it isn't one"""
+    digits = re.sub(r'[^\dXx]', '', isbn).upper()
+    if len(digits) == 10:
+        core = '978' + digits[:9]
+        check = (10 - sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(core)) % 10) % 10
+        return core + str(check)
+    if len(digits) == 13 and digits.isdigit():
+        return digits
+    return None
+
+
+def openalex_to_work(record: Dict[str, Any]) -> Dict[str, Any]:
+    """An OpenAlex work in CrossRef form"""
+    work = {
+        'type': record.get('type') or 'other',
+        'title': [record.get('display_name') or record.get('title') or ''],
+        'author': [split_name((authorship.get('author') or {}).get('display_name') or '')
+                   for authorship in record.get('authorships') or []],
+        'is-referenced-by-count': record.get('cited_by_count', 0),
+    }
+    if record.get('doi'):
+        work['DOI'] = clean_doi(record['doi'])
+    if record.get('publication_year'):
+        date_parts = [int(part) for part in (record.get('publication_date') or '').split('-') if part.isdigit()]
+        work['published-print'] = {'date-parts': [date_parts or [record['publication_year']]]}
+    source = ((record.get('primary_location') or {}).get('source') or record.get('host_venue') or {})
+    if source.get('display_name'):
+        work['container-title'] = [source['display_name']]
+    biblio = record.get('biblio') or {}
+    if biblio.get('volume'):
+        work['volume'] = biblio['volume']
+    if biblio.get('issue'):
+        work['issue'] = biblio['issue']
+    if biblio.get('first_page'):
+        work['page'] = '-'.join(page for page in (biblio['first_page'], biblio.get('last_page')) if page)
+    return work
+
+
+def _json_works(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Works of a JSON Lines dump: CrossRef works, API responses or OpenAlex works"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if 'message' in record:
+            record = record['message']
+        for item in record.get('items', [record]):
+            if 'authorships' in item or 'display_name' in item:
+                yield openalex_to_work(item)
+            else:
+                yield item
+
+
+def _work_year(work: Dict[str, Any]) -> Optional[int]:
+    for field in ('published-print', 'published-online', 'published', 'issued', 'created'):
+        parts = (work.get(field) or {}).get('date-parts') or [[]]
+        if parts[0] and parts[0][0]:
+            return int(parts[0][0])
+    return None
+
+
+def _work_title(work: Dict[str, Any]) -> str:
+    title = work.get('title') or ''
+    return title[0] if isinstance(title, list) and title else title if isinstance(title, str) else ''
+
+
+class OfflineIndex:
+    """Bibliographic records in an SQLite file, looked up by DOI, ISBN or fuzzy title
+
+    Records are stored as CrossRef-style work JSON, so the existing CrossRef
+    parsers in DOIValidator, WebSearcher and MCPServer read them unchanged.
+    DOIs and ISBNs are primary-key lookups. Titles are indexed by trigram;
+    a search gathers candidates through the query's rarest trigrams and
+    re-ranks them by trigram similarity.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(f"PRAGMA cache_size = -{OFFLINE_CACHE_KIB}")
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM works").fetchone()[0]
+
+    def ingest(self, path: str) -> int:
+        """Add the records of a dump (JSON Lines, optionally gzipped, .bib or .ris); returns how many were new"""
+        name = path[:-3] if path.endswith('.gz') else path
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            if name.endswith('.bib'):
+                return self.add_works(parse_bibtex(f.read()))
+            if name.endswith('.ris'):
+                return self.add_works(parse_ris(f.read()))
+            return self.add_works(_json_works(f))
+
+    def add_works(self, works: Iterable[Dict[str, Any]]) -> int:
+        """Add CrossRef-style works, skipping ones already indexed; returns how many were new"""
+        added = 0
+        batch = []
+        for work in works:
+            batch.append(work)
+            if len(batch) >= OFFLINE_INGEST_BATCH:
+                added += self._insert(batch)
+                batch = []
+        added += self._insert(batch)
+
+        # Trigram frequencies pick the most selective trigrams at query time
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM trigram_counts")
+            self.connection.execute("INSERT INTO trigram_counts SELECT trigram, COUNT(*) FROM title_trigrams GROUP BY trigram")
+        return added
+
+    def _insert(self, works: List[Dict[str, Any]]) -> int:
+        added = 0
+        isbns = []
+        postings = []
+        with self.lock, self.connection:
+            for work in works:
+                title = normalize_title(_work_title(work))
+                doi = clean_doi(work['DOI']).lower() if work.get('DOI') else None
+                if not title and not doi:
+                    continue
+                year = _work_year(work)
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO works (key, doi, title, year, work) VALUES (?, ?, ?, ?, ?)",
+                    (doi or f"{title}|{year}", doi, title, year, json.dumps(work))
+                )
+                if not cursor.rowcount:
+                    continue
+                work_id = cursor.lastrowid
+                isbns.extend((isbn, work_id) for isbn in {normalize_isbn(isbn) for isbn in work.get('ISBN') or []} - {None})
+                postings.extend((gram, work_id) for gram in title_trigrams(title))
+                added += 1
+            self.connection.executemany("INSERT OR IGNORE INTO isbns VALUES (?, ?)", isbns)
+            self.connection.executemany("INSERT INTO title_trigrams VALUES (?, ?)", postings)
+        return added
+
+    def get_by_doi(self, doi: str) -> Optional[Dict[str, Any]]:
+        """Work with a DOI, or None"""
+        with self.lock:
+            row = self.connection.execute("SELECT work FROM works WHERE doi = ?", (clean_doi(doi).lower(),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_by_isbn(self, isbn: str) -> Optional[Dict[str, Any]]:
+        """Work with an ISBN (10 or 13 digits), or None"""
+        normalized = normalize_isbn(isbn)
+        if normalized is None:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT work FROM isbns JOIN works ON works.id = isbns.work_id WHERE isbn = ? LIMIT 1", (normalized,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def search_title(self, query: str, limit: int = 3, year: Optional[int] = None,
+                     threshold: float = OFFLINE_TITLE_THRESHOLD) -> List[Dict[str, Any]]:
+        """Works whose title is similar to `query`, best first, each with its similarity as 'score'
+
+        With `year`, works from other years are dropped.
+        """
+        grams = title_trigrams(normalize_title(query))
+        if not grams:
+            return []
+        with self.lock:
+            placeholders = ','.join('?' * len(grams))
+            counts = self.connection.execute(
+                f"SELECT trigram FROM trigram_counts WHERE trigram IN ({placeholders}) ORDER BY count LIMIT ?",
+                (*grams, OFFLINE_QUERY_TRIGRAMS)
+            ).fetchall()
+            if not counts:
+                return []
+            rare = [row[0] for row in counts]
+            rows = self.connection.execute(
+                f"""SELECT works.title, works.year, works.work FROM works JOIN (
+                        SELECT work_id, COUNT(*) AS hits FROM title_trigrams
+                        WHERE trigram IN ({','.join('?' * len(rare))}) GROUP BY work_id ORDER BY hits DESC LIMIT ?
+                    ) AS candidates ON works.id = candidates.work_id""",
+                (*rare, OFFLINE_CANDIDATES)
+            ).fetchall()
+
+        matches = []
+        for title, work_year, work in rows:
+            if year is not None and work_year is not None and work_year != year:
+                continue
+            score = similarity(grams, title_trigrams(title))
+            if score >= threshold:
+                matches.append((score, work))
+        matches.sort(key=lambda match: match[0], reverse=True)
+
+        results = []
+        for score, work in matches[:limit]:
+            work = json.loads(work)
+            work['score'] = score
+            results.append(work)
+        return results
+
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+
+def get_offline_index() -> Optional[OfflineIndex]:
+    """Process-wide index from OFFLINE_INDEX_PATH, or None when it isn't set or doesn't exist"""
+    global _shared_index
+    path = os.environ.get("OFFLINE_INDEX_PATH")
+    if not path or not os.path.exists(path):
+        return None
+    with _shared_index_lock:
+        if _shared_index is None or _shared_index.path != path:
+            _shared_index = OfflineIndex(path)
+    return _shared_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('index', help='SQLite file to create or add to')
+    parser.add_argument('dumps', nargs='+', help='JSON Lines (optionally .gz), .bib or .ris files')
+    args = parser.parse_args()
+
+    index = OfflineIndex(args.index)
+    for dump in args.dumps:
+        print(f"{dump}: {index.ingest(dump)} new records")
+    print(f"{args.index}: {len(index)} records")
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional
+
+
+class OffsetMap:
+    """Maps positions in extracted text back to positions in the source file
+
+    Stored as runs rather than per character: each run is the text position
+    where it starts and the source position it was copied from, and within
+    a run both advance together. A run that simply continues the previous
+    one isn't stored, so an unchanged stretch of text costs nothing.
+    Source line and page starts (pages only for paged formats like PDF)
+    turn source positions into line and page numbers; every lookup is a
+    bisect.
+    """
+
+    def __init__(self, line_starts: Optional[List[int]] = None, page_starts: Optional[List[int]] = None):
+        self.starts = array('q')  # text position where each run starts
+        self.sources = array('q')  # source position of the first character of each run
+        self.line_starts = array('q', line_starts or [0])
+        self.page_starts = array('q', page_starts or [])
+
+    def add(self, position: int, source: int):
+        """Text from `position` on was copied from `source` on"""
+        if self.starts and position - self.starts[-1] == source - self.sources[-1]:
+            return
+        if self.starts and self.starts[-1] == position:
+            self.sources[-1] = source
+            return
+        self.starts.append(position)
+        self.sources.append(source)
+
+    def add_line(self, source: int):
+        """Record the source position where a line starts"""
+        self.line_starts.append(source)
+
+    def add_page(self, source: int):
+        """Record the source position where a page starts (which also starts a line)"""
+        self.page_starts.append(source)
+        if self.line_starts[-1] < source:
+            self.line_starts.append(source)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def to_source(self, position: int) -> int:
+        """Source position of a text position"""
+        run = bisect_right(self.starts, position) - 1
+        if run < 0:
+            return position
+        return self.sources[run] + position - self.starts[run]
+
+    def line_for_position(self, position: int) -> int:
+        """1-based source line holding a text position"""
+        return bisect_right(self.line_starts, self.to_source(position))
+
+    def page_for_position(self, position: int) -> Optional[int]:
+        """1-based page holding a text position, or None without pages"""
+        if not self.page_starts:
+            return None
+        return max(bisect_right(self.page_starts, self.to_source(position)), 1)
+
+    def location(self, position: int) -> Dict[str, int]:
+        """Line of a text position, counted from the start of its page when there are pages"""
+        source = self.to_source(position)
+        line = bisect_right(self.line_starts, source)
+        if not self.page_starts:
+            return {'line': line}
+        page = max(bisect_right(self.page_starts, source), 1)
+        return {'page': page, 'line': line - bisect_left(self.line_starts, self.page_starts[page - 1])}
+
+    def to_dict(self) -> Dict[str, List[int]]:
+        return {'starts': self.starts.tolist(), 'sources': self.sources.tolist(),
+                'line_starts': self.line_starts.tolist(), 'page_starts': self.page_starts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, List[int]]) -> 'OffsetMap':
+        offset_map = cls(data['line_starts'], data.get('page_starts'))
+        offset_map.starts = array('q', data['starts'])
+        offset_map.sources = array('q', data['sources'])
+        return offset_map
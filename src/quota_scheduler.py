@@ -0,0 +1,176 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, List, Callable
+
+QUOTA_WINDOW = 60  # seconds; Gemini quotas are per minute
+
+
+class ModelQuota:
+    """Sliding one-minute window of requests and tokens sent to one model"""
+
+    def __init__(self, rpm: int, tpm: int, window: float = QUOTA_WINDOW):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.events = deque()  # (timestamp, tokens) per request
+        self.tokens_in_window = 0
+
+    def _expire(self, now: float):
+        """Drop requests that have left the window"""
+        while self.events and self.events[0][0] <= now - self.window:
+            _, tokens = self.events.popleft()
+            self.tokens_in_window -= tokens
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a request of `tokens` fits in both limits (0 = now)"""
+        self._expire(now)
+        # A prompt bigger than the whole minute budget can only ever run on an empty window
+        tokens = min(tokens, self.tpm)
+
+        requests_over = len(self.events) + 1 - self.rpm
+        tokens_over = self.tokens_in_window + tokens - self.tpm
+        if requests_over <= 0 and tokens_over <= 0:
+            return 0.0
+
+        # Walk the oldest requests until enough of them have expired to make room
+        freed_tokens = 0
+        for i, (timestamp, event_tokens) in enumerate(self.events):
+            freed_tokens += event_tokens
+            if i + 1 >= requests_over and freed_tokens >= tokens_over:
+                return max(0.0, timestamp + self.window - now)
+        return self.window
+
+    def record(self, tokens: int, now: float):
+        """Count a request against the window"""
+        self._expire(now)
+        self.events.append((now, tokens))
+        self.tokens_in_window += tokens
+
+    def correct(self, reserved: int, actual: int):
+        """Replace the estimated token count of the newest matching request with the real one"""
+        for i in range(len(self.events) - 1, -1, -1):
+            timestamp, tokens = self.events[i]
+            if tokens == reserved:
+                self.events[i] = (timestamp, actual)
+                self.tokens_in_window += actual - reserved
+                return
+
+    def cancel(self, tokens: int):
+        """Remove the newest request of `tokens` that was reserved but never sent"""
+        for i in range(len(self.events) - 1, -1, -1):
+            if self.events[i][1] == tokens:
+                del self.events[i]
+                self.tokens_in_window -= tokens
+                return
+
+    def utilization(self, now: float) -> Dict[str, Any]:
+        """Current usage of both limits"""
+        self._expire(now)
+        return {
+            'requests': len(self.events),
+            'rpm_limit': self.rpm,
+            'tokens': self.tokens_in_window,
+            'tpm_limit': self.tpm,
+            'rpm_utilization': len(self.events) / self.rpm if self.rpm else 0.0,
+            'tpm_utilization': self.tokens_in_window / self.tpm if self.tpm else 0.0
+        }
+
+
+class QuotaScheduler:
+    """Proactive requests-per-minute / tokens-per-minute scheduler across models
+
+    Requests are routed to the first candidate model with headroom; when none
+    has headroom the caller waits for the earliest one instead of sending a
+    request that is bound to be rejected with a 429.
+    """
+
+    def __init__(self, model_configs: List[Dict[str, Any]], clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.quotas = {
+            config['name']: ModelQuota(config.get('rpm', 10), config.get('tpm', 250000))
+            for config in model_configs
+        }
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def estimate_tokens(text: str, max_output_tokens: int = 0) -> int:
+        """Cheap token estimate (about four characters per token) plus the output budget"""
+        return math.ceil(len(text) / 4) + max_output_tokens
+
+    def acquire(self, candidates: List[str], tokens: int, timeout: Optional[float] = None) -> Optional[str]:
+        """Reserve quota on the first candidate with headroom, waiting if necessary
+
+        Returns the chosen model name, or None if no candidate frees up within `timeout`.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        candidates = [name for name in candidates if name in self.quotas]
+        if not candidates:
+            return None
+
+        while True:
+            with self.lock:
+                now = self.clock()
+                waits = {}
+                for name in candidates:
+                    waits[name] = self.quotas[name].wait_time(tokens, now)
+                    if waits[name] == 0:
+                        self.quotas[name].record(tokens, now)
+                        return name
+                delay = min(waits.values())
+
+            if deadline is not None and now + delay > deadline:
+                return None
+            self.sleep(delay)
+
+    def wait_time(self, candidates: List[str], tokens: int) -> float:
+        """Seconds until the first of `candidates` has headroom for `tokens`"""
+        with self.lock:
+            now = self.clock()
+            waits = [self.quotas[name].wait_time(tokens, now) for name in candidates if name in self.quotas]
+        return min(waits) if waits else 0.0
+
+    def release(self, model_name: str, tokens: int):
+        """Give back a reservation from acquire that was not used"""
+        with self.lock:
+            if model_name in self.quotas:
+                self.quotas[model_name].cancel(tokens)
+
+    def record(self, model_name: str, tokens: int):
+        """Count a request that bypassed acquire (e.g. a connectivity probe)"""
+        with self.lock:
+            if model_name in self.quotas:
+                self.quotas[model_name].record(tokens, self.clock())
+
+    def record_usage(self, model_name: str, reserved: int, actual: int):
+        """Correct a reservation with the token count reported by the API"""
+        with self.lock:
+            if model_name in self.quotas:
+                self.quotas[model_name].correct(reserved, actual)
+
+    def utilization(self) -> Dict[str, Dict[str, Any]]:
+        """Usage of every model's limits"""
+        with self.lock:
+            now = self.clock()
+            return {name: quota.utilization(now) for name, quota in self.quotas.items()}
+
+
+_shared_scheduler: Optional[QuotaScheduler] = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def get_quota_scheduler(model_configs: List[Dict[str, Any]]) -> QuotaScheduler:
+    """Get the process-wide scheduler, shared by every provider instance like the breakers"""
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = QuotaScheduler(model_configs)
+        else:
+            with _shared_scheduler.lock:
+                for config in model_configs:
+                    if config['name'] not in _shared_scheduler.quotas:
+                        _shared_scheduler.quotas[config['name']] = ModelQuota(config.get('rpm', 10), config.get('tpm', 250000))
+    return _shared_scheduler
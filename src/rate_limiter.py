@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, Callable
+from urllib.parse import urlparse
+from config.settings import RATE_LIMITS, DEFAULT_RATE_LIMIT, RETRY_AFTER_DEFAULT, RETRY_AFTER_MAX
+
+
+class TokenBucket:
+    """Thread-safe token bucket
+
+    Callers reserve a token and are told how long to wait before using it. The
+    token count may go negative, which queues later callers behind earlier ones
+    so concurrent requests are spaced out at exactly the configured rate.
+    """
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """Add tokens accrued since the last update"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return the number of seconds to wait before using it"""
+        with self.lock:
+            self._refill(self.clock())
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def pause(self, seconds: float):
+        """Hold off all callers for `seconds` (e.g. from a Retry-After header)"""
+        with self.lock:
+            self._refill(self.clock())
+            # Drain the bucket so the next token becomes available only after the pause
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class HostRateLimiter:
+    """Per-host token buckets shared by every HTTP client in the process"""
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None,
+                 default_limit: Optional[Dict[str, float]] = None):
+        self.limits = RATE_LIMITS if limits is None else limits
+        self.default_limit = default_limit or DEFAULT_RATE_LIMIT
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket_for(self, url: str) -> TokenBucket:
+        """Get the bucket for the host of `url`"""
+        host = urlparse(url).hostname or ''
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                limit = self.limits.get(host, self.default_limit)
+                bucket = TokenBucket(limit['rate'], limit['burst'])
+                self.buckets[host] = bucket
+        return bucket
+
+    def wait(self, url: str):
+        """Block until a request to `url` is allowed"""
+        delay = self.bucket_for(url).reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self, url: str):
+        """Wait, without blocking the event loop, until a request to `url` is allowed"""
+        delay = self.bucket_for(url).reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record_response(self, url: str, status_code: int, headers: Dict[str, Any]):
+        """Pause the host when it tells us we are going too fast"""
+        if status_code not in (429, 503):
+            return
+
+        retry_after = parse_retry_after(headers.get('Retry-After') or headers.get('retry-after'))
+        if retry_after is None:
+            retry_after = RETRY_AFTER_DEFAULT
+        self.bucket_for(url).pause(min(retry_after, RETRY_AFTER_MAX))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> HostRateLimiter:
+    """Get the process-wide rate limiter"""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = HostRateLimiter()
+    return _shared_limiter
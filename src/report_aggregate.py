@@ -0,0 +1,179 @@
+from typing import Dict, Any, List, Tuple, Iterable
+import numpy as np
+
+
+def _add_counts(target: Dict[str, int], source: Dict[str, int]):
+    for key, count in source.items():
+        target[key] = target.get(key, 0) + count
+
+
+def _issue_type(issue: str) -> str:
+    """Issue category: the text before the first colon"""
+    return issue.split(':')[0] if ':' in issue else issue
+
+
+class ReportAggregate:
+    """Mergeable summary statistics of analyzed citations
+
+    Built in one vectorized pass over a CitationTable's columns (per-style
+    validity counts and confidence sums via bincount) plus one pass over the
+    sparse extras for issue histograms. Aggregates of separate documents can
+    be merged, so corpus-level summaries never revisit individual citations.
+    """
+
+    def __init__(self):
+        self.documents = 0
+        self.styles = {}  # style -> {'total', 'valid', 'invalid', 'uncertain', 'confidence_sum'}
+        self.issues = {}  # issue text -> occurrences
+        self.issue_types = {}  # issue category -> occurrences
+        self.degraded = 0
+        self.dois = 0
+
+    @classmethod
+    def from_table(cls, table) -> 'ReportAggregate':
+        """Aggregate one document's CitationTable"""
+        aggregate = cls()
+        aggregate.documents = 1
+        style_count = len(table.styles)
+        if len(table):
+            codes = np.frombuffer(table.style_codes, dtype=np.uint16).astype(np.intp)
+            # Validity codes -1/0/1 (uncertain/invalid/valid) shifted to 0/1/2
+            validity = np.frombuffer(table.validity, dtype=np.int8).astype(np.intp) + 1
+            confidence = np.frombuffer(table.confidence, dtype=np.float64)
+
+            # One bincount over (style, validity) pairs gives the whole breakdown
+            by_state = np.bincount(codes * 3 + validity, minlength=style_count * 3).reshape(style_count, 3)
+            confidence_sums = np.bincount(codes, weights=confidence, minlength=style_count)
+
+            for code, style in enumerate(table.styles):
+                states = by_state[code]
+                aggregate.styles[style] = {
+                    'total': int(states.sum()),
+                    'uncertain': int(states[0]),
+                    'invalid': int(states[1]),
+                    'valid': int(states[2]),
+                    'confidence_sum': float(confidence_sums[code])
+                }
+
+        # Issues, DOIs and degraded flags only exist on the rows that have them
+        for extras in table.extras.values():
+            for issue in extras.get('issues', ()):
+                aggregate.issues[issue] = aggregate.issues.get(issue, 0) + 1
+                issue_type = _issue_type(issue)
+                aggregate.issue_types[issue_type] = aggregate.issue_types.get(issue_type, 0) + 1
+            if extras.get('degraded'):
+                aggregate.degraded += 1
+            if extras.get('doi'):
+                aggregate.dois += 1
+        return aggregate
+
+    @classmethod
+    def from_summary(cls, summary: Dict[str, Any]) -> 'ReportAggregate':
+        """Rebuild an aggregate from a report summary, e.g. one loaded from JSON"""
+        aggregate = cls()
+        aggregate.documents = 1
+        for style, stats in summary.get('styles', {}).items():
+            aggregate.styles[style] = {
+                'total': stats['total'],
+                'valid': stats['valid'],
+                'invalid': stats['invalid'],
+                'uncertain': stats['uncertain'],
+                'confidence_sum': stats['average_confidence'] * stats['total']
+            }
+        for issue, count in summary.get('issue_histogram', {}).items():
+            aggregate.issues[issue] = count
+            issue_type = _issue_type(issue)
+            aggregate.issue_types[issue_type] = aggregate.issue_types.get(issue_type, 0) + count
+        aggregate.degraded = summary.get('degraded_citations', 0)
+        aggregate.dois = summary.get('dois_found', 0)
+        return aggregate
+
+    def merge(self, other: 'ReportAggregate') -> 'ReportAggregate':
+        """Fold another aggregate into this one"""
+        self.documents += other.documents
+        for style, stats in other.styles.items():
+            mine = self.styles.setdefault(style, {'total': 0, 'valid': 0, 'invalid': 0, 'uncertain': 0, 'confidence_sum': 0.0})
+            for key, value in stats.items():
+                mine[key] += value
+        _add_counts(self.issues, other.issues)
+        _add_counts(self.issue_types, other.issue_types)
+        self.degraded += other.degraded
+        self.dois += other.dois
+        return self
+
+    def __add__(self, other: 'ReportAggregate') -> 'ReportAggregate':
+        return ReportAggregate().merge(self).merge(other)
+
+    @classmethod
+    def combine(cls, aggregates: Iterable['ReportAggregate']) -> 'ReportAggregate':
+        """Merge many aggregates (e.g. one per document) into a corpus aggregate"""
+        total = cls()
+        for aggregate in aggregates:
+            total.merge(aggregate)
+        return total
+
+    def _sum(self, key: str):
+        return sum(stats[key] for stats in self.styles.values())
+
+    @property
+    def total(self) -> int:
+        return self._sum('total')
+
+    @property
+    def valid(self) -> int:
+        return self._sum('valid')
+
+    @property
+    def invalid(self) -> int:
+        return self._sum('invalid')
+
+    @property
+    def uncertain(self) -> int:
+        return self._sum('uncertain')
+
+    @property
+    def validity_score(self) -> float:
+        return (self.valid / self.total) * 100 if self.total else 0
+
+    @property
+    def average_confidence(self) -> float:
+        return self._sum('confidence_sum') / self.total if self.total else 0
+
+    def common_issues(self, limit: int = 5) -> List[Tuple[str, int]]:
+        """Most frequent issues with their counts"""
+        return sorted(self.issues.items(), key=lambda x: x[1], reverse=True)[:limit]
+
+    def most_common_issue_type(self):
+        """Most frequent issue category, or None without issues"""
+        if not self.issue_types:
+            return None
+        return max(self.issue_types, key=self.issue_types.get)
+
+    def style_breakdown(self) -> Dict[str, Dict[str, Any]]:
+        """Per-style counts, validity score and average confidence"""
+        breakdown = {}
+        for style, stats in self.styles.items():
+            breakdown[style] = {
+                'total': stats['total'],
+                'valid': stats['valid'],
+                'invalid': stats['invalid'],
+                'uncertain': stats['uncertain'],
+                'validity_score': (stats['valid'] / stats['total']) * 100 if stats['total'] else 0,
+                'average_confidence': stats['confidence_sum'] / stats['total'] if stats['total'] else 0
+            }
+        return breakdown
+
+    def summary(self) -> Dict[str, Any]:
+        """Summary fields shared by document reports and corpus summaries"""
+        return {
+            "total_citations": self.total,
+            "valid_citations": self.valid,
+            "invalid_citations": self.invalid,
+            "uncertain_citations": self.uncertain,
+            "validity_score": self.validity_score,
+            "average_confidence": self.average_confidence,
+            "degraded_citations": self.degraded,
+            "dois_found": self.dois,
+            "styles": self.style_breakdown(),
+            "issue_histogram": dict(self.issues)
+        }
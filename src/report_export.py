@@ -0,0 +1,259 @@
+import os
+from typing import Dict, Any, List, Optional
+import pandas as pd
+from config.settings import EXPORT_BATCH_ROWS
+
+# Try to import pyarrow for Parquet / Arrow IPC output
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Column name -> type of every exported table. Types are fixed up front so
+# that batches written for different documents share one schema.
+TABLE_SCHEMAS = {
+    "citations": {
+        "document_id": "string",
+        "position": "int64",
+        "text": "string",
+        "style": "string",
+        "is_valid": "bool",
+        "confidence_score": "float64",
+        "tier": "string",
+        "model_used": "string",
+        "degraded": "bool",
+        "doi": "string",
+        "doi_valid": "bool",
+        "issue_count": "int64",
+        "issues": "string",
+        "suggestions": "string"
+    },
+    "doi_validations": {
+        "document_id": "string",
+        "citation": "string",
+        "doi": "string",
+        "valid": "bool",
+        "title": "string",
+        "journal": "string",
+        "year": "string",
+        "publisher": "string",
+        "error": "string"
+    },
+    "web_matches": {
+        "document_id": "string",
+        "position": "int64",
+        "citation": "string",
+        "source": "string",
+        "title": "string",
+        "authors": "string",
+        "year": "string",
+        "journal": "string",
+        "doi": "string",
+        "url": "string"
+    }
+}
+
+PANDAS_DTYPES = {"string": "string", "int64": "Int64", "float64": "Float64", "bool": "boolean"}
+FILE_EXTENSIONS = {"parquet": "parquet", "arrow": "arrow", "csv": "csv"}
+LIST_SEPARATOR = " | "  # joins issues/suggestions into one column so every format can hold them
+
+
+def _join(values: Optional[List[Any]]) -> Optional[str]:
+    """Flatten a list column into a single string"""
+    if not values:
+        return None
+    return LIST_SEPARATOR.join(str(value) for value in values)
+
+
+class ReportExporter:
+    """Write analysis reports of many documents as columnar tables
+
+    Citations, DOI validations and web-search matches each become one table
+    keyed by document id. Rows are accumulated column-wise and written every
+    `batch_rows` rows (a Parquet row group, an Arrow record batch or a CSV
+    chunk), so memory stays flat however many documents are exported.
+    Parquet and Arrow need pyarrow; without it the exporter falls back to CSV.
+    """
+
+    def __init__(self, directory: str, format: str = "parquet", batch_rows: int = EXPORT_BATCH_ROWS):
+        if format not in FILE_EXTENSIONS:
+            raise ValueError(f"Unsupported export format: {format}")
+        if format != "csv" and not HAS_PYARROW:
+            print(f"pyarrow is not installed; exporting CSV instead of {format}")
+            format = "csv"
+
+        self.directory = directory
+        self.format = format
+        self.batch_rows = batch_rows
+        self.columns = {name: self._empty_columns(name) for name in TABLE_SCHEMAS}
+        self.writers = {}
+        self.rows_written = {name: 0 for name in TABLE_SCHEMAS}
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    @staticmethod
+    def _empty_columns(table: str) -> Dict[str, list]:
+        return {column: [] for column in TABLE_SCHEMAS[table]}
+
+    def path_for(self, table: str) -> str:
+        """File a table is written to"""
+        return os.path.join(self.directory, f"{table}.{FILE_EXTENSIONS[self.format]}")
+
+    def add_report(self, document_id: str, report: Dict[str, Any]):
+        """Append the rows of one document's report"""
+        for citation in report.get("citations", []):
+            self._append("citations", {
+                "document_id": document_id,
+                "position": citation.get("position"),
+                "text": citation.get("text"),
+                "style": citation.get("style"),
+                "is_valid": citation.get("is_valid"),
+                "confidence_score": citation.get("confidence_score"),
+                "tier": citation.get("tier"),
+                "model_used": citation.get("model_used"),
+                "degraded": citation.get("degraded", False),
+                "doi": citation.get("doi"),
+                "doi_valid": citation.get("doi_valid"),
+                "issue_count": len(citation.get("issues", [])),
+                "issues": _join(citation.get("issues")),
+                "suggestions": _join(citation.get("suggestions"))
+            })
+
+            web_search = citation.get("web_search")
+            if web_search and web_search.get("found"):
+                for source in web_search.get("sources", []):
+                    authors = source.get("authors")
+                    self._append("web_matches", {
+                        "document_id": document_id,
+                        "position": citation.get("position"),
+                        "citation": citation.get("text"),
+                        "source": source.get("source"),
+                        "title": source.get("title"),
+                        "authors": _join(authors) if isinstance(authors, list) else authors,
+                        "year": None if source.get("year") is None else str(source.get("year")),
+                        "journal": source.get("journal"),
+                        "doi": source.get("doi"),
+                        "url": source.get("url")
+                    })
+
+        for result in report.get("doi_validation", {}).get("results", []):
+            data = result.get("data") or {}
+            year = (data.get("date") or {}).get("year")
+            self._append("doi_validations", {
+                "document_id": document_id,
+                "citation": result.get("citation"),
+                "doi": result.get("doi"),
+                "valid": result.get("valid"),
+                "title": data.get("title"),
+                "journal": data.get("journal"),
+                "year": None if year is None else str(year),
+                "publisher": data.get("publisher"),
+                "error": result.get("error")
+            })
+
+    def add_reports(self, reports: Dict[str, Dict[str, Any]]):
+        """Append several documents' reports, keyed by document id"""
+        for document_id, report in reports.items():
+            self.add_report(document_id, report)
+
+    def _append(self, table: str, row: Dict[str, Any]):
+        columns = self.columns[table]
+        for column, values in columns.items():
+            values.append(row.get(column))
+        if len(columns["document_id"]) >= self.batch_rows:
+            self._flush_table(table)
+
+    def _frame(self, table: str) -> pd.DataFrame:
+        """Pending rows of a table as a typed DataFrame"""
+        schema = TABLE_SCHEMAS[table]
+        frame = pd.DataFrame(self.columns[table], columns=list(schema))
+        # Nullable dtypes keep missing booleans/ints as <NA> rather than object columns
+        return frame.astype({column: PANDAS_DTYPES[kind] for column, kind in schema.items()})
+
+    def _arrow_schema(self, table: str):
+        types = {"string": pa.string(), "int64": pa.int64(), "float64": pa.float64(), "bool": pa.bool_()}
+        return pa.schema([(column, types[kind]) for column, kind in TABLE_SCHEMAS[table].items()])
+
+    def _flush_table(self, table: str):
+        """Write a table's pending rows as one batch"""
+        pending = len(self.columns[table]["document_id"])
+        if pending == 0:
+            return
+
+        if self.format == "csv":
+            first_batch = self.rows_written[table] == 0
+            self._frame(table).to_csv(self.path_for(table), mode="w" if first_batch else "a",
+                                      header=first_batch, index=False)
+        else:
+            schema = self._arrow_schema(table)
+            batch = pa.RecordBatch.from_pydict(self.columns[table], schema=schema)
+            writer = self.writers.get(table)
+            if writer is None:
+                if self.format == "parquet":
+                    writer = pq.ParquetWriter(self.path_for(table), schema)
+                else:
+                    writer = pa.ipc.new_file(self.path_for(table), schema)
+                self.writers[table] = writer
+            if self.format == "parquet":
+                writer.write_batch(batch)
+            else:
+                writer.write(batch)
+
+        self.rows_written[table] += pending
+        self.columns[table] = self._empty_columns(table)
+
+    def flush(self):
+        """Write every table's pending rows"""
+        for table in TABLE_SCHEMAS:
+            self._flush_table(table)
+
+    def close(self) -> Dict[str, str]:
+        """Flush and close all files; returns the path of each table"""
+        self.flush()
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+        # Tables without any rows still get a file with the right columns
+        for table in TABLE_SCHEMAS:
+            if self.rows_written[table] == 0:
+                if self.format == "csv":
+                    self._frame(table).to_csv(self.path_for(table), index=False)
+                elif self.format == "parquet":
+                    pq.write_table(self._arrow_schema(table).empty_table(), self.path_for(table))
+                else:
+                    with pa.ipc.new_file(self.path_for(table), self._arrow_schema(table)) as writer:
+                        pass
+        return {table: self.path_for(table) for table in TABLE_SCHEMAS}
+
+
+def export_reports(reports: Dict[str, Dict[str, Any]], directory: str, format: str = "parquet") -> Dict[str, str]:
+    """Export reports keyed by document id; returns the path of each table"""
+    exporter = ReportExporter(directory, format)
+    exporter.add_reports(reports)
+    return exporter.close()
+
+
+def load_tables(directory: str, format: str = "parquet") -> Dict[str, pd.DataFrame]:
+    """Read exported tables back as DataFrames for vectorized queries"""
+    if format != "csv" and not HAS_PYARROW:
+        format = "csv"
+    frames = {}
+    for table, schema in TABLE_SCHEMAS.items():
+        path = os.path.join(directory, f"{table}.{FILE_EXTENSIONS[format]}")
+        if format == "parquet":
+            frames[table] = pd.read_parquet(path)
+        elif format == "arrow":
+            with pa.ipc.open_file(path) as reader:
+                frames[table] = reader.read_pandas()
+        else:
+            dtypes = {column: PANDAS_DTYPES[kind] for column, kind in schema.items()}
+            frames[table] = pd.read_csv(path, dtype=dtypes)
+    return frames
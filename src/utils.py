@@ -1,19 +1,16 @@
 import re
-from typing import List, Tuple, Optional
 import unicodedata
+from typing import List, Tuple, Optional
 
 def clean_text(text: str) -> str:
-    """Clean and normalize text for analysis"""
-    # Normalize unicode characters
-    text = unicodedata.normalize('NFKD', text)
-    
-    # Replace multiple spaces with single space
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Remove leading/trailing whitespace
-    text = text.strip()
-    
-    return text
+    """Clean and normalize text for analysis
+    
+    NFKD-normalizes, collapses whitespace and strips, giving the same text
+    as `normalization.normalize_text` without building its offset map; use
+    that one when positions have to lead back to the original.
+    """
+    # Collapse before decomposing, as Normalizer does, so spaces NFKD introduces (e.g. in '¨') stay
+    return unicodedata.normalize('NFKD', ' '.join(text.split()))
 
 def extract_year(text: str) -> Optional[int]:
     """Extract year from citation text"""
@@ -5,12 +5,18 @@ import json
 from datetime import datetime
 import time
 import re
+import asyncio
+from src.http_client import RateLimitedSession, AsyncResponse, get_async_client, gather_limited, run_sync
+from src.offline_index import OfflineIndex, get_offline_index
+from src.fuzzy_match import FuzzyMatcher
+from src.bib_parsers import split_name
+from src.citation_formats import FORMATTER
 
 class WebSearcher:
     """Web search functionality for finding and verifying citations"""
     
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, offline_index: Optional[OfflineIndex] = None):
+        self.session = RateLimitedSession()
         self.session.headers.update({
             'User-Agent': 'Psyte/1.0 (Academic Citation Checker) Mozilla/5.0',
             'Accept': 'application/json',
@@ -27,36 +33,107 @@ class WebSearcher:
         self.timeout = 15  # Reduced timeout for faster response
         self.max_retries = 2  # Reduced retries
         self.retry_delay = 1  # seconds
+        self.async_client = get_async_client()
+        self.offline_index = offline_index if offline_index is not None else get_offline_index()
+        self.matcher = FuzzyMatcher()
     
     def search_for_citation(self, citation_text: str, citation_type: str = "auto") -> Dict[str, Any]:
         """Search for a citation across multiple sources"""
-        results = {
-            "found": False,
-            "sources": [],
-            "suggestions": [],
-            "missing_references": []
-        }
-        
+        return self._build_results([citation_text], [self._find_sources(citation_text)])[0]
+    
+    async def search_for_citation_async(self, citation_text: str, citation_type: str = "auto") -> Dict[str, Any]:
+        """Async variant of search_for_citation"""
+        return (await self.batch_search_async([citation_text]))[0]
+    
+    def batch_search(self, citation_texts: List[str]) -> List[Dict[str, Any]]:
+        """Search for multiple citations (lookups overlap on a single thread)"""
+        return run_sync(self.batch_search_async(citation_texts))
+    
+    async def batch_search_async(self, citation_texts: List[str]) -> List[Dict[str, Any]]:
+        """Search for multiple citations concurrently, preserving input order"""
+        found_sources = await gather_limited(self._find_sources_async(text) for text in citation_texts)
+        return self._build_results(citation_texts, found_sources)
+    
+    def _find_sources(self, citation_text: str) -> Optional[List[Dict[str, Any]]]:
+        """Candidate sources for a citation, in the search engine's order; None when the search failed"""
         # Extract key information from citation
         search_query = self._build_search_query(citation_text)
         
         if not search_query or len(search_query) < 3:
-            return results
+            return []
+        
+        # A match in the offline index saves the network round trip
+        offline_results = self._search_offline(search_query)
+        if offline_results:
+            return offline_results
         
         # Only try one search engine to speed up
         try:
             # Try CrossRef first as it's most comprehensive
-            crossref_results = self._search_crossref(search_query)
-            if crossref_results:
-                results["found"] = True
-                results["sources"].extend(crossref_results[:2])  # Limit results
-                results["suggestions"] = self._generate_suggestions(citation_text, results["sources"])
-                return results
+            return self._search_crossref(search_query)
         except:
-            pass
+            return None
+    
+    async def _find_sources_async(self, citation_text: str) -> Optional[List[Dict[str, Any]]]:
+        """Async variant of _find_sources"""
+        search_query = self._build_search_query(citation_text)
+        
+        if not search_query or len(search_query) < 3:
+            return []
+        
+        offline_results = self._search_offline(search_query)
+        if offline_results:
+            return offline_results
         
+        try:
+            return await self._search_crossref_async(search_query)
+        except:
+            return None
+    
+    def _search_offline(self, query: str) -> List[Dict[str, Any]]:
+        """Title matches from the offline index, in the form of CrossRef search results"""
+        if self.offline_index is None:
+            return []
+        results = self._parse_crossref_response({'message': {'items': self.offline_index.search_title(query)}})
+        for result in results:
+            result['source'] = 'offline_index'
         return results
     
+    def _build_results(self, citation_texts: List[str], found_sources: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Search results for many citations, ranking every citation/source pair in one batch
+        
+        Sources are ordered by how well their title, authors and year match
+        the citation rather than by the search engine's relevance, and the
+        best two are kept. A citation whose search failed (sources None) is
+        marked 'retryable', so callers don't keep it as a settled "not found".
+        """
+        pairs = []
+        for text, sources in zip(citation_texts, found_sources):
+            title_match = re.search(r'"([^"]+)"', text)
+            citation = self.matcher.prepare_citation(text, title_match.group(1) if title_match else None)
+            pairs.extend((citation, self.matcher.prepare_source(source)) for source in sources or [])
+        scores = iter(self.matcher.score_pairs(pairs))
+        
+        all_results = []
+        for text, sources in zip(citation_texts, found_sources):
+            results = {
+                "found": False,
+                "sources": [],
+                "suggestions": [],
+                "missing_references": []
+            }
+            if sources is None:
+                results["retryable"] = True
+                sources = []
+            for source in sources:
+                source['match_score'] = next(scores)
+            if sources:
+                results["found"] = True
+                results["sources"] = sorted(sources, key=lambda source: source['match_score'], reverse=True)[:2]  # Limit results
+                results["suggestions"] = self._generate_suggestions(text, results["sources"])
+            all_results.append(results)
+        return all_results
+    
     def find_missing_references(self, text: str) -> List[Dict[str, Any]]:
         """Find potential missing references in text"""
         missing_refs = []
@@ -148,7 +225,7 @@ class WebSearcher:
                 if response.status_code == 200:
                     return response
                 elif response.status_code == 429:  # Rate limited
-                    time.sleep(self.retry_delay * (attempt + 1))
+                    # The session has paused this host per Retry-After; the retry waits for it
                     continue
                 else:
                     return None
@@ -162,140 +239,240 @@ class WebSearcher:
         
         return None
     
-    def _search_crossref(self, query: str) -> List[Dict[str, Any]]:
-        """Search CrossRef API with improved error handling"""
+    async def _make_request_with_retry_async(self, url: str, params: Dict[str, Any] = None) -> Optional[AsyncResponse]:
+        """Async variant of _make_request_with_retry; backoff yields to the event loop"""
+        for attempt in range(self.max_retries):
+            try:
+                response = await self.async_client.get(
+                    url,
+                    params=params,
+                    headers=dict(self.session.headers),
+                    timeout=self.timeout
+                )
+                if response.status_code == 200:
+                    return response
+                elif response.status_code == 429:  # Rate limited
+                    # The client has paused this host per Retry-After; the retry waits for it
+                    continue
+                else:
+                    return None
+                    
+            except requests.exceptions.Timeout:
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(self.retry_delay)
+                continue
+            except Exception:
+                return None
+        
+        return None
+    
+    def _crossref_params(self, query: str) -> Dict[str, Any]:
+        """Query parameters for a CrossRef search"""
+        return {
+            'query': query,
+            'rows': 3,  # Reduced from 5
+            'select': 'DOI,title,author,published-print,container-title'
+        }
+    
+    def _search_crossref(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """Search CrossRef API; None when the request fails, so callers can tell it from no results"""
         if not query:
             return []
             
         try:
-            params = {
-                'query': query,
-                'rows': 3,  # Reduced from 5
-                'select': 'DOI,title,author,published-print,container-title'
-            }
-            
             # Quick timeout for faster response
             response = self.session.get(
                 self.search_engines['crossref'],
-                params=params,
+                params=self._crossref_params(query),
                 timeout=self.timeout  # Uses self.timeout (15 seconds)
             )
             
             if response and response.status_code == 200:
-                data = response.json()
-                items = data.get('message', {}).get('items', [])
-                
-                results = []
-                for item in items[:2]:  # Only top 2 results
-                    result = {
-                        'source': 'crossref',
-                        'title': item.get('title', [''])[0],
-                        'authors': self._format_crossref_authors(item.get('author', [])),
-                        'year': self._extract_year_from_date(item.get('published-print')),
-                        'journal': item.get('container-title', [''])[0],
-                        'doi': item.get('DOI')
-                    }
-                    results.append(result)
-                
-                return results
+                return self._parse_crossref_response(response.json())
         except requests.exceptions.Timeout:
             print(f"CrossRef timeout after {self.timeout} seconds")
         except Exception as e:
             print(f"CrossRef search error: {e}")
         
-        return []
+        return None
     
-    def _search_arxiv(self, query: str) -> List[Dict[str, Any]]:
-        """Search arXiv API"""
+    async def _search_crossref_async(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """Async variant of _search_crossref"""
         if not query:
             return []
             
         try:
-            params = {
-                'search_query': f'all:{query}',
-                'start': 0,
-                'max_results': 3
+            response = await self.async_client.get(
+                self.search_engines['crossref'],
+                params=self._crossref_params(query),
+                headers=dict(self.session.headers),
+                timeout=self.timeout
+            )
+            
+            if response and response.status_code == 200:
+                return self._parse_crossref_response(response.json())
+        except requests.exceptions.Timeout:
+            print(f"CrossRef timeout after {self.timeout} seconds")
+        except Exception as e:
+            print(f"CrossRef search error: {e}")
+        
+        return None
+    
+    def _parse_crossref_response(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Parse a CrossRef search response into result dicts"""
+        items = data.get('message', {}).get('items', [])
+        
+        results = []
+        for item in items:  # Ranked against the citation afterwards
+            result = {
+                'source': 'crossref',
+                'title': item.get('title', [''])[0],
+                'authors': self._format_crossref_authors(item.get('author', [])),
+                'year': self._extract_year_from_date(item.get('published-print')),
+                'journal': item.get('container-title', [''])[0],
+                'doi': item.get('DOI')
             }
+            results.append(result)
+        
+        return results
+    
+    def _arxiv_params(self, query: str) -> Dict[str, Any]:
+        """Query parameters for an arXiv search"""
+        return {
+            'search_query': f'all:{query}',
+            'start': 0,
+            'max_results': 3
+        }
+    
+    def _search_arxiv(self, query: str) -> List[Dict[str, Any]]:
+        """Search arXiv API"""
+        if not query:
+            return []
             
+        try:
             response = self._make_request_with_retry(
                 self.search_engines['arxiv'],
-                params=params
+                params=self._arxiv_params(query)
             )
             
             if response and response.status_code == 200:
-                # Parse XML response
-                import xml.etree.ElementTree as ET
-                root = ET.fromstring(response.content)
-                
-                results = []
-                ns = {'atom': 'http://www.w3.org/2005/Atom'}
-                
-                for entry in root.findall('atom:entry', ns):
-                    title_elem = entry.find('atom:title', ns)
-                    if title_elem is not None:
-                        title = title_elem.text.strip()
-                        authors = [author.find('atom:name', ns).text for author in entry.findall('atom:author', ns) if author.find('atom:name', ns) is not None]
-                        published_elem = entry.find('atom:published', ns)
-                        year = published_elem.text.split('-')[0] if published_elem is not None else None
-                        id_elem = entry.find('atom:id', ns)
-                        arxiv_id = id_elem.text.split('/')[-1] if id_elem is not None else None
-                        
-                        result = {
-                            'source': 'arxiv',
-                            'title': title,
-                            'authors': authors,
-                            'year': year,
-                            'arxiv_id': arxiv_id,
-                            'url': f'https://arxiv.org/abs/{arxiv_id}' if arxiv_id else None
-                        }
-                        results.append(result)
-                
-                return results
+                return self._parse_arxiv_response(response.content)
         except Exception as e:
             print(f"arXiv search error: {e}")
         
         return []
     
+    async def _search_arxiv_async(self, query: str) -> List[Dict[str, Any]]:
+        """Async variant of _search_arxiv"""
+        if not query:
+            return []
+            
+        try:
+            response = await self._make_request_with_retry_async(
+                self.search_engines['arxiv'],
+                params=self._arxiv_params(query)
+            )
+            
+            if response and response.status_code == 200:
+                return self._parse_arxiv_response(response.content)
+        except Exception as e:
+            print(f"arXiv search error: {e}")
+        
+        return []
+    
+    def _parse_arxiv_response(self, content: bytes) -> List[Dict[str, Any]]:
+        """Parse an arXiv Atom feed into result dicts"""
+        import xml.etree.ElementTree as ET
+        root = ET.fromstring(content)
+        
+        results = []
+        ns = {'atom': 'http://www.w3.org/2005/Atom'}
+        
+        for entry in root.findall('atom:entry', ns):
+            title_elem = entry.find('atom:title', ns)
+            if title_elem is not None:
+                title = title_elem.text.strip()
+                authors = [author.find('atom:name', ns).text for author in entry.findall('atom:author', ns) if author.find('atom:name', ns) is not None]
+                published_elem = entry.find('atom:published', ns)
+                year = published_elem.text.split('-')[0] if published_elem is not None else None
+                id_elem = entry.find('atom:id', ns)
+                arxiv_id = id_elem.text.split('/')[-1] if id_elem is not None else None
+                
+                result = {
+                    'source': 'arxiv',
+                    'title': title,
+                    'authors': authors,
+                    'year': year,
+                    'arxiv_id': arxiv_id,
+                    'url': f'https://arxiv.org/abs/{arxiv_id}' if arxiv_id else None
+                }
+                results.append(result)
+        
+        return results
+    
+    def _semantic_scholar_params(self, query: str) -> Dict[str, Any]:
+        """Query parameters for a Semantic Scholar search"""
+        return {
+            'query': query,
+            'limit': 3,
+            'fields': 'title,authors,year,venue,doi,url'
+        }
+    
     def _search_semantic_scholar(self, query: str) -> List[Dict[str, Any]]:
         """Search Semantic Scholar API"""
         if not query:
             return []
             
         try:
-            params = {
-                'query': query,
-                'limit': 3,
-                'fields': 'title,authors,year,venue,doi,url'
-            }
-            
             response = self._make_request_with_retry(
                 self.search_engines['semantic_scholar'],
-                params=params
+                params=self._semantic_scholar_params(query)
             )
             
             if response and response.status_code == 200:
-                data = response.json()
-                papers = data.get('data', [])
-                
-                results = []
-                for paper in papers:
-                    result = {
-                        'source': 'semantic_scholar',
-                        'title': paper.get('title'),
-                        'authors': [author.get('name', '') for author in paper.get('authors', [])],
-                        'year': paper.get('year'),
-                        'venue': paper.get('venue'),
-                        'doi': paper.get('doi'),
-                        'url': paper.get('url')
-                    }
-                    results.append(result)
-                
-                return results
+                return self._parse_semantic_scholar_response(response.json())
+        except Exception as e:
+            print(f"Semantic Scholar search error: {e}")
+        
+        return []
+    
+    async def _search_semantic_scholar_async(self, query: str) -> List[Dict[str, Any]]:
+        """Async variant of _search_semantic_scholar"""
+        if not query:
+            return []
+            
+        try:
+            response = await self._make_request_with_retry_async(
+                self.search_engines['semantic_scholar'],
+                params=self._semantic_scholar_params(query)
+            )
+            
+            if response and response.status_code == 200:
+                return self._parse_semantic_scholar_response(response.json())
         except Exception as e:
             print(f"Semantic Scholar search error: {e}")
         
         return []
     
+    def _parse_semantic_scholar_response(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Parse a Semantic Scholar search response into result dicts"""
+        papers = data.get('data', [])
+        
+        results = []
+        for paper in papers:
+            result = {
+                'source': 'semantic_scholar',
+                'title': paper.get('title'),
+                'authors': [author.get('name', '') for author in paper.get('authors', [])],
+                'year': paper.get('year'),
+                'venue': paper.get('venue'),
+                'doi': paper.get('doi'),
+                'url': paper.get('url')
+            }
+            results.append(result)
+        
+        return results
+    
     def _format_crossref_authors(self, authors: List[Dict]) -> List[str]:
         """Format CrossRef author data"""
         formatted = []
@@ -341,43 +518,16 @@ class WebSearcher:
         return suggestions
     
     def format_as_citation(self, source: Dict[str, Any], style: str = "apa") -> str:
-        """Format found source as a proper citation"""
-        if style.lower() == "apa":
-            # APA format
-            authors = source.get('authors', [])
-            if authors:
-                if len(authors) == 1:
-                    author_str = f"{authors[0].split()[-1]}, {authors[0].split()[0][0]}."
-                elif len(authors) == 2:
-                    author_str = f"{authors[0].split()[-1]}, {authors[0].split()[0][0]}., & {authors[1].split()[-1]}, {authors[1].split()[0][0]}."
-                else:
-                    author_str = f"{authors[0].split()[-1]}, {authors[0].split()[0][0]}., et al."
-            else:
-                author_str = "Unknown Author"
-            
-            year = source.get('year', 'n.d.')
-            title = source.get('title', 'Unknown Title')
-            journal = source.get('journal', source.get('venue', ''))
-            volume = source.get('volume', '')
-            issue = source.get('issue', '')
-            pages = source.get('pages', '')
-            doi = source.get('doi', '')
-            
-            citation = f"{author_str} ({year}). {title}."
-            if journal:
-                citation += f" {journal}"
-                if volume:
-                    citation += f", {volume}"
-                    if issue:
-                        citation += f"({issue})"
-                if pages:
-                    citation += f", {pages}"
-            citation += "."
-            
-            if doi:
-                citation += f" https://doi.org/{doi}"
-            
-            return citation
-        
-        # Add other citation styles as needed
-        return str(source)
\ No newline at end of file
+        """Format found source as a proper citation in any built-in or CSL style"""
+        record = {
+            'title': source.get('title', ''),
+            'authors': [split_name(name) for name in source.get('authors') or [] if name],
+            'date': {'year': source.get('year')},
+            'journal': source.get('journal') or source.get('venue'),
+            'volume': source.get('volume', ''),
+            'issue': source.get('issue', ''),
+            'pages': source.get('pages', ''),
+            'doi': source.get('doi', ''),
+            'url': source.get('url', ''),
+        }
+        return FORMATTER.format(record, style)
\ No newline at end of file
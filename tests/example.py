@@ -1,7 +1,41 @@
 import pytest
-from src.citation_analyzer import Citation, CitationAnalyzer
-from src.ai_providers import MockProvider
-from src.utils import extract_year, extract_doi, validate_isbn
+from src.citation_analyzer import Citation, CitationAnalyzer, CitationTable
+from src import ai_providers, circuit_breaker, quota_scheduler
+from src.ai_providers import AIProvider, MockProvider, GeminiProvider
+from src.utils import extract_year, extract_doi, validate_isbn, clean_text
+from src.rate_limiter import TokenBucket, parse_retry_after
+from src.quota_scheduler import QuotaScheduler
+from src.model_balancer import ModelLoadBalancer
+from src.circuit_breaker import CircuitBreaker
+from src.citation_rules import CitationRuleEngine, measure_coverage
+from src.report_export import ReportExporter, load_tables
+from src.report_aggregate import ReportAggregate
+from src.file_handlers import FileHandler, decode_bytes
+from src.extraction_cache import ExtractionCache
+from src.mapped_text import MappedText
+from src.normalization import normalize_text
+from src.bib_parsers import parse_bibtex, parse_ris
+from src.bibliography import BibliographyIndex
+from src.offline_index import OfflineIndex
+from src.doi_validator import DOIValidator
+from src.citation_formats import CitationFormatter
+from src.csl_styles import CSLStyleLibrary
+from config.settings import CSL_STYLES_DIR, CROSSREF_WORK_FIELDS
+from src.mcp_server import MCPServer
+from src.web_searcher import WebSearcher
+from src import http_client
+from src.http_client import AsyncHTTPClient, gather_limited, run_sync
+from src.rate_limiter import HostRateLimiter
+from src.fuzzy_match import FuzzyMatcher
+import asyncio
+import io
+import json
+import os
+import unicodedata
+import PyPDF2
+import docx
+import zipfile
+import requests
 
 class TestCitation:
     """Test the Citation class"""
@@ -18,8 +52,8 @@ class TestCitation:
         assert citation.style == "apa"
         assert citation.position == 0
         assert citation.is_valid is None
-        assert citation.issues == []
-        assert citation.suggestions == []
+        assert citation.issues == ()
+        assert citation.suggestions == ()
     
     def test_citation_to_dict(self):
         """Test converting citation to dictionary"""
@@ -34,6 +68,78 @@ class TestCitation:
         assert result["position"] == 10
         assert result["is_valid"] is True
         assert result["confidence_score"] == 0.95
+    
+    def test_citation_table_round_trip(self):
+        """Columnar rows render the same dicts as the citation objects"""
+        source = "See (Smith, 2020) and [3]."
+        first = Citation("(Smith, 2020)", "apa", 4)
+        first.is_valid = True
+        first.confidence_score = 0.9
+        second = Citation("[3]", "ieee", 22)
+        second.is_valid = False
+        second.issues = ("Missing reference",)
+        
+        table = CitationTable.from_citations([first, second], source)
+        
+        assert table.texts == {}
+        assert list(table.iter_dicts()) == [first.to_dict(), second.to_dict()]
+        assert ReportAggregate.from_table(table).issues == {"Missing reference": 1}
+    
+    def test_citation_table_renders_every_field(self):
+        """Sparse fields render like Citation.to_dict, and style codes go past 256 labels"""
+        citations = []
+        for number in range(300):
+            citation = Citation(f"[{number}]", f"csl-style-{number}", number)
+            citation.is_valid = number % 2 == 0
+            citations.append(citation)
+        full = citations[-1]
+        full.model_used, full.degraded, full.tier, full.references = "rules", True, "rules", ("smith2020",)
+        full.doi, full.doi_valid, full.doi_data = "10.1234/x", True, {"title": "X"}
+        citations[-2].doi = "10.1234/missing"
+        
+        table = CitationTable.from_citations(citations)
+        
+        assert list(table.iter_dicts()) == [citation.to_dict() for citation in citations]
+        assert len(table.styles) == 300
+
+class TestReportAggregate:
+    """Test single-pass, mergeable summary statistics"""
+    
+    def _table(self, rows):
+        citations = []
+        for position, (style, is_valid, confidence, issues) in enumerate(rows):
+            citation = Citation(f"c{position}", style, position)
+            citation.is_valid = is_valid
+            citation.confidence_score = confidence
+            citation.issues = issues
+            citations.append(citation)
+        return CitationTable.from_citations(citations)
+    
+    def test_per_style_breakdown(self):
+        """Validity counts and confidence are broken down by style"""
+        aggregate = ReportAggregate.from_table(self._table([
+            ("apa", True, 0.9, ()),
+            ("apa", False, 0.5, ("Missing year",)),
+            ("ieee", None, 0.0, ("Format: bad",)),
+        ]))
+        
+        styles = aggregate.style_breakdown()
+        assert styles["apa"]["valid"] == 1 and styles["apa"]["invalid"] == 1
+        assert styles["apa"]["average_confidence"] == pytest.approx(0.7)
+        assert styles["ieee"]["uncertain"] == 1
+        assert aggregate.issue_types == {"Missing year": 1, "Format": 1}
+    
+    def test_merge_matches_combined_document(self):
+        """Merging per-document aggregates equals aggregating everything at once"""
+        first = [("apa", True, 0.9, ()), ("mla", False, 0.4, ("Missing page number",))]
+        second = [("apa", None, 0.0, ("Missing page number",))]
+        
+        merged = ReportAggregate.from_table(self._table(first)) + ReportAggregate.from_table(self._table(second))
+        combined = ReportAggregate.from_table(self._table(first + second))
+        
+        assert merged.summary() == combined.summary()
+        assert merged.documents == 2
+        assert ReportAggregate.from_summary(merged.summary()).summary() == merged.summary()
 
 class TestCitationAnalyzer:
     """Test the CitationAnalyzer class"""
@@ -92,6 +198,75 @@ class TestCitationAnalyzer:
         style = analyzer._detect_citation_style(apa_citations)
         assert style == "apa"
     
+    def test_repeated_citations_analyzed_once(self, analyzer):
+        """Identical citations share one analysis but keep their own positions"""
+        text = "First (Vaswani, 2017). Again (Vaswani,  2017). Also (Smith, 2020)."
+        
+        results = analyzer.analyze(text)
+        
+        assert results["summary"]["total_citations"] == 3
+        assert results["summary"]["unique_citations"] == 2
+        repeated = [c for c in results["citations"] if "Vaswani" in c["text"]]
+        assert repeated[0]["position"] != repeated[1]["position"]
+        assert repeated[0]["is_valid"] == repeated[1]["is_valid"]
+    
+    def test_incremental_reanalysis(self):
+        """After an edit only the new citation is analyzed; others are shifted and reused"""
+        analyzer = CitationAnalyzer(api_provider="mock", enable_web_search=False)
+        text = "Intro (Smith, 2020) text.\n" + "Filler line.\n" * 50 + "End (Jones, 2019) and (Lee, 2018)."
+        analyzer.analyze(text)
+        
+        edited = "Intro (Smith and Brown, 2020) extra text.\n" + text.split("\n", 1)[1]
+        results = analyzer.analyze(edited)
+        
+        assert analyzer.tier_stats['rules']['calls'] == 1
+        assert [c["text"] for c in results["citations"]] == ["(Smith and Brown, 2020)", "(Jones, 2019)", "(Lee, 2018)"]
+        assert [c["position"] for c in results["citations"]] == [c.position for c in analyzer._extract_citations(edited)]
+    
+    def test_documents_share_citation_analysis(self, monkeypatch):
+        """Citations repeated across documents are analyzed once and reported as shared"""
+        analyzer = CitationAnalyzer(api_provider="mock", enable_web_search=False)
+        analyzed = []
+        original = CitationAnalyzer._analyze_single_citation
+        monkeypatch.setattr(CitationAnalyzer, "_analyze_single_citation",
+                            lambda self, citation, style: analyzed.append(citation.text) or original(self, citation, style))
+        documents = {
+            "a.txt": "First (Smith, 2020) and (Jones, 2019).",
+            "b.txt": "Second (Smith, 2020) then (Smith,  2020) again.",
+            "c.txt": "Third (Lee, 2018) and (Jones, 2019).",
+        }
+        
+        results = analyzer.analyze_documents(documents)
+        
+        assert sorted(analyzed) == ["(Jones, 2019)", "(Lee, 2018)", "(Smith, 2020)"]
+        assert results["documents"]["b.txt"]["summary"]["total_citations"] == 2
+        assert results["summary"]["documents"] == 3
+        assert results["summary"]["total_citations"] == 6
+        assert results["summary"]["unique_citations"] == 3
+        assert results["summary"]["per_document_unique_citations"] == 5
+        assert "analysis_tiers" not in results["documents"]["b.txt"]["summary"]
+        assert results["summary"]["analysis_tiers"]["rules"]["resolved"] == 3
+        shared = {entry["text"]: entry for entry in results["shared_citations"]}
+        assert sorted(shared) == ["(Jones, 2019)", "(Smith, 2020)"]
+        assert shared["(Smith, 2020)"]["documents"] == ["a.txt", "b.txt"]
+        assert shared["(Smith, 2020)"]["occurrences"] == 3
+    
+    def test_mapped_file_matches_in_memory(self, analyzer, tmp_path):
+        """A file scanned in windows yields the same citations as extracting from its text"""
+        text = "Café (Smith, 2020) and Müller (2019).\n" * 300 + "[1] and [2–3].\n"
+        path = tmp_path / "dump.txt"
+        path.write_bytes(text.encode("utf-8"))
+        
+        with MappedText(str(path), window_bytes=512) as document:
+            found, _ = document.extract_citations(analyzer.CITATION_PATTERNS)
+            assert document.char_count == len(text)
+            assert document.word_count == len(text.split())
+        assert found == [(c.position, c.text, c.style) for c in analyzer._extract_citations(text)]
+        
+        report = analyzer.analyze_path(str(path))
+        assert report["summary"]["total_citations"] == len(found)
+        assert report["citations"][0]["context"].startswith("Café (Smith, 2020)")
+    
     def test_empty_citations(self, analyzer):
         """Test handling empty citation list"""
         style = analyzer._detect_citation_style([])
@@ -125,6 +300,846 @@ class TestUtilityFunctions:
         # Invalid format
         assert validate_isbn("not-an-isbn") is False
 
+class TestRateLimiter:
+    """Test the per-host token bucket"""
+    
+    def test_burst_then_spacing(self):
+        """Requests beyond the burst are spaced at the configured rate"""
+        now = [0.0]
+        bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0])
+        
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.5)
+        assert bucket.reserve() == pytest.approx(1.0)
+    
+    def test_pause_honours_retry_after(self):
+        """A Retry-After pause delays the next request by that many seconds"""
+        now = [0.0]
+        bucket = TokenBucket(rate=1, burst=5, clock=lambda: now[0])
+        
+        bucket.pause(parse_retry_after("3"))
+        assert bucket.reserve() == pytest.approx(3.0)
+        
+        now[0] = 10.0
+        assert bucket.reserve() == 0
+
+class FallbackSession:
+    """Stand-in for the requests.Session used when httpx is not installed"""
+    def __init__(self):
+        self.calls = []
+    
+    def get(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response._content = b'{"ok": true}'
+        return response
+
+class TestHTTPClient:
+    """Test the shared asyncio HTTP client and its helpers"""
+    
+    def make_client(self):
+        return AsyncHTTPClient(rate_limiter=HostRateLimiter({}, {'rate': 1e6, 'burst': 1e6}))
+    
+    def test_timeout_raises_requests_timeout(self):
+        """An httpx timeout surfaces as requests.exceptions.Timeout"""
+        httpx = pytest.importorskip('httpx')
+        if not http_client.HAS_HTTPX:
+            pytest.skip("httpx path disabled")
+        client = self.make_client()
+        
+        def timeout(request):
+            raise httpx.ReadTimeout("read timed out", request=request)
+        
+        async def fetch():
+            client._clients[asyncio.get_running_loop()] = httpx.AsyncClient(transport=httpx.MockTransport(timeout))
+            try:
+                await client.get('https://api.example.org/works', params={'rows': 1, 'query': None})
+            finally:
+                await client.aclose()
+        
+        with pytest.raises(requests.exceptions.Timeout):
+            asyncio.run(fetch())
+    
+    def test_thread_fallback_without_httpx(self, monkeypatch):
+        """Without httpx requests run on a worker thread and None params are dropped"""
+        monkeypatch.setattr(http_client, 'HAS_HTTPX', False)
+        client = self.make_client()
+        client._fallback_session = FallbackSession()
+        
+        response = asyncio.run(client.get('https://api.example.org/works', params={'rows': 1, 'query': None}))
+        
+        assert response.status_code == 200
+        assert response.json() == {'ok': True}
+        url, kwargs = client._fallback_session.calls[0]
+        assert url == 'https://api.example.org/works'
+        assert kwargs['params'] == {'rows': 1}
+        assert kwargs['timeout'] == client.timeout
+    
+    def test_gather_limited_keeps_order_and_limit(self):
+        """Results come back in input order with at most `limit` coroutines in flight"""
+        in_flight = [0, 0]
+        
+        async def job(number):
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+            await asyncio.sleep(0.001 * (10 - number))
+            in_flight[0] -= 1
+            return number
+        
+        results = asyncio.run(gather_limited((job(number) for number in range(10)), limit=3))
+        
+        assert results == list(range(10))
+        assert in_flight[1] == 3
+    
+    def test_run_sync_reuses_loop(self):
+        """run_sync works inside a running loop and always uses the same background loop"""
+        async def current_loop():
+            return asyncio.get_running_loop()
+        
+        async def caller():
+            return run_sync(current_loop())
+        
+        first = run_sync(current_loop())
+        inside = asyncio.run(caller())
+        
+        assert inside is first
+        assert run_sync(current_loop()) is first
+        assert not first.is_closed()
+
+class TestQuotaScheduler:
+    """Test per-model RPM/TPM scheduling"""
+    
+    def test_routes_to_model_with_headroom(self):
+        """Requests overflow to the next model instead of exceeding a quota"""
+        now = [0.0]
+        scheduler = QuotaScheduler(
+            [{'name': 'small', 'rpm': 2, 'tpm': 1000}, {'name': 'big', 'rpm': 10, 'tpm': 1000}],
+            clock=lambda: now[0]
+        )
+        
+        assert scheduler.acquire(['small', 'big'], 100) == 'small'
+        assert scheduler.acquire(['small', 'big'], 100) == 'small'
+        assert scheduler.acquire(['small', 'big'], 100) == 'big'
+        assert scheduler.acquire(['small', 'big'], 950, timeout=0) is None  # over big's token quota
+        assert scheduler.utilization()['small']['requests'] == 2
+    
+    def test_waits_for_window_to_free(self):
+        """With no headroom anywhere the scheduler waits for the oldest request to expire"""
+        now = [0.0]
+        slept = []
+        
+        def sleep(seconds):
+            slept.append(seconds)
+            now[0] += seconds
+        
+        scheduler = QuotaScheduler([{'name': 'only', 'rpm': 1, 'tpm': 1000}], clock=lambda: now[0], sleep=sleep)
+        scheduler.acquire(['only'], 10)
+        now[0] = 15.0
+        
+        assert scheduler.acquire(['only'], 10) == 'only'
+        assert slept == [pytest.approx(45.0)]
+        assert scheduler.acquire(['only'], 10, timeout=5) is None
+    
+    def test_release_and_wait_time(self):
+        """An unused reservation is given back and the wait reflects the real quota"""
+        now = [0.0]
+        scheduler = QuotaScheduler([{'name': 'only', 'rpm': 1, 'tpm': 1000}], clock=lambda: now[0])
+        
+        assert scheduler.acquire(['only'], 10) == 'only'
+        now[0] = 20.0
+        assert scheduler.wait_time(['only'], 10) == pytest.approx(40.0)
+        
+        scheduler.release('only', 10)
+        assert scheduler.wait_time(['only'], 10) == 0
+        assert scheduler.utilization()['only']['tokens'] == 0
+
+class TestModelLoadBalancer:
+    """Test preset load balancing"""
+    
+    def test_faster_model_gets_more_traffic(self):
+        """Every preset model gets requests, weighted towards the faster one"""
+        scheduler = QuotaScheduler([{'name': 'fast'}, {'name': 'slow'}])
+        balancer = ModelLoadBalancer(['fast', 'slow'], scheduler)
+        balancer.record_latency('fast', 0.5)
+        balancer.record_latency('slow', 1.5)
+        
+        picks = [balancer.order()[0] for _ in range(8)]
+        
+        assert picks.count('fast') == 6
+        assert picks.count('slow') == 2
+        assert balancer.order(exclude=['fast']) == ['slow']
+
+class TestCircuitBreaker:
+    """Test the per-model circuit breaker"""
+    
+    def test_half_open_allows_single_probe(self):
+        """After the cooldown exactly one probe is let through"""
+        now = [0.0]
+        breaker = CircuitBreaker(cooldown=10, max_cooldown=40, clock=lambda: now[0])
+        
+        breaker.record_failure()
+        assert not breaker.allow_request()
+        assert breaker.retry_after() == 10
+        
+        now[0] = 10.0
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+        
+        # A failed probe re-opens with a doubled cooldown
+        breaker.record_failure()
+        assert breaker.retry_after() == 20
+        
+        now[0] = 30.0
+        assert breaker.allow_request()
+        breaker.record_success()
+        assert breaker.current_state() == CircuitBreaker.CLOSED
+
+class FakeGenerativeModel:
+    """Stand-in for genai.GenerativeModel that answers every prompt and records it"""
+    calls = []
+    
+    def __init__(self, model_name, generation_config=None):
+        self.model_name = model_name
+    
+    def generate_content(self, prompt):
+        FakeGenerativeModel.calls.append(self.model_name)
+        return type("Response", (), {"text": '{"is_valid": true, "confidence_score": 0.9, "issues": [], "suggestions": []}'})()
+
+class TestGeminiProvider:
+    """Test model routing in the Gemini provider without calling the API"""
+    
+    @pytest.fixture
+    def fake_genai(self, monkeypatch):
+        monkeypatch.setattr(circuit_breaker, "_breakers", {})
+        monkeypatch.setattr(quota_scheduler, "_shared_scheduler", None)
+        monkeypatch.setattr(ai_providers.genai, "GenerativeModel", FakeGenerativeModel)
+        monkeypatch.setattr(ai_providers.genai, "configure", lambda api_key: None)
+        monkeypatch.setattr(FakeGenerativeModel, "calls", [])
+    
+    def test_requests_do_not_switch_current_model(self, fake_genai):
+        """A request routed to another tier's model leaves the provider's current model alone"""
+        provider = GeminiProvider(api_key="test-key")
+        current = provider.model_name
+        
+        result = json.loads(provider.analyze_citation("(Smith, 2020)", models=["gemma-3-1b-it"]))
+        
+        assert result["model_used"] == "gemma-3-1b-it"
+        assert provider.model_name == current != "gemma-3-1b-it"
+        assert FakeGenerativeModel.calls == [current, "gemma-3-1b-it"]
+    
+    def test_providers_share_quota_scheduler(self, fake_genai):
+        """Every provider instance draws on the same per-minute quotas, like the breakers"""
+        first = GeminiProvider(api_key="test-key")
+        second = GeminiProvider(api_key="test-key")
+        
+        assert first.quota_scheduler is second.quota_scheduler
+    
+    def test_open_circuits_fail_fast(self, fake_genai):
+        """With every model's breaker open, analysis degrades without calling the API"""
+        for model_config in GeminiProvider.AVAILABLE_MODELS:
+            circuit_breaker.get_breaker(model_config['name']).record_failure()
+        
+        provider = GeminiProvider(api_key="test-key")
+        result = json.loads(provider.analyze_citation("(Smith, 2020)"))
+        
+        assert result["degraded"] is True
+        assert FakeGenerativeModel.calls == []
+
+class TestCitationRules:
+    """Test the rule-based validation engine"""
+    
+    def test_names_with_particles_and_diacritics(self):
+        """Names that used to fall through to the AI are handled locally"""
+        engine = CitationRuleEngine()
+        
+        for text in ["(O'Neil, 2020)", "(van der Berg et al., 2019a)", "(Smith-Jones & Müller, 2018, p. 12)", "(García, n.d.)"]:
+            assert engine.evaluate(text, 'apa').is_valid
+    
+    def test_known_mistake_gets_fix(self):
+        """Known mistakes produce an issue and a corrected citation"""
+        verdict = CitationRuleEngine().evaluate("(Smith and Jones, 2020)", 'apa')
+        
+        assert verdict.is_valid is False
+        assert verdict.issues
+        assert verdict.suggestions == ["Change to: (Smith & Jones, 2020)"]
+    
+    def test_years_are_not_mla_pages(self):
+        """A year in parentheses is never read as an MLA page number"""
+        engine = CitationRuleEngine()
+        
+        assert engine.evaluate("(2020)", 'apa') is None
+        assert engine.evaluate("(2020)", 'mla') is None
+        assert engine.evaluate("(45)", 'mla').rule == 'mla_page_only'
+        assert engine.evaluate("(Smith, 2020)", 'mla').is_valid
+        assert engine.evaluate("(Smith, 45)", 'mla').rule == 'mla_comma_before_page'
+    
+    def test_document_style_mistake_not_excused_by_other_style(self):
+        """(Smith 2020) in an APA document is the missing-comma mistake, whatever style it was detected as"""
+        engine = CitationRuleEngine()
+        
+        for detected in ('mla', 'harvard', 'apa'):
+            verdict = engine.evaluate("(Smith 2020)", detected, 'apa')
+            assert verdict.is_valid is False
+            assert verdict.rule == 'apa_missing_comma'
+        assert engine.evaluate("(Smith 2020)", 'mla', 'mla').style == 'chicago'  # not an MLA page number
+        
+        analyzer = CitationAnalyzer(api_provider="mock", enable_web_search=False)
+        citation = analyzer._analyze_single_citation(Citation("(Smith 2020)", "mla"), "apa")
+        assert citation.is_valid is False and citation.tier == 'rules'
+    
+    def test_coverage_on_labelled_corpus(self):
+        """Rules decide most of the corpus and never contradict its labels"""
+        with open(os.path.join(os.path.dirname(__file__), 'citation_corpus.json'), encoding='utf-8') as f:
+            corpus = json.load(f)
+        
+        coverage = measure_coverage(CitationRuleEngine(), corpus)
+        
+        assert coverage['coverage'] >= 0.85
+        assert coverage['accuracy'] == 1.0
+
+class TieredProvider(AIProvider):
+    """Provider that is unsure on the small tier and confident on the large one"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def analyze_citation(self, prompt, models=None):
+        self.calls.append(models)
+        confident = models == ['large-model']
+        return json.dumps({
+            "is_valid": True,
+            "confidence_score": 0.95 if confident else 0.4,
+            "issues": [],
+            "suggestions": [],
+            "model_used": models[0]
+        })
+    
+    def check_connection(self):
+        return True
+
+class TestTieredAnalysis:
+    """Test the rules -> small model -> large model pipeline"""
+    
+    def test_escalates_only_below_threshold(self):
+        """Rule-settled citations never reach a model; unsure answers are escalated"""
+        analyzer = CitationAnalyzer(api_provider="mock", enable_web_search=False, confidence_threshold=0.7,
+                                    analysis_tiers={'small': ['small-model'], 'large': ['large-model']})
+        analyzer.api_provider = TieredProvider()
+        
+        ruled = analyzer._analyze_single_citation(Citation("(O'Neil, 2020)", "apa"), "apa")
+        assert ruled.tier == 'rules'
+        assert analyzer.api_provider.calls == []
+        
+        ambiguous = analyzer._analyze_single_citation(Citation("(see Smith, 2020)", "apa"), "apa")
+        assert ambiguous.tier == 'large'
+        assert ambiguous.model_used == 'large-model'
+        assert analyzer.api_provider.calls == [['small-model'], ['large-model']]
+        
+        summary = analyzer._tier_summary([ruled, ambiguous])
+        assert summary['small']['calls'] == 1
+        assert summary['large']['resolved'] == 1
+
+class RecoveringProvider(AIProvider):
+    """Provider whose models are rate limited until `available` is set"""
+    
+    def __init__(self):
+        self.available = False
+        self.calls = 0
+    
+    def analyze_citation(self, prompt, models=None):
+        self.calls += 1
+        if not self.available:
+            return json.dumps({"is_valid": None, "confidence_score": 0.0, "issues": [], "suggestions": [],
+                               "model_used": None, "degraded": True, "retry_after": 30})
+        return json.dumps({"is_valid": True, "confidence_score": 0.95, "issues": [], "suggestions": [],
+                           "model_used": "recovered-model"})
+    
+    def check_connection(self):
+        return True
+
+class TestRerunCaches:
+    """Test that results reused between runs are only the settled ones"""
+    
+    def test_degraded_verdicts_are_retried(self):
+        """A rules-only verdict from a rate-limited run is re-analyzed once the models recover"""
+        analyzer = CitationAnalyzer(api_provider="mock", enable_web_search=False)
+        provider = analyzer.api_provider = RecoveringProvider()
+        
+        def analyze():
+            citations = {('apa', 'see smith 2020'): Citation("(see Smith, 2020)", "apa")}
+            analyzer._analyze_unique(citations)
+            return citations[('apa', 'see smith 2020')]
+        
+        assert analyze().degraded
+        
+        provider.available = True
+        recovered = analyze()
+        assert not recovered.degraded
+        assert recovered.model_used == 'recovered-model'
+        
+        calls = provider.calls
+        assert analyze().model_used == 'recovered-model'
+        assert provider.calls == calls
+    
+    def test_failed_doi_lookups_are_retried(self):
+        """Timeouts are looked up again on the next run; settled lookups are not"""
+        analyzer = CitationAnalyzer(api_provider="mock", enable_web_search=False)
+        lookups = []
+        
+        def batch_validate(dois, include_extras=False):
+            lookups.append(list(dois))
+            if len(lookups) == 1:
+                return [analyzer.doi_validator._timeout_result(doi) for doi in dois]
+            return [{'success': True, 'doi': doi, 'data': {'title': 'Found'}} for doi in dois]
+        
+        analyzer.doi_validator.batch_validate = batch_validate
+        citations = [Citation("Smith 2020 doi:10.1234/abc.def online", "apa")]
+        
+        assert analyzer._validate_citation_dois(citations)['valid_dois'] == 0
+        assert analyzer._validate_citation_dois(citations)['valid_dois'] == 1
+        assert analyzer._validate_citation_dois(citations)['valid_dois'] == 1
+        assert lookups == [['10.1234/abc.def'], ['10.1234/abc.def']]
+
+    def test_failed_web_searches_are_retried(self):
+        """A search that failed on the network is tried again next run; a found source is reused"""
+        analyzer = CitationAnalyzer(api_provider="mock")
+        analyzer.web_searcher.find_missing_references = lambda text: []
+        searches = []
+        
+        def batch_search(texts):
+            searches.append(list(texts))
+            if len(searches) == 1:
+                return [{"found": False, "sources": [], "suggestions": [], "missing_references": [], "retryable": True} for _ in texts]
+            return [{"found": True, "sources": [{"title": "Found", "doi": "10.1234/found"}], "suggestions": [], "missing_references": []}
+                    for _ in texts]
+        
+        analyzer.web_searcher.batch_search = batch_search
+        text = "As shown before (Smith, 2020) in detail."
+        
+        assert "web_search" not in analyzer.analyze(text)["citations"][0]
+        assert analyzer.analyze(text)["citations"][0]["web_search"]["found"]
+        assert analyzer.analyze(text)["citations"][0]["web_search"]["found"]
+        assert searches == [["(Smith, 2020)"], ["(Smith, 2020)"]]
+        assert analyzer.web_searcher._build_results(["(Smith, 2020)"], [None])[0]["retryable"]
+
+class TestReportExport:
+    """Test columnar report export"""
+    
+    def test_csv_export_round_trip(self, tmp_path):
+        """Reports of several documents land in one table per kind, keyed by document"""
+        analyzer = CitationAnalyzer(api_provider="mock", enable_web_search=False)
+        report = analyzer.analyze("As shown (Smith, 2020) and (Jones, 2019).")
+        
+        exporter = ReportExporter(str(tmp_path), format="csv", batch_rows=3)
+        exporter.add_reports({"doc-1": report, "doc-2": report})
+        exporter.close()
+        
+        tables = load_tables(str(tmp_path), format="csv")
+        citations = tables["citations"]
+        assert len(citations) == 4
+        assert set(citations["document_id"]) == {"doc-1", "doc-2"}
+        assert citations.groupby("document_id")["is_valid"].sum().tolist() == [2, 2]
+        assert len(tables["doi_validations"]) == 0
+    
+    @pytest.mark.parametrize("format", ["parquet", "arrow"])
+    def test_columnar_export_round_trip(self, tmp_path, format):
+        """Parquet and Arrow exports keep every table's rows, nulls and batches"""
+        pytest.importorskip("pyarrow")
+        report = {
+            "citations": [
+                {"text": "(Smith, 2020)", "style": "apa", "position": 5, "is_valid": True, "confidence_score": 0.9,
+                 "issues": [], "suggestions": [], "tier": "rules",
+                 "web_search": {"found": True, "sources": [{"source": "crossref", "title": "Deep", "authors": ["J. Smith"],
+                                                           "year": 2020, "doi": "10.1234/deep"}]}},
+                {"text": "(see Jones)", "style": "apa", "position": 30, "is_valid": None, "confidence_score": 0.0,
+                 "issues": ["Missing year", "Missing comma"], "suggestions": [], "doi": "10.1234/x", "doi_valid": False},
+            ],
+            "doi_validation": {"results": [{"citation": "(see Jones)", "doi": "10.1234/x", "valid": False,
+                                            "data": None, "error": "DOI not found in CrossRef database"}]}
+        }
+        
+        with ReportExporter(str(tmp_path), format=format, batch_rows=3) as exporter:
+            assert exporter.format == format
+            exporter.add_reports({"doc-1": report, "doc-2": report})
+        
+        tables = load_tables(str(tmp_path), format=format)
+        citations = tables["citations"]
+        assert len(citations) == 4
+        assert citations["document_id"].tolist() == ["doc-1", "doc-1", "doc-2", "doc-2"]
+        assert citations["issues"].isna().tolist() == [True, False, True, False]
+        assert citations["issues"][1] == "Missing year | Missing comma"
+        assert citations["issue_count"].tolist() == [0, 2, 0, 2]
+        assert citations["is_valid"].isna().tolist() == [False, True, False, True]
+        assert tables["web_matches"]["year"].tolist() == ["2020", "2020"]
+        assert tables["web_matches"]["authors"].tolist() == ["J. Smith", "J. Smith"]
+        assert tables["doi_validations"]["error"].tolist() == ["DOI not found in CrossRef database"] * 2
+
+class TestOfflineIndex:
+    """Test the offline bibliographic index and its parsers"""
+    
+    BIBTEX = r"""
+    @string{jt = "Journal of Things"}
+    @article{smith2020,
+      author = {Smith, John and M{\"u}ller, Hans and Ludwig van Beethoven and {World Health Organization}},
+      title = {The {Effect} of \textit{Things} on \& Stuff},
+      journal = "Journal of Things", year = 2020, volume = {12}, pages = {45--67},
+      doi = {https://doi.org/10.1234/ABC.5},
+    }
+    @book{lee2018, author = "Lee, Ann", title = "A Book About Books", publisher = {Press}, year = {2018}, isbn = {978-3-16-148410-0}}
+    """
+    
+    def test_bibtex_and_ris_parsing(self):
+        """Entries become CrossRef-style works with citation keys, split names and plain text"""
+        smith, lee = parse_bibtex(self.BIBTEX)
+        ris = parse_ris("TY  - JOUR\nID  - jones2019\nAU  - Jones, Mary\nTI  - Fuzzy Titles\nPY  - 2019/05/01\nSP  - 1\nEP  - 9\nDO  - 10.5555/xyz\nER  - \n")
+        
+        assert smith["citation-key"] == "smith2020"
+        assert smith["title"] == ["The Effect of Things on & Stuff"]
+        assert [author["family"] for author in smith["author"]] == ["Smith", "Müller", "van Beethoven", "World Health Organization"]
+        assert smith["DOI"] == "10.1234/ABC.5" and smith["page"] == "45-67"
+        assert lee["ISBN"] == ["978-3-16-148410-0"] and lee["type"] == "book"
+        assert ris == [{"type": "journal-article", "title": ["Fuzzy Titles"], "author": [{"given": "Mary", "family": "Jones"}],
+                        "citation-key": "jones2019", "published-print": {"date-parts": [[2019, 5]]}, "page": "1-9", "DOI": "10.5555/xyz"}]
+    
+    def test_lookups_served_without_network(self, tmp_path):
+        """DOI, ISBN and fuzzy title lookups are answered from the index"""
+        (tmp_path / "library.bib").write_text(self.BIBTEX, encoding="utf-8")
+        openalex = {"id": "https://openalex.org/W1", "doi": "https://doi.org/10.9999/OA.1", "display_name": "Open Data in Practice",
+                    "publication_year": 2021, "authorships": [{"author": {"display_name": "Ana Lima"}}]}
+        (tmp_path / "dump.jsonl").write_text(json.dumps(openalex) + "\n", encoding="utf-8")
+        index = OfflineIndex(str(tmp_path / "index.sqlite"))
+        assert index.ingest(str(tmp_path / "library.bib")) == 2
+        assert index.ingest(str(tmp_path / "dump.jsonl")) == 1
+        assert index.ingest(str(tmp_path / "library.bib")) == 0
+        
+        def offline(*args, **kwargs):
+            raise AssertionError("network used")
+        
+        validator = DOIValidator(offline_index=index)
+        validator.session.get = offline
+        server = MCPServer(offline_index=index)
+        server.session.get = offline
+        searcher = WebSearcher(offline_index=index)
+        searcher.session.get = offline
+        
+        info = validator.get_publication_info("https://doi.org/10.9999/oa.1")
+        assert info["success"] and info["source"] == "offline_index"
+        assert info["data"]["title"] == "Open Data in Practice" and info["data"]["authors"][0]["family"] == "Lima"
+        verification = server.verify_citation('Lee, A. (2018). "A Book About Books". Press. ISBN 3-16-148410-X')
+        assert verification["verified"] and verification["source_info"]["title"] == "A Book About Books"
+        found = searcher.search_for_citation('"The effect of things on stuff"')
+        assert found["found"] and found["sources"][0]["doi"] == "10.1234/ABC.5"
+        assert index.search_title("completely unrelated words") == []
+
+class TestFuzzyMatcher:
+    """Test fuzzy matching of citations to candidate sources"""
+    
+    def test_title_similarity(self):
+        """Reordered words and dropped subtitles match fully, typos closely, other titles poorly"""
+        matcher = FuzzyMatcher()
+        
+        assert matcher.title_similarity("Attention Is All You Need", "All you need is attention!") == 1.0
+        assert matcher.title_similarity("Deep Learning", "Deep learning: a review") == 1.0
+        assert matcher.title_similarity("Attention is all you need", "Atention is all you ned") >= 0.85
+        assert matcher.title_similarity("Attention is all you need", "Graph kernels for molecules") < 0.5
+    
+    def test_best_matching_source_ranked_first(self, monkeypatch):
+        """Search results and verification use the best-matching candidate, not the engine's first hit"""
+        candidates = [
+            {"title": "Deep learning for cats", "authors": ["Ann Other"], "year": "2015", "doi": "10.1/wrong"},
+            {"title": "Deep learning for dogs", "authors": ["John Smith"], "year": "2020", "doi": "10.1/right"},
+        ]
+        searcher = WebSearcher()
+        searcher.offline_index = None
+        monkeypatch.setattr(searcher, "_search_crossref", lambda query: [dict(c) for c in candidates])
+        
+        result = searcher.search_for_citation('Smith, J. (2020). "Deep learning for dogs"')
+        
+        assert [source["doi"] for source in result["sources"]] == ["10.1/right", "10.1/wrong"]
+        assert result["sources"][0]["match_score"] == pytest.approx(1.0)
+        
+        server = MCPServer()
+        info = server._parse_citation('Smith (2020) "Deep learning for dogs"')
+        verification = server._verify_details(info, {"found": True, "sources": [dict(c) for c in candidates], "confidence": 0.7})
+        assert verification["verified"] and verification["source_info"]["doi"] == "10.1/right"
+        assert verification["matched_fields"] == ["year", "title"]
+
+class UploadedFile(io.BytesIO):
+    """Stand-in for a Streamlit upload"""
+    
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+class TestFileHandler:
+    """Test file text extraction"""
+    
+    def test_extraction_cached_by_content(self, tmp_path, monkeypatch):
+        """The same content is extracted once, in memory and across handlers via disk"""
+        handler = FileHandler(ExtractionCache(directory=str(tmp_path)))
+        calls = []
+        original = FileHandler._extract_from_txt
+        monkeypatch.setattr(FileHandler, "_extract_from_txt", lambda self, f: calls.append(1) or original(self, f))
+        
+        first = handler.extract(UploadedFile(b"See (Smith, 2020).", "a.txt"))
+        second = handler.extract(UploadedFile(b"See (Smith, 2020).", "b.txt"))
+        from_disk = FileHandler(ExtractionCache(directory=str(tmp_path))).extract_text(UploadedFile(b"See (Smith, 2020).", "c.txt"))
+        
+        assert first == second == {"text": "See (Smith, 2020).", "page_offsets": [0]}
+        assert from_disk == "See (Smith, 2020)."
+        assert len(calls) == 1
+
+    def test_decode_bytes_tiers(self):
+        """BOMs and UTF-8 decode directly; other encodings are detected from a sample"""
+        text = "Café résumé (Müller, 2020). " * 50
+        
+        assert decode_bytes(text.encode("utf-8")) == text
+        assert decode_bytes(text.encode("utf-8-sig")) == text
+        assert decode_bytes(text.encode("utf-16")) == text
+        assert decode_bytes(("x" * 100000 + text).encode("cp1252"), sample_size=4096).endswith(text)
+    
+    def test_markdown_positions_map_to_source_lines(self):
+        """Markdown is reduced to text without code blocks, and positions map back to source lines"""
+        source = "# Intro (Smith, 2020)\n\n```\n(Fake, 1999)\n```\n\n- **See** [Jones (2019)](http://x.org) &amp; more\n"
+        handler = FileHandler(ExtractionCache())
+        
+        extracted = handler.extract(UploadedFile(source.encode("utf-8"), "notes.md"))
+        offset_map = handler.offset_map(extracted)
+        
+        assert "Fake" not in extracted["text"]
+        assert "See Jones (2019) & more" in extracted["text"]
+        position = extracted["text"].index("Jones (2019)")
+        assert offset_map.line_for_position(position) == 7
+        assert source[offset_map.to_source(position):].startswith("Jones (2019)")
+
+    def test_pdf_positions_map_to_page_and_line(self, monkeypatch):
+        """Collapsed PDF text keeps page offsets and maps citations to their page and line"""
+        pages = ["Title  page\n\nIntro text", "First line\nSee   (Smith,\n2020) here.\n"]
+        
+        class Page:
+            def __init__(self, text):
+                self.text = text
+            
+            def extract_text(self):
+                return self.text
+        
+        monkeypatch.setattr(PyPDF2, "PdfReader", lambda file: type("Reader", (), {"pages": [Page(text) for text in pages]}))
+        handler = FileHandler(ExtractionCache())
+        
+        extracted = handler.extract(UploadedFile(b"%PDF", "paper.pdf"))
+        location = handler.offset_map(extracted).location(extracted["text"].index("(Smith"))
+        
+        assert extracted["text"] == "Title page Intro text\n\nFirst line See (Smith, 2020) here."
+        assert extracted["page_offsets"] == [0, 23]
+        assert location == {"page": 2, "line": 2}
+    
+    def test_failed_extraction_not_cached(self, monkeypatch):
+        """Unreadable and empty files are read again instead of being served from the cache"""
+        def unreadable(file):
+            raise PyPDF2.errors.PdfReadError("EOF marker not found")
+        
+        monkeypatch.setattr(PyPDF2, "PdfReader", unreadable)
+        handler = FileHandler(ExtractionCache())
+        
+        assert handler.extract(UploadedFile(b"%PDF", "paper.pdf")) is None
+        assert handler.extract(UploadedFile(b"   ", "blank.txt"))["text"] == "   "
+        assert len(handler.cache.entries) == 0
+        
+        page = type("Page", (), {"extract_text": lambda self: "See (Smith, 2020)."})()
+        monkeypatch.setattr(PyPDF2, "PdfReader", lambda file: type("Reader", (), {"pages": [page]}))
+        assert handler.extract_text(UploadedFile(b"%PDF", "paper.pdf")) == "See (Smith, 2020)."
+        assert len(handler.cache.entries) == 1
+    
+    def test_docx_includes_tables_notes_and_headers_once(self):
+        """Merged cells and repeated headers appear once, and footnotes are included"""
+        document = docx.Document()
+        document.add_paragraph("Intro (Smith, 2020).")
+        table = document.add_table(rows=1, cols=3)
+        table.cell(0, 0).merge(table.cell(0, 1)).text = "Merged (Jones, 2019)"
+        table.cell(0, 2).text = "Other"
+        document.sections[0].header.paragraphs[0].text = "Running head"
+        document.add_section()
+        document.add_paragraph("Second section.")
+        saved = io.BytesIO()
+        document.save(saved)
+        w = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+        footnotes = f'<w:footnotes xmlns:w="{w}"><w:footnote w:id="1"><w:p><w:r><w:t>Smith, Title (2020), 45.</w:t></w:r></w:p></w:footnote></w:footnotes>'
+        upload = io.BytesIO()
+        with zipfile.ZipFile(saved) as source, zipfile.ZipFile(upload, "w") as target:
+            for item in source.infolist():
+                target.writestr(item, source.read(item))
+            target.writestr("word/footnotes.xml", footnotes)
+        
+        text = FileHandler(ExtractionCache()).extract_text(UploadedFile(upload.getvalue(), "paper.docx"))
+        
+        assert text == "Intro (Smith, 2020).\n\nMerged (Jones, 2019)\n\nOther\n\nSecond section.\n\nSmith, Title (2020), 45.\n\nRunning head"
+    
+    def test_clean_text_keeps_normalization(self):
+        """clean_text still NFKD-normalizes, collapses whitespace and strips, like normalize_text"""
+        assert clean_text("  ﬁne  café\n\tnote ") == unicodedata.normalize("NFKD", "fine café note")
+        for text in ["a ¨  b", " Ｓｍｉｔｈ\u00a0(２０２０) ", "ẛ̣ x\u2002y"]:
+            assert clean_text(text) == normalize_text(text)[0]
+
+class TestBibliographyIndex:
+    """Test resolving citations against the user's own bibliography"""
+    
+    BIBTEX = r"""
+    @article{smith2020, author = {Smith, John and Lee, Ann}, title = {Deep Things}, year = {2020}, doi = {10.1234/deep}}
+    @book{berg2018, author = {Berg, Jan van der}, title = {Books}, year = 2018}
+    """
+    RIS = "TY  - JOUR\nID  - smith2020\nAU  - Smith, John\nTI  - Deep Things\nPY  - 2020\nDO  - 10.1234/deep\nER  - \nTY  - BOOK\nID  - berg2018\nAU  - van der Berg, Jan\nTI  - Books\nPY  - 2018\nER  - \n"
+    CSL = [{"id": "smith2020", "type": "article-journal", "title": "Deep Things", "author": [{"family": "Smith", "given": "John"}],
+            "issued": {"date-parts": [[2020]]}, "DOI": "10.1234/deep"},
+           {"id": "berg2018", "type": "book", "title": "Books", "author": [{"family": "Berg", "given": "Jan", "non-dropping-particle": "van der"}],
+            "issued": {"date-parts": [[2018]]}}]
+    
+    def test_every_format_resolves_keys_dois_and_author_year(self):
+        """BibTeX, RIS and CSL-JSON uploads index the same entries"""
+        uploads = [UploadedFile(self.BIBTEX.encode("utf-8"), "refs.bib"), UploadedFile(self.RIS.encode("utf-8"), "refs.ris"),
+                   UploadedFile(json.dumps(self.CSL).encode("utf-8"), "refs.json")]
+        for upload in uploads:
+            index = FileHandler().load_bibliography(upload)
+            
+            assert len(index) == 2
+            assert index.match(r"\citep[p.~4]{Smith2020, berg2018}")[1] == []
+            assert index.match("[@smith2020; @nobody2001, p. 3]")[1] == ["nobody2001"]
+            assert index.match("(doi:10.1234/DEEP)")[0][0]["title"] == ["Deep Things"]
+            assert index.match("(Smith et al., 2020, p. 1999; van der Berg 2018)")[1] == []
+            assert index.match("(Smith, 2019)")[1] == ["Smith 2019"]
+            assert index.match("[12]") == ([], [])
+        assert FileHandler().load_bibliography(UploadedFile(b"", "refs.txt")) is None
+    
+    def test_resolved_citations_skip_model_and_search(self):
+        """Citations the bibliography settles never reach an AI model or the web"""
+        class NoModel(MockProvider):
+            def analyze_citation(self, prompt, models=None):
+                raise AssertionError("model used")
+        
+        analyzer = CitationAnalyzer(api_provider="mock", bibliography=BibliographyIndex(parse_bibtex(self.BIBTEX)))
+        analyzer.api_provider = NoModel()
+        analyzer.web_searcher.batch_search = lambda texts: pytest.fail("web search used")
+        analyzer.web_searcher.find_missing_references = lambda text: []
+        
+        report = analyzer.analyze(r"See \cite{smith2020} and [@berg2018], then (Smith, 2020) and \cite{missing}.")
+        
+        results = {entry["text"]: entry for entry in report["citations"]}
+        assert results[r"\cite{smith2020}"]["references"] == ["smith2020"] and results[r"\cite{smith2020}"]["is_valid"]
+        assert results["[@berg2018]"]["tier"] == "bibliography"
+        assert results["(Smith, 2020)"]["tier"] == "rules" and results["(Smith, 2020)"]["references"] == ["smith2020"]
+        assert not results[r"\cite{missing}"]["is_valid"]
+        assert results[r"\cite{missing}"]["issues"] == ["No bibliography entry for missing"]
+        assert report["summary"]["analysis_tiers"]["bibliography"]["resolved"] == 3
+
+class CrossRefResponse:
+    """Stand-in for a requests response from CrossRef"""
+    
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.reason = "Bad Request" if status_code == 400 else "OK"
+        self.payload = payload
+    
+    def json(self):
+        return self.payload
+
+class TestDOIValidator:
+    """Test CrossRef lookups"""
+    
+    def test_lookup_selects_fields(self):
+        """A lookup asks CrossRef for the fields it reads, adds abstract and license on request and falls back to the whole record"""
+        work = {"DOI": "10.1038/nature14539", "title": ["Deep learning"], "author": [{"given": "Yann", "family": "LeCun"}],
+                "issued": {"date-parts": [[2015, 5]]}, "container-title": ["Nature"], "type": "journal-article"}
+        calls = []
+        
+        def get(url, params=None, timeout=None):
+            calls.append((url, params))
+            if params is None:
+                return CrossRefResponse(200, {"message": dict(work, reference=[{"key": "r1"}] * 300)})
+            if "abstract" in params["select"]:
+                return CrossRefResponse(400)
+            return CrossRefResponse(200, {"message": {"total-results": 1, "items": [work]}})
+        
+        validator = DOIValidator()
+        validator.offline_index = None
+        validator.session.get = get
+        
+        info = validator.get_publication_info("doi:10.1038/nature14539", include_extras=False)
+        assert info["success"] and info["data"]["journal"] == "Nature" and info["data"]["date"]["formatted"] == "May 2015"
+        url, params = calls[0]
+        assert url == validator.crossref_api and params["filter"] == "doi:10.1038/nature14539"
+        assert set(params["select"].split(",")) == set(CROSSREF_WORK_FIELDS)
+        
+        calls.clear()
+        info = validator.get_publication_info("10.1038/nature14539")
+        assert info["success"] and info["data"]["title"] == "Deep learning"
+        assert "abstract,license" in calls[0][1]["select"] and calls[1] == (f"{validator.crossref_api}/10.1038/nature14539", None)
+        
+        validator.session.get = lambda url, params=None, timeout=None: CrossRefResponse(200, {"message": {"total-results": 0, "items": []}})
+        assert validator.get_publication_info("10.1234/none")["error"] == "DOI not found in CrossRef database"
+
+class TestCitationFormats:
+    """Test formatting publication records as references"""
+    
+    def test_styles_and_missing_fields(self):
+        """Each style renders a full record; empty names and missing fields are dropped instead of crashing"""
+        validator = DOIValidator()
+        record = {"title": "Deep learning", "authors": [{"given": "Yann", "family": "LeCun"}, {"given": "", "family": "Bengio"}],
+                  "date": {"year": 2015}, "journal": "Nature", "volume": "521", "issue": "7553", "pages": "436-444",
+                  "url": "https://doi.org/10.1038/nature14539"}
+        
+        assert validator.format_citation(record) == ("LeCun, Y., & Bengio (2015). Deep learning. Nature, 521(7553), 436-444. "
+                                                     "https://doi.org/10.1038/nature14539")
+        assert validator.format_citation(record, "MLA").startswith('LeCun, Yann, and Bengio. "Deep learning." Nature, vol. 521')
+        assert validator.format_citation(record, "ieee") == 'Y. LeCun, Bengio, "Deep learning," Nature, vol. 521, no. 7553, pp. 436-444, 2015.'
+        assert validator.format_citation({"title": "Notes"}, "chicago") == 'Unknown Author. "Notes."'
+        assert validator.format_citation({"authors": [{"family": "WHO"}]}) == "WHO (n.d.)."
+    
+    def test_batch_matches_single(self):
+        """Formatting many records into many styles at once gives what one call per reference gives"""
+        validator = DOIValidator()
+        records = [{"title": f"Paper {n}", "authors": [{"given": "Ann", "family": "Smith"}] * n, "date": {"year": 2000 + n},
+                    "journal": "Journal" if n % 2 else ""} for n in range(30)]
+        styles = ["apa", "mla", "chicago", "harvard", "ieee", "unknown"]
+        
+        assert validator.format_citations(records, styles) == [
+            {style: validator.format_citation(record, style) for style in styles} for record in records]
+    
+    def test_csl_styles(self):
+        """Shipped CSL styles render records; a reference list is numbered in citation order and sorted by the style"""
+        library = CSLStyleLibrary(CSL_STYLES_DIR)
+        article = {"title": "Deep learning", "type": "Journal Article", "date": {"year": 2015, "month": 5, "day": 28},
+                   "authors": [{"given": "Yann", "family": "LeCun"}, {"given": "Geoffrey E.", "family": "Hinton"}],
+                   "journal": "Nature", "volume": "521", "issue": "7553", "pages": "436-444",
+                   "url": "https://doi.org/10.1038/nature14539"}
+        report = {"title": "World health statistics", "authors": [], "date": {}, "publisher": "WHO", "type": "Report"}
+        
+        assert library.get("harvard").render(article) == ("LeCun, Y. and Hinton, G.E. (2015) ‘Deep learning’, Nature, 521(7553), "
+                                                          "pp. 436–444. Available at: https://doi.org/10.1038/nature14539.")
+        assert library.get("harvard").render(report) == "World health statistics (n.d.) WHO."
+        assert library.get("Vancouver").bibliography([report, article]) == [
+            "1. World health statistics. WHO.",
+            "2. LeCun Y, Hinton GE. Deep learning. Nature. 2015 May 28;521(7553):436-444. doi:10.1038/nature14539",
+        ]
+        assert library.get("harvard").bibliography([report, article])[0].startswith("LeCun")
+        assert library.get("missing") is None
+    
+    def test_csl_library_takes_precedence(self, tmp_path):
+        """A CSL style in the library replaces the built-in style of its name and adds new ones"""
+        (tmp_path / "apa.csl").write_text(
+            '<style xmlns="http://purl.org/net/xbiblio/csl" version="1.0"><info><title>Short</title></info>'
+            '<bibliography><layout suffix="."><group delimiter=", "><names variable="author"><name form="short" and="symbol"/></names>'
+            '<date variable="issued"><date-part name="year"/></date><text variable="volume" prefix="vol. "/></group></layout></bibliography></style>',
+            encoding="utf-8")
+        formatter = CitationFormatter(library=CSLStyleLibrary(str(tmp_path)))
+        record = {"title": "T", "authors": [{"given": "Ann", "family": "Smith"}, {"given": "Bo", "family": "Lee"}], "date": {"year": 2001}}
+        
+        assert formatter.format(record, "APA") == "Smith & Lee, 2001."
+        assert formatter.format(record, "mla") == 'Smith, Ann, and Bo Lee. "T."'
+        assert formatter.format_many([record], ["apa", "mla"]) == [{"apa": "Smith & Lee, 2001.", "mla": formatter.format(record, "mla")}]
+        assert formatter.style_titles()["apa"] == "Short"
+
 class TestIntegration:
     """Integration tests"""
     
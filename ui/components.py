@@ -543,6 +543,9 @@ def render_citation_card(citation: Dict[str, Any], index: int):
             # Citation text
             st.markdown("**Citation Text:**")
             st.code(citation['text'], language=None)
+            if citation.get('line'):
+                location = f"Page {citation['page']}, line {citation['line']}" if citation.get('page') else f"Line {citation['line']}"
+                st.caption(f"📍 {location} of the uploaded file")
             
             # DOI Information
             if citation.get('doi'):
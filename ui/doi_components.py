@@ -139,10 +139,11 @@ def render_doi_success(data: Dict[str, Any], validator: DOIValidator):
     st.markdown("---")
     st.markdown("### 📋 Formatted Citations")
     
-    citation_styles = ['APA', 'MLA', 'Chicago', 'Harvard', 'IEEE']
-    selected_style = st.selectbox("Citation Style", citation_styles, key="citation_style_select")
+    citation_styles = validator.formatter.style_titles()
+    selected_style = st.selectbox("Citation Style", list(citation_styles), format_func=citation_styles.get,
+                                  key="citation_style_select")
     
-    citation = validator.format_citation(data, selected_style.lower())
+    citation = validator.format_citation(data, selected_style)
     
     st.code(citation, language=None)
     
@@ -196,7 +197,7 @@ def render_doi_extractor():
                 for i, doi in enumerate(dois, 1):
                     with st.expander(f"DOI {i}: {doi}", expanded=(i==1)):
                         with st.spinner("Validating..."):
-                            result = validator.get_publication_info(doi)
+                            result = validator.get_publication_info(doi, include_extras=False)
                             
                             if result['success']:
                                 data = result['data']